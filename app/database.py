@@ -1,8 +1,31 @@
 import os
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Optional,
+    Sequence,
+    TypeVar,
+    overload,
+)
 
+from pydantic import parse_obj_as
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.sql import Executable
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app.data import env_consts
+from utils.db_pool_utils import PoolMetrics, timed_pool_class
+
+T = TypeVar("T")
 
 DB_HOST = os.environ.get("DB_HOST")
 DB_PORT = os.environ.get("DB_PORT")
@@ -10,17 +33,134 @@ DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_URI = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DB_URI = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+# Serve requests with asyncpg sessions instead of psycopg2 sessions on the threadpool
+DB_ASYNC = os.environ.get(env_consts.DB_ASYNC, "false").lower() == "true"
+
+# Pre-ping and recycle replace connections left dead by a database failover
+POOL_OPTIONS = {
+    "pool_size": int(os.environ.get(env_consts.DB_POOL_SIZE, 5)),
+    "max_overflow": int(os.environ.get(env_consts.DB_MAX_OVERFLOW, 10)),
+    "pool_timeout": float(os.environ.get(env_consts.DB_POOL_TIMEOUT, 30)),
+    "pool_recycle": int(os.environ.get(env_consts.DB_POOL_RECYCLE, 1800)),
+    "pool_pre_ping": (
+        os.environ.get(env_consts.DB_POOL_PRE_PING, "true").lower() == "true"
+    ),
+}
 
-engine = create_engine(DB_URI)
+# Reported by the /metrics/db-pool route
+pool_metrics = PoolMetrics()
+
+engine = create_engine(
+    DB_URI, poolclass=timed_pool_class(QueuePool, pool_metrics), **POOL_OPTIONS
+)
+pool_metrics.listen(engine.pool)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if DB_ASYNC:
+    async_pool_metrics = PoolMetrics()
+    async_engine = create_async_engine(
+        ASYNC_DB_URI,
+        poolclass=timed_pool_class(AsyncAdaptedQueuePool, async_pool_metrics),
+        **POOL_OPTIONS,
+    )
+    async_pool_metrics.listen(async_engine.sync_engine.pool)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
 Base = declarative_base()
 
 
-def get_db():
-    # Dependency
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+if DB_ASYNC:
+
+    async def get_db():
+        # Dependency
+        async with AsyncSessionLocal() as db:
+            yield db
+
+else:
+
+    def get_db():
+        # Dependency
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+# The result is the response model's when one is given, which may be a union or
+# generic alias rather than a class, so it's only typed without
+@overload
+async def run_db(
+    db: Session | AsyncSession,
+    fn: Callable[..., Any],
+    *args: Any,
+    response_model: Any,
+    **kwargs: Any,
+) -> Any:
+    ...
+
+
+@overload
+async def run_db(
+    db: Session | AsyncSession, fn: Callable[..., T], *args: Any, **kwargs: Any
+) -> T:
+    ...
+
+
+async def run_db(
+    db: Session | AsyncSession,
+    fn: Callable[..., Any],
+    *args: Any,
+    response_model: Optional[Any] = None,
+    **kwargs: Any,
+) -> Any:
+    """Runs fn(session, *args, **kwargs) for a session from get_db without blocking
+    the event loop.
+
+    Repository functions are written against the sync Session API. With an
+    AsyncSession they run through run_sync, on the event loop with asyncpg doing
+    the IO, otherwise on the threadpool. The result is converted to
+    response_model in the same place, as serializing ORM objects can lazy load.
+    """
+
+    def run(session: Session):
+        result = fn(session, *args, **kwargs)
+        if response_model is not None:
+            return parse_obj_as(response_model, result)
+        return result
+
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(run)
+    return await run_in_threadpool(run, db)
+
+
+def run_db_response(response_model: Any) -> dict[str, Any]:
+    """Route decorator arguments for a route returning run_db(...,
+    response_model=response_model). The model is documented as the response
+    without FastAPI validating the already converted result again, which it
+    would for a response_model or return annotation."""
+    return {"response_model": None, "responses": {200: {"model": response_model}}}
+
+
+async def stream_db(
+    db: Session | AsyncSession,
+    stmt: Executable,
+    transform: Callable[[Sequence[Any]], T],
+) -> AsyncIterator[T]:
+    """Yields transform(partition) for each partition of the scalar results of a
+    statement executed with yield_per, streaming with either session type."""
+    if isinstance(db, AsyncSession):
+        result = await db.stream_scalars(stmt)
+        async for partition in result.partitions():
+            yield transform(partition)
+    else:
+
+        def transformed_partitions():
+            for partition in db.scalars(stmt).partitions():
+                yield transform(partition)
+
+        async for transformed in iterate_in_threadpool(transformed_partitions()):
+            yield transformed
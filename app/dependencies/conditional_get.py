@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional
+
+from fastapi import Depends, Request, Response
+from sqlalchemy import Row, Table
+
+from app.database import SessionLocal, get_db, run_db
+from app.exceptions.exceptions import NotModifiedException
+from app.repositories import table_version_repository
+
+
+def conditional_get(*tables: Table) -> Callable:
+    """Dependency for list routes whose response only depends on the given tables.
+
+    Sends an ETag and Last-Modified built from the tables' row counts and latest
+    updated_at, and raises NotModifiedException (sent as a 304) before the route
+    loads anything when the client's copy is still current. The versions are kept
+    for the route, see get_checked_table_versions.
+    """
+
+    async def check_modified(
+        request: Request, response: Response, db: SessionLocal = Depends(get_db)
+    ):
+        versions = await run_db(
+            db, table_version_repository.get_table_versions, list(tables)
+        )
+        request.state.table_versions = {
+            table.name: version for table, version in zip(tables, versions)
+        }
+        etag = generate_etag(versions)
+        last_modified = get_last_modified(versions)
+
+        headers = {"ETag": etag}
+        if last_modified:
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+        if is_not_modified(request, etag, last_modified):
+            raise NotModifiedException(headers)
+
+        response.headers.update(headers)
+
+    return check_modified
+
+
+def get_checked_table_versions(request: Request) -> dict[str, Row]:
+    """Dependency for the table versions conditional_get checked for the request,
+    by table name, for caches keyed on them to use without querying them again.
+    """
+    return getattr(request.state, "table_versions", {})
+
+
+def generate_etag(versions) -> str:
+    version_key = ";".join(
+        f"{count}:{max_updated_at.isoformat() if max_updated_at else ''}"
+        for count, max_updated_at in versions
+    )
+    return f'W/"{hashlib.sha1(version_key.encode()).hexdigest()}"'
+
+
+def get_last_modified(versions) -> Optional[datetime]:
+    updated_ats = [
+        as_utc(max_updated_at) for _, max_updated_at in versions if max_updated_at
+    ]
+    if not updated_ats:
+        return None
+    # HTTP dates have second precision
+    return max(updated_ats).replace(microsecond=0)
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime]
+) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since
+    # See https://httpwg.org/specs/rfc9110.html#field.if-modified-since
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, W/ prefixes are ignored
+        client_etags = [
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        ]
+        return "*" in client_etags or etag.removeprefix("W/") in client_etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        modified_since = as_utc(parsedate_to_datetime(if_modified_since))
+    except (TypeError, ValueError):
+        return False
+    return last_modified <= modified_since
+
+
+def as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
@@ -1,2 +1,9 @@
 class TagNotFoundException(Exception):
     pass
+
+
+# Raised from conditional GET checks when the client's cached copy is current
+class NotModifiedException(Exception):
+    def __init__(self, headers: dict[str, str]):
+        super().__init__("Not modified")
+        self.headers = headers
@@ -1,16 +1,45 @@
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 
-from app.exceptions.exceptions import TagNotFoundException
+from app.exceptions.exceptions import (
+    NotModifiedException,
+    TagNotFoundException,
+)
+from app.routers import metrics as metrics_router
 from app.routers import question as question_router
+from app.routers import snapshot as snapshot_router
 from app.routers import tag as tag_router
 from app.routers import test as test_router
+from utils.s3_utils import close_s3_transfer_service
 
 app = FastAPI()
 
 app.include_router(test_router.router)
 app.include_router(question_router.router)
 app.include_router(tag_router.router)
+app.include_router(metrics_router.router)
+app.include_router(snapshot_router.router)
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+# Keeps the published snapshot up to date, bursts of writes publish once
+@app.middleware("http")
+async def publish_snapshot_after_writes(request: Request, call_next):
+    response = await call_next(request)
+    if (
+        snapshot_router.PUBLISH_AFTER_WRITES
+        and request.method in WRITE_METHODS
+        and response.status_code < 400
+        and not request.url.path.startswith("/snapshots")
+    ):
+        snapshot_router.snapshot_publisher.request()
+    return response
+
+
+@app.on_event("shutdown")
+async def close_s3_clients():
+    await close_s3_transfer_service()
 
 
 @app.get("/")
@@ -23,3 +52,8 @@ async def root():
 @app.exception_handler(TagNotFoundException)
 async def tag_not_found_exception_handler(request, e: TagNotFoundException):
     return JSONResponse(content={"details": str(e)}, status_code=400)
+
+
+@app.exception_handler(NotModifiedException)
+async def not_modified_exception_handler(request, e: NotModifiedException):
+    return Response(status_code=304, headers=e.headers)
@@ -2,13 +2,18 @@ from datetime import datetime
 from typing import Any, List, Optional
 
 from sqlalchemy import (
+    JSON,
     CheckConstraint,
     Column,
+    DateTime,
+    Enum,
     ForeignKey,
     Numeric,
     Table,
     func,
+    text,
 )
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.data.question_enums import (
@@ -21,13 +26,21 @@ from app.data.question_enums import (
 from app.database import Base
 
 # see https://docs.sqlalchemy.org/en/20/orm/declarative_tables.html#using-python-enum-or-pep-586-literal-types-in-the-type-map for enum info # noqa: E501
+# Enum types are named as in db_schema/schema.sql, asyncpg casts parameters to them
+question_type_enum = Enum(QuestionType, name="question_type")
+usage_type_enum = Enum(UsageType, name="usage_type")
+passage_type_enum = Enum(PassageType, name="passage_type")
+section_enum = Enum(Section, name="section")
+sub_section_enum = Enum(SubSection, name="sub_section")
 
 
 question_tag_table = Table(
     "question_tag",
     Base.metadata,
-    Column("question_id", ForeignKey("question.id")),
-    Column("tag_id", ForeignKey("tag.id")),
+    Column("question_id", ForeignKey("question.id"), primary_key=True),
+    Column("tag_id", ForeignKey("tag.id"), primary_key=True),
+    Column("created_at", DateTime, default=func.now()),
+    Column("updated_at", DateTime, default=func.now(), onupdate=func.now()),
 )
 
 
@@ -39,10 +52,10 @@ class Question(Base):
         ForeignKey("official_test.id")
     )
     official_test_question_number: Mapped[Optional[int]]
-    q_type: Mapped[QuestionType]
-    usage: Mapped[Optional[UsageType]]
-    section: Mapped[Optional[Section]]
-    sub_section: Mapped[Optional[SubSection]]
+    q_type: Mapped[QuestionType] = mapped_column(question_type_enum)
+    usage: Mapped[Optional[UsageType]] = mapped_column(usage_type_enum)
+    section: Mapped[Optional[Section]] = mapped_column(section_enum)
+    sub_section: Mapped[Optional[SubSection]] = mapped_column(sub_section_enum)
     passage_id: Mapped[Optional[int]] = mapped_column(ForeignKey("passage.id"))
     passage: Mapped["Passage"] = relationship(back_populates="questions")
     tags: Mapped[List["Tag"]] = relationship(  # noqa: F821
@@ -88,6 +101,18 @@ class MultipleChoiceAnswer(Base):
         default=func.now(), onupdate=func.now()
     )
 
+    # At most one correct answer, checked once per statement, see schema.sql
+    __table_args__ = (
+        ExcludeConstraint(
+            ("question_id", "="),
+            name="multiple_choice_answer_one_correct",
+            using="btree",
+            where=text("is_correct"),
+            deferrable=True,
+            initially="IMMEDIATE",
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class FillInQuestion(TextQuestion):
     __tablename__ = "fill_in_question"
@@ -101,7 +126,9 @@ class FillInQuestion(TextQuestion):
 
 class MultipleChoiceQuestion(TextQuestion):
     answers: Mapped[List[MultipleChoiceAnswer]] = relationship(
-        "MultipleChoiceAnswer", cascade="all, delete-orphan"
+        "MultipleChoiceAnswer",
+        cascade="all, delete-orphan",
+        order_by="MultipleChoiceAnswer.choice_number",
     )
 
     __mapper_args__: dict[str, Any] = {
@@ -154,11 +181,11 @@ class Passage(Base):
     official_test_id: Mapped[Optional[int]] = mapped_column(
         ForeignKey("official_test.id")
     )
-    p_type: Mapped[PassageType]
+    p_type: Mapped[PassageType] = mapped_column(passage_type_enum)
     title: Mapped[str]
-    usage: Mapped[Optional[UsageType]]
-    section: Mapped[Optional[Section]]
-    sub_section: Mapped[Optional[SubSection]]
+    usage: Mapped[Optional[UsageType]] = mapped_column(usage_type_enum)
+    section: Mapped[Optional[Section]] = mapped_column(section_enum)
+    sub_section: Mapped[Optional[SubSection]] = mapped_column(sub_section_enum)
     questions: Mapped[List["Question"]] = relationship(back_populates="passage")
     created_at: Mapped[datetime] = mapped_column(default=func.now())
     updated_at: Mapped[datetime] = mapped_column(
@@ -184,3 +211,29 @@ class ImagePassage(Passage):
     passage_image_s3_key: Mapped[str]
 
     __mapper_args__: dict[str, Any] = {"polymorphic_identity": PassageType.IMAGE}
+
+
+# Read model kept current by triggers in db_schema/schema.sql, never written to
+# by the app. tags and answers hold the Tag and MultipleChoiceAnswer columns.
+class QuestionRead(Base):
+    __tablename__ = "question_read"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    official_test_id: Mapped[Optional[int]]
+    official_test_question_number: Mapped[Optional[int]]
+    q_type: Mapped[QuestionType] = mapped_column(question_type_enum)
+    usage: Mapped[Optional[UsageType]] = mapped_column(usage_type_enum)
+    section: Mapped[Optional[Section]] = mapped_column(section_enum)
+    sub_section: Mapped[Optional[SubSection]] = mapped_column(sub_section_enum)
+    passage_id: Mapped[Optional[int]]
+    question_text: Mapped[Optional[str]]
+    explanation: Mapped[Optional[str]]
+    answer: Mapped[Optional[float]] = mapped_column(Numeric(7, 3))
+    question_image_s3_key: Mapped[Optional[str]]
+    answer_image_s3_key: Mapped[Optional[str]]
+    correct_choice: Mapped[Optional[int]]
+    # JSONB in the database
+    tags: Mapped[list[dict]] = mapped_column(JSON)
+    answers: Mapped[list[dict]] = mapped_column(JSON)
+    created_at: Mapped[datetime]
+    updated_at: Mapped[datetime]
@@ -0,0 +1,88 @@
+import os
+from typing import Any, Optional
+
+from sqlalchemy import CTE, ColumnElement, Row, Table, func, select, update
+
+from app.data.env_consts import PATCH_WITH_RETURNING
+from app.database import Base, SessionLocal
+
+# Run PATCH routes as UPDATE ... RETURNING statements, building the response
+# from the returned rows instead of loading, flushing and reloading models.
+# The joined inheritance statements are Postgres only.
+PATCH_RETURNING = os.getenv(PATCH_WITH_RETURNING, "false").lower() == "true"
+
+
+def get_inheritance_tables(model: type[Base]) -> list[Table]:
+    # Base table first, MultipleChoiceQuestion shares TextQuestion's table
+    mappers = reversed(list(model.__mapper__.iterate_to_root()))
+    return list(dict.fromkeys(mapper.local_table for mapper in mappers))
+
+
+def patch_row(
+    db: SessionLocal, model: type[Base], row_id: int, values: dict[str, Any]
+) -> Optional[Row]:
+    """Updates the row of a single table model with the given column values and
+    returns all of its columns, or None if there is no row with the id."""
+    table = model.__table__
+    if not values:
+        return db.execute(select(table).where(table.c.id == row_id)).one_or_none()
+    stmt = (
+        update(table).where(table.c.id == row_id).values(**values).returning(*table.c)
+    )
+    return db.execute(stmt).one_or_none()
+
+
+def patch_joined_row(
+    db: SessionLocal,
+    model: type[Base],
+    row_id: int,
+    values: dict[str, Any],
+    returning: tuple[ColumnElement, ...] = (),
+    ctes: tuple[CTE, ...] = (),
+) -> Row:
+    """Updates a row of a polymorphic joined inheritance model in one statement
+    and returns the columns of all its tables, plus the returning expressions.
+    ctes are other data-modifying CTEs to run in the statement.
+
+    Raises NoResultFound if there's no row of the model's type with the id. The
+    CTEs may still have changed rows, e.g. a shared table of another type's row,
+    so the transaction must be rolled back, as it is when the request's session
+    is closed.
+
+    Subclass tables with changed columns are updated in data-modifying CTEs,
+    the others are only joined. The base table is always updated, to bump
+    updated_at, and returns the rest through UPDATE ... FROM. Postgres only, as
+    SQLite can't return the columns of other tables.
+    """
+    base_table, *subclass_tables = get_inheritance_tables(model)
+    mapper = model.__mapper__
+    stmt = (
+        update(base_table)
+        .where(
+            base_table.c.id == row_id,
+            mapper.polymorphic_on == mapper.polymorphic_identity,
+        )
+        .add_cte(*ctes)
+    )
+    columns: list[ColumnElement] = list(base_table.c)
+
+    for table in subclass_tables:
+        primary_key = table.primary_key.columns[0]
+        table_values = {key: value for key, value in values.items() if key in table.c}
+        source: Table | CTE = table
+        if table_values:
+            source = (
+                update(table)
+                .where(primary_key == row_id)
+                .values(**table_values)
+                .returning(*table.c)
+                .cte(f"{table.name}_update")
+            )
+        stmt = stmt.where(source.c[primary_key.name] == base_table.c.id)
+        columns += [column for column in source.c if column.name != primary_key.name]
+
+    base_values = {key: value for key, value in values.items() if key in base_table.c}
+    stmt = stmt.values(**base_values, updated_at=func.now()).returning(
+        *columns, *returning
+    )
+    return db.execute(stmt).one()
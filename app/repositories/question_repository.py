@@ -1,30 +1,224 @@
 import logging
-from typing import List
+import os
+from enum import Enum
+from typing import List, Optional
 
 from fastapi import HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import selectin_polymorphic
+from sqlalchemy import (
+    CTE,
+    Boolean,
+    ColumnElement,
+    Integer,
+    Row,
+    ScalarSelect,
+    Select,
+    SQLColumnExpression,
+    Table,
+    Text,
+    and_,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+    union,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import (
+    REGCONFIG,
+    TSVECTOR,
+    aggregate_order_by,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import (
+    selectin_polymorphic,
+    selectinload,
+    subqueryload,
+    with_polymorphic,
+)
+from sqlalchemy.orm.interfaces import ORMOption
 
+from app.data.env_consts import (
+    FACET_CACHE_MAX_SIZE,
+    FACET_CACHE_TTL_SECONDS,
+    PASSAGE_CACHE_TTL_SECONDS,
+)
 from app.data.question_enums import PassageType
 from app.database import SessionLocal
 from app.exceptions.exceptions import TagNotFoundException
 from app.models import question as question_models
 from app.models import tag as tag_models
+from app.models import test as test_models
+from app.repositories import (
+    patch_repository,
+    table_version_repository,
+    tag_repository,
+)
 from app.schemas import question as question_schemas
+from utils.cache_utils import TTLCache
+from utils.suggest_utils import SuggestIndex
 
+# Facet counts by filters and the versions of the tables they're counted from,
+# so any question change is seen straight away, by every worker
+facet_cache = TTLCache(
+    ttl_seconds=float(os.getenv(FACET_CACHE_TTL_SECONDS, "60")),
+    max_size=int(os.getenv(FACET_CACHE_MAX_SIZE, "256")),
+)
 
-def get_questions(db: SessionLocal):
-    loader_opt = selectin_polymorphic(
-        question_models.Question,
-        [question_models.FillInQuestion, question_models.MultipleChoiceQuestion],
+# Index of passage titles for autocomplete, cleared by the passage create and
+# update functions below and expiring for changes made through other workers
+passage_cache = TTLCache(
+    ttl_seconds=float(os.getenv(PASSAGE_CACHE_TTL_SECONDS, "300")), max_size=1
+)
+
+
+# question can be Question or QuestionRead, which have the same filter columns
+def apply_question_filters(
+    stmt: Select,
+    filters: question_schemas.QuestionFilters,
+    question=question_models.Question,
+) -> Select:
+    if filters.section:
+        stmt = stmt.where(question.section == filters.section)
+    if filters.sub_section:
+        stmt = stmt.where(question.sub_section == filters.sub_section)
+    if filters.usage:
+        stmt = stmt.where(question.usage == filters.usage)
+    if filters.q_type:
+        stmt = stmt.where(question.q_type == filters.q_type)
+    if filters.official_test_id is not None:
+        stmt = stmt.where(question.official_test_id == filters.official_test_id)
+    if filters.passage_id is not None:
+        stmt = stmt.where(question.passage_id == filters.passage_id)
+    # Questions having any of the requested tags
+    if filters.tag_ids:
+        question_tag = question_models.question_tag_table
+        stmt = stmt.where(
+            select(question_tag.c.question_id)
+            .where(
+                question_tag.c.question_id == question.id,
+                question_tag.c.tag_id.in_(filters.tag_ids),
+            )
+            # Only the question, question_tag may also be joined in the outer query
+            .correlate(question)
+            .exists()
+        )
+    return stmt
+
+
+# Loading plan for lists of questions, runs a fixed number of statements whatever
+# the number of rows: the subclass tables are LEFT OUTER JOINed into the question
+# query, then tags and multiple choice answers take one query each.
+# subqueryload is used over selectinload as selectinload batches 500 ids per query
+# See https://docs.sqlalchemy.org/en/20/orm/queryguide/relationships.html
+question_polymorphic = with_polymorphic(
+    question_models.Question,
+    [
+        question_models.FillInQuestion,
+        question_models.MultipleChoiceQuestion,
+        question_models.FillInImageQuestion,
+        question_models.MultipleChoiceImageQuestion,
+    ],
+)
+
+
+def question_list_load_options() -> list[ORMOption]:
+    return [
+        subqueryload(question_polymorphic.tags),
+        subqueryload(question_polymorphic.MultipleChoiceQuestion.answers),
+    ]
+
+
+# Keyset pagination on question id, see https://use-the-index-luke.com/no-offset
+# Returns the page and the cursor for the next page (None on the last page).
+# Without a limit every question after the cursor is returned.
+def get_questions(
+    db: SessionLocal,
+    filters: question_schemas.QuestionFilters,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = 100,
+) -> tuple[list[question_models.Question], Optional[int]]:
+    stmt = select(question_polymorphic)
+    stmt = apply_question_filters(stmt, filters)
+    if cursor is not None:
+        stmt = stmt.where(question_polymorphic.id > cursor)
+    stmt = stmt.order_by(question_polymorphic.id).options(*question_list_load_options())
+    if limit is not None:
+        # Fetch one extra row to find out if there is a next page
+        stmt = stmt.limit(limit + 1)
+    result = db.scalars(stmt).all()
+    if limit is not None and len(result) > limit:
+        result = result[:limit]
+        return result, result[-1].id
+    return result, None
+
+
+# Same as get_questions but from the question_read table in a single query.
+# Returns dicts of the question columns, with tags and answers as lists of dicts
+def get_questions_from_read_model(
+    db: SessionLocal,
+    filters: question_schemas.QuestionFilters,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = 100,
+) -> tuple[list[dict], Optional[int]]:
+    question_read = question_models.QuestionRead
+    stmt = apply_question_filters(
+        select(question_read.__table__), filters, question_read
     )
-    stmt = (
-        select(question_models.Question)
-        .order_by(question_models.Question.id)
-        .options(loader_opt)
+    if cursor is not None:
+        stmt = stmt.where(question_read.id > cursor)
+    stmt = stmt.order_by(question_read.id)
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    result = [dict(row) for row in db.execute(stmt).mappings()]
+    if limit is not None and len(result) > limit:
+        result = result[:limit]
+        return result, result[-1]["id"]
+    return result, None
+
+
+# Rows fetched per round trip when streaming, also the size of the
+# selectinload batches so each batch costs one query per relationship
+EXPORT_BATCH_SIZE = 500
+
+
+# Statements for streaming questions and their passages in batches through a
+# server side cursor, so memory use does not depend on the size of the bank
+# See https://docs.sqlalchemy.org/en/20/orm/queryguide/api.html#fetching-large-result-sets-with-yield-per # noqa: E501
+def get_question_export_stmt(filters: question_schemas.QuestionFilters) -> Select:
+    stmt = apply_question_filters(select(question_polymorphic), filters)
+    return (
+        stmt.order_by(question_polymorphic.id)
+        .options(
+            selectinload(question_polymorphic.tags),
+            selectinload(question_polymorphic.MultipleChoiceQuestion.answers),
+        )
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def get_passage_export_stmt(filters: question_schemas.QuestionFilters) -> Select:
+    passage_polymorphic = with_polymorphic(
+        question_models.Passage,
+        [question_models.ImagePassage, question_models.TextPassage],
+    )
+    passage_ids = apply_question_filters(
+        select(question_models.Question.passage_id), filters
+    )
+    return (
+        select(passage_polymorphic)
+        .where(passage_polymorphic.id.in_(passage_ids))
+        .order_by(passage_polymorphic.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
     )
-    result = db.scalars(stmt).all()
-    return result
 
 
 def create_fill_in_question(
@@ -125,6 +319,673 @@ def create_multiple_choice_image_question(
     return question_model
 
 
+def get_question_facets(
+    db: SessionLocal,
+    filters: question_schemas.QuestionFilters,
+    table_versions: Optional[dict[str, Row]] = None,
+) -> dict:
+    """Counts the filtered questions by each facet field in a single query, from
+    the cache when neither the questions nor their tags have changed since.
+    table_versions are versions already checked for the request, by table name."""
+    versions = table_version_repository.get_table_versions(
+        db,
+        [question_models.Question.__table__, question_models.question_tag_table],
+        table_versions,
+    )
+    key = (filters.json(), tuple(tuple(version) for version in versions))
+    return facet_cache.get_or_load(key, lambda: count_question_facets(db, filters))
+
+
+def count_question_facets(
+    db: SessionLocal, filters: question_schemas.QuestionFilters
+) -> dict:
+    question = question_models.Question
+    question_tag = question_models.question_tag_table
+    facet_columns: dict[str, SQLColumnExpression] = {
+        "section": question.section,
+        "sub_section": question.sub_section,
+        "usage": question.usage,
+        "q_type": question.q_type,
+        "official_test_id": question.official_test_id,
+        "tag_id": question_tag.c.tag_id,
+    }
+    columns = list(facet_columns.values())
+    # One grouping set per facet plus the empty set for the total. Joining the
+    # tags repeats questions, so questions are counted distinct.
+    # GROUPING() has a bit set for each column not grouped in the row's set
+    # See https://www.postgresql.org/docs/current/queries-table-expressions.html#QUERIES-GROUPING-SETS # noqa: E501
+    stmt = apply_question_filters(
+        select(
+            *columns,
+            func.grouping(*columns).label("grouping"),
+            func.count(question.id.distinct()).label("count"),
+        )
+        .outerjoin(question_tag, question_tag.c.question_id == question.id)
+        .group_by(
+            func.grouping_sets(*[tuple_(column) for column in columns], tuple_())
+        ),
+        filters,
+    )
+
+    # The facet of each grouping set is the one column with its bit clear
+    all_bits = 2 ** len(columns) - 1
+    facet_positions = {
+        all_bits ^ (1 << (len(columns) - 1 - position)): position
+        for position in range(len(columns))
+    }
+    facet_names = list(facet_columns)
+
+    facets: dict = {name: [] for name in facet_names}
+    total = 0
+    for row in db.execute(stmt):
+        if row.grouping == all_bits:
+            total = row.count
+            continue
+        position = facet_positions[row.grouping]
+        value = row[position]
+        facets[facet_names[position]].append(
+            {
+                "value": value.value if isinstance(value, Enum) else value,
+                "count": row.count,
+            }
+        )
+    for counts in facets.values():
+        counts.sort(key=lambda count: -count["count"])
+    return {"total": total, **facets}
+
+
+# Text search configuration of the search_vector columns in db_schema/schema.sql
+SEARCH_CONFIG = "english"
+SEARCH_HEADLINE_OPTIONS = (
+    "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+)
+
+
+# The search_vector columns are generated by PostgreSQL and not mapped on the
+# models, which are also created on SQLite for the tests
+def search_vector(table) -> ColumnElement:
+    return literal_column(f"{table.name}.search_vector", TSVECTOR)
+
+
+def search(
+    db: SessionLocal,
+    query_text: str,
+    filters: question_schemas.QuestionFilters,
+    limit: int = 20,
+    offset: int = 0,
+) -> dict:
+    """Full text search of question text, explanations, multiple choice answers
+    and passage text, best matches first. Uses the GIN indexed search_vector
+    columns to find and rank the hits, then builds highlighted snippets for the
+    page of hits only. Passages are limited to those of the filtered questions
+    when any filter is set.
+    See https://www.postgresql.org/docs/current/textsearch-controls.html
+    """
+    config = cast(SEARCH_CONFIG, REGCONFIG)
+    query = func.websearch_to_tsquery(config, query_text)
+    question = question_models.Question
+    text_question = question_models.TextQuestion.__table__
+    answer = question_models.MultipleChoiceAnswer.__table__
+    passage = question_models.Passage
+    text_passage = question_models.TextPassage.__table__
+
+    answer_rank = (
+        select(func.max(func.ts_rank(search_vector(answer), query)))
+        .where(
+            answer.c.question_id == question.id,
+            search_vector(answer).op("@@")(query),
+        )
+        .scalar_subquery()
+    )
+    # A union rather than an OR across the two tables, so each side is found
+    # with its GIN index
+    matches = union(
+        select(text_question.c.question_id).where(
+            search_vector(text_question).op("@@")(query)
+        ),
+        select(answer.c.question_id).where(search_vector(answer).op("@@")(query)),
+    ).subquery()
+    question_hits = apply_question_filters(
+        select(
+            literal("question").label("type"),
+            question.id.label("id"),
+            (
+                func.ts_rank(search_vector(text_question), query)
+                + func.coalesce(answer_rank, 0)
+            ).label("rank"),
+        )
+        .join(matches, matches.c.question_id == question.id)
+        .join(text_question, text_question.c.question_id == question.id),
+        filters,
+    )
+    passage_hits = (
+        select(
+            literal("passage").label("type"),
+            passage.id.label("id"),
+            func.ts_rank(search_vector(text_passage), query).label("rank"),
+        )
+        .join(text_passage, text_passage.c.passage_id == passage.id)
+        .where(search_vector(text_passage).op("@@")(query))
+    )
+    if filters.dict(exclude_none=True):
+        passage_hits = passage_hits.where(
+            passage.id.in_(apply_question_filters(select(question.passage_id), filters))
+        )
+
+    hits = union_all(question_hits, passage_hits).subquery()
+    page = db.execute(
+        select(hits, func.count().over().label("total"))
+        .order_by(hits.c.rank.desc(), hits.c.type, hits.c.id)
+        .limit(limit)
+        .offset(offset)
+    ).all()
+    if not page:
+        # Past the last page the window count isn't available
+        total = db.scalar(select(func.count()).select_from(hits)) if offset else 0
+        return {"items": [], "total": total}
+
+    question_ids = [hit.id for hit in page if hit.type == "question"]
+    passage_ids = [hit.id for hit in page if hit.type == "passage"]
+    answer_texts = (
+        select(func.string_agg(answer.c.answer_text, " / "))
+        .where(answer.c.question_id == question.id)
+        .scalar_subquery()
+    )
+    question_snippets = {
+        row.id: row
+        for row in db.execute(
+            select(
+                question.id,
+                question.q_type,
+                func.ts_headline(
+                    config,
+                    func.concat_ws(
+                        " ... ",
+                        text_question.c.question_text,
+                        text_question.c.explanation,
+                        answer_texts,
+                    ),
+                    query,
+                    SEARCH_HEADLINE_OPTIONS,
+                ).label("snippet"),
+            )
+            .join(text_question, text_question.c.question_id == question.id)
+            .where(question.id.in_(question_ids))
+        )
+    }
+    passage_snippets = {
+        row.id: row
+        for row in db.execute(
+            select(
+                passage.id,
+                passage.title,
+                func.ts_headline(
+                    config, text_passage.c.passage_text, query, SEARCH_HEADLINE_OPTIONS
+                ).label("snippet"),
+            )
+            .join(text_passage, text_passage.c.passage_id == passage.id)
+            .where(passage.id.in_(passage_ids))
+        )
+    }
+
+    # Snippet rows have the id, snippet and q_type or title of each hit
+    items = [
+        {
+            "type": hit.type,
+            "rank": hit.rank,
+            **(question_snippets if hit.type == "question" else passage_snippets)[
+                hit.id
+            ]._asdict(),
+        }
+        for hit in page
+    ]
+    return {"items": items, "total": page[0].total}
+
+
+# Model inserted for each type of question in a bulk import
+BULK_QUESTION_MODELS: dict[
+    question_models.QuestionType, type[question_models.Question]
+] = {
+    question_models.QuestionType.FILL_IN: question_models.FillInQuestion,
+    question_models.QuestionType.MULTIPLE_CHOICE: (
+        question_models.MultipleChoiceQuestion
+    ),
+    question_models.QuestionType.FILL_IN_IMAGE: question_models.FillInImageQuestion,
+    question_models.QuestionType.MULTIPLE_CHOICE_IMAGE: (
+        question_models.MultipleChoiceImageQuestion
+    ),
+}
+
+
+def get_existing_ids(db: SessionLocal, id_column, ids: set[int]) -> set[int]:
+    if not ids:
+        return set()
+    return set(db.scalars(select(id_column).where(id_column.in_(ids))))
+
+
+def get_bulk_question_errors(
+    question: question_schemas.QuestionCreate,
+    tag_ids: set[int],
+    passage_ids: set[int],
+    official_test_ids: set[int],
+) -> list[str]:
+    """Checks a question in a bulk import against the rows that exist and the
+    constraints the database would otherwise fail the whole batch on."""
+    errors = []
+    missing_tag_ids = sorted({tag.id for tag in question.tags} - tag_ids)
+    if missing_tag_ids:
+        errors.append(f"Tags not found, ids: {missing_tag_ids}")
+    if question.passage_id is not None and question.passage_id not in passage_ids:
+        errors.append(f"Passage not found, id: {question.passage_id}")
+    if question.official_test_id not in official_test_ids:
+        errors.append(f"Official test not found, id: {question.official_test_id}")
+    if isinstance(question, question_schemas.MultipleChoiceQuestionCreate):
+        errors += get_answer_errors(question.answers)
+    if isinstance(question, question_schemas.MultipleChoiceImageQuestionCreate):
+        if question.correct_choice not in range(1, 5):
+            errors.append("Correct choice must be between 1 and 4")
+    return errors
+
+
+# The answers of a question as a set, as the database only enforces at most one
+# correct answer, once per statement
+def get_answer_errors(
+    answers: list[question_schemas.MultipleChoiceAnswerCreate],
+) -> list[str]:
+    errors = []
+    choice_numbers = [answer.choice_number for answer in answers]
+    if any(number not in range(1, 5) for number in choice_numbers):
+        errors.append("Answer choice numbers must be between 1 and 4")
+    if len(set(choice_numbers)) != len(choice_numbers):
+        errors.append("Answer choice numbers must be unique")
+    correct_count = sum(answer.is_correct for answer in answers)
+    if correct_count > 1:
+        errors.append("More than one correct answer")
+    elif correct_count == 0:
+        errors.append("No correct answer")
+    return errors
+
+
+def upsert_answers(
+    db: SessionLocal,
+    question_id: int,
+    answers: list[question_schemas.MultipleChoiceAnswerCreate],
+):
+    """Replaces the answers of a multiple choice question with the sent answers,
+    writing only the rows that change. Choices that weren't sent are deleted,
+    the others are inserted or updated with one INSERT ... ON CONFLICT that skips
+    unchanged rows. Nothing is written for a question that isn't multiple choice.
+    """
+    errors = get_answer_errors(answers)
+    if errors:
+        raise HTTPException(400, "; ".join(errors))
+    answer = question_models.MultipleChoiceAnswer.__table__
+    question = question_models.Question.__table__
+
+    choice_numbers = [sent_answer.choice_number for sent_answer in answers]
+    if set(choice_numbers) != set(range(1, 5)):
+        db.execute(
+            delete(answer).where(
+                answer.c.question_id == question_id,
+                answer.c.choice_number.not_in(choice_numbers),
+            )
+        )
+
+    sent = values(
+        column("choice_number", Integer),
+        column("answer_text", Text),
+        column("is_correct", Boolean),
+        name="sent_answer",
+    ).data(
+        [
+            (sent_answer.choice_number, sent_answer.answer_text, sent_answer.is_correct)
+            for sent_answer in answers
+        ]
+    )
+    # Through question so answers are only written for a multiple choice question
+    rows = (
+        select(
+            question.c.id, sent.c.choice_number, sent.c.answer_text, sent.c.is_correct
+        )
+        .join_from(sent, question, question.c.id == question_id)
+        .where(question.c.q_type == question_models.QuestionType.MULTIPLE_CHOICE)
+    )
+    stmt = postgresql_insert(answer).from_select(
+        ["question_id", "choice_number", "answer_text", "is_correct"], rows
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[answer.c.question_id, answer.c.choice_number],
+        set_={
+            "answer_text": stmt.excluded.answer_text,
+            "is_correct": stmt.excluded.is_correct,
+            "updated_at": func.now(),
+        },
+        where=tuple_(answer.c.answer_text, answer.c.is_correct).is_distinct_from(
+            tuple_(stmt.excluded.answer_text, stmt.excluded.is_correct)
+        ),
+    )
+    db.execute(stmt)
+
+
+def insert_joined_rows(
+    db: SessionLocal, model: type[question_models.Question], rows: list[dict]
+) -> list[int]:
+    """Inserts questions of a joined inheritance model, one multi-row INSERT per
+    table in the hierarchy, and returns their ids in the order of rows. The
+    question rows RETURNING the new ids, the subclass rows reusing them."""
+    base_table, *subclass_tables = patch_repository.get_inheritance_tables(model)
+    question_ids = db.scalars(
+        insert(base_table).returning(base_table.c.id, sort_by_parameter_order=True),
+        [
+            {key: value for key, value in row.items() if key in base_table.c}
+            for row in rows
+        ],
+    ).all()
+    for table in subclass_tables:
+        db.execute(
+            insert(table),
+            [
+                {
+                    "question_id": question_id,
+                    **{key: value for key, value in row.items() if key in table.c},
+                }
+                for question_id, row in zip(question_ids, rows)
+            ],
+        )
+    return question_ids
+
+
+def create_questions_bulk(
+    db: SessionLocal,
+    questions: list[question_schemas.BulkQuestionCreate],
+    strict: bool = False,
+) -> dict[str, list[dict]]:
+    """Creates many questions of any type in one transaction with a fixed number
+    of statements: one lookup each for tags, passages and official tests, a
+    batched INSERT ... RETURNING per question type and table, then the answers
+    and question tags. Invalid questions are reported and skipped, or in strict
+    mode fail the whole import with a 400.
+    """
+    items = [question.__root__ for question in questions]
+    tag_ids = get_existing_ids(
+        db, tag_models.Tag.id, {tag.id for item in items for tag in item.tags}
+    )
+    passage_ids = get_existing_ids(
+        db,
+        question_models.Passage.id,
+        {item.passage_id for item in items if item.passage_id is not None},
+    )
+    official_test_ids = get_existing_ids(
+        db,
+        test_models.OfficialTest.id,
+        {item.official_test_id for item in items},
+    )
+
+    errors = []
+    valid_indexes = []
+    for index, item in enumerate(items):
+        item_errors = get_bulk_question_errors(
+            item, tag_ids, passage_ids, official_test_ids
+        )
+        if item_errors:
+            errors.append({"index": index, "detail": "; ".join(item_errors)})
+        else:
+            valid_indexes.append(index)
+    if strict and errors:
+        raise HTTPException(400, {"created": [], "errors": errors})
+
+    created = []
+    answer_rows = []
+    question_tag_rows = []
+    for q_type, model in BULK_QUESTION_MODELS.items():
+        indexes = [index for index in valid_indexes if items[index].q_type == q_type]
+        if not indexes:
+            continue
+        question_ids = insert_joined_rows(
+            db,
+            model,
+            [items[index].dict(exclude={"tags", "answers"}) for index in indexes],
+        )
+        for index, question_id in zip(indexes, question_ids):
+            item = items[index]
+            created.append({"index": index, "id": question_id})
+            question_tag_rows += [
+                {"question_id": question_id, "tag_id": tag_id}
+                for tag_id in dict.fromkeys(tag.id for tag in item.tags)
+            ]
+            if q_type == question_models.QuestionType.MULTIPLE_CHOICE:
+                answer_rows += [
+                    {"question_id": question_id, **answer.dict()}
+                    for answer in item.answers
+                ]
+
+    if answer_rows:
+        db.execute(insert(question_models.MultipleChoiceAnswer), answer_rows)
+    if question_tag_rows:
+        db.execute(insert(question_models.question_tag_table), question_tag_rows)
+    db.commit()
+
+    created.sort(key=lambda question: question["index"])
+    return {"created": created, "errors": errors}
+
+
+def get_bulk_update_errors(
+    db: SessionLocal, question_update: question_schemas.QuestionUpdate
+) -> list[str]:
+    errors = []
+    if question_update.tags:
+        tag_ids = {tag.id for tag in question_update.tags}
+        missing_tag_ids = sorted(
+            tag_ids - get_existing_ids(db, tag_models.Tag.id, tag_ids)
+        )
+        if missing_tag_ids:
+            errors.append(f"Tags not found, ids: {missing_tag_ids}")
+    passage_id = question_update.passage_id
+    if passage_id is not None and not get_existing_ids(
+        db, question_models.Passage.id, {passage_id}
+    ):
+        errors.append(f"Passage not found, id: {passage_id}")
+    official_test_id = question_update.official_test_id
+    if official_test_id is not None and not get_existing_ids(
+        db, test_models.OfficialTest.id, {official_test_id}
+    ):
+        errors.append(f"Official test not found, id: {official_test_id}")
+    return errors
+
+
+def update_questions_bulk(
+    db: SessionLocal,
+    bulk_update: question_schemas.BulkQuestionUpdate,
+    dry_run: bool = False,
+) -> dict:
+    """Applies one partial update to every selected question in one transaction,
+    with a fixed number of statements whatever the number of questions: a count
+    of the selection, one UPDATE ... RETURNING of the question table and, when
+    tags are sent, one DELETE and one INSERT of question tags. Questions the
+    update wouldn't change aren't written. A dry run returns the same summary
+    without writing.
+    """
+    filters = bulk_update.filters
+    if bulk_update.ids is None and not (filters and filters.dict(exclude_none=True)):
+        raise HTTPException(400, "Select the questions to update by ids or filters")
+    question_update = bulk_update.update
+    values = question_update.dict(exclude_unset=True, exclude={"tags"})
+    tag_ids = sorted({tag.id for tag in question_update.tags or []})
+    if not values and not tag_ids:
+        raise HTTPException(400, "No fields to update")
+    errors = get_bulk_update_errors(db, question_update)
+    if errors:
+        raise HTTPException(400, "; ".join(errors))
+
+    question = question_models.Question.__table__
+    question_tag = question_models.question_tag_table
+    selected = select(question_models.Question.id)
+    if bulk_update.ids is not None:
+        selected = selected.where(question_models.Question.id.in_(bulk_update.ids))
+    if filters:
+        selected = apply_question_filters(selected, filters)
+
+    changes = [question.c[key].is_distinct_from(value) for key, value in values.items()]
+    if tag_ids:
+        # Has a tag that wasn't sent, or is missing one that was
+        changes.append(
+            or_(
+                select(question_tag.c.question_id)
+                .where(
+                    question_tag.c.question_id == question.c.id,
+                    question_tag.c.tag_id.not_in(tag_ids),
+                )
+                .correlate(question)
+                .exists(),
+                select(func.count())
+                .where(
+                    question_tag.c.question_id == question.c.id,
+                    question_tag.c.tag_id.in_(tag_ids),
+                )
+                .correlate(question)
+                .scalar_subquery()
+                != len(tag_ids),
+            )
+        )
+    changed = and_(question.c.id.in_(selected), or_(*changes))
+
+    matched = db.scalar(select(func.count()).select_from(selected.subquery()))
+    if dry_run:
+        question_ids = db.scalars(select(question.c.id).where(changed)).all()
+        return {
+            "matched": matched,
+            "updated": len(question_ids),
+            "ids": sorted(question_ids),
+            "dry_run": True,
+        }
+
+    # Before the tag changes, which the tag condition reads
+    question_ids = db.scalars(
+        update(question)
+        .where(changed)
+        .values(**values, updated_at=func.now())
+        .returning(question.c.id)
+    ).all()
+    if tag_ids and question_ids:
+        # By the updated ids, as the update may have changed the columns the
+        # selection filters on. Questions left unchanged already have these tags
+        db.execute(
+            delete(question_tag).where(
+                question_tag.c.question_id.in_(question_ids),
+                question_tag.c.tag_id.not_in(tag_ids),
+            )
+        )
+        tag = tag_models.Tag.__table__
+        new_tags = (
+            select(question.c.id, tag.c.id)
+            .join_from(question, tag, tag.c.id.in_(tag_ids))
+            .where(
+                question.c.id.in_(question_ids),
+                ~select(question_tag.c.question_id)
+                .where(
+                    question_tag.c.question_id == question.c.id,
+                    question_tag.c.tag_id == tag.c.id,
+                )
+                .correlate(question, tag)
+                .exists(),
+            )
+        )
+        db.execute(
+            insert(question_tag).from_select(["question_id", "tag_id"], new_tags)
+        )
+    db.commit()
+
+    return {
+        "matched": matched,
+        "updated": len(question_ids),
+        "ids": sorted(question_ids),
+        "dry_run": False,
+    }
+
+
+def change_question_tags(
+    db: SessionLocal,
+    change: question_schemas.QuestionTagsChange,
+    changed_rows: CTE,
+) -> dict[str, list[dict]]:
+    """Runs changed_rows, an INSERT or DELETE of question_tag returning its rows,
+    in one statement that also bumps the changed questions' updated_at and counts
+    the changed rows by tag. Postgres only."""
+    question = question_models.Question.__table__
+    touched = (
+        update(question)
+        .where(question.c.id.in_(select(changed_rows.c.question_id)))
+        .values(updated_at=func.now())
+        .returning(question.c.id)
+        .cte("question_touch")
+    )
+    stmt = (
+        select(changed_rows.c.tag_id, func.count())
+        .group_by(changed_rows.c.tag_id)
+        .add_cte(touched)
+    )
+    counts = dict(db.execute(stmt).all())
+    db.commit()
+    return {
+        "tags": [
+            {"tag_id": tag_id, "count": counts.get(tag_id, 0)}
+            for tag_id in dict.fromkeys(change.tag_ids)
+        ]
+    }
+
+
+def validate_question_tags_change(
+    db: SessionLocal, change: question_schemas.QuestionTagsChange
+):
+    missing_tag_ids = sorted(
+        set(change.tag_ids)
+        - get_existing_ids(db, tag_models.Tag.id, set(change.tag_ids))
+    )
+    if missing_tag_ids:
+        raise HTTPException(400, f"Tags not found, ids: {missing_tag_ids}")
+
+
+def add_question_tags(
+    db: SessionLocal, change: question_schemas.QuestionTagsChange
+) -> dict[str, list[dict]]:
+    """Tags every question with every tag with one INSERT ... SELECT, skipping
+    the pairs that exist and questions that don't."""
+    validate_question_tags_change(db, change)
+    question = question_models.Question.__table__
+    question_tag = question_models.question_tag_table
+    tag = tag_models.Tag.__table__
+    new_rows = (
+        select(question.c.id, tag.c.id)
+        .join_from(question, tag, tag.c.id.in_(change.tag_ids))
+        .where(question.c.id.in_(change.question_ids))
+    )
+    inserted = (
+        postgresql_insert(question_tag)
+        .from_select(["question_id", "tag_id"], new_rows)
+        .on_conflict_do_nothing()
+        .returning(question_tag.c.question_id, question_tag.c.tag_id)
+        .cte("question_tag_insert")
+    )
+    return change_question_tags(db, change, inserted)
+
+
+def remove_question_tags(
+    db: SessionLocal, change: question_schemas.QuestionTagsChange
+) -> dict[str, list[dict]]:
+    validate_question_tags_change(db, change)
+    question_tag = question_models.question_tag_table
+    deleted = (
+        delete(question_tag)
+        .where(
+            question_tag.c.question_id.in_(change.question_ids),
+            question_tag.c.tag_id.in_(change.tag_ids),
+        )
+        .returning(question_tag.c.question_id, question_tag.c.tag_id)
+        .cte("question_tag_delete")
+    )
+    return change_question_tags(db, change, deleted)
+
+
 # See https://sqlmodel.tiangolo.com/tutorial/fastapi/update/#create-the-update-path-operation # noqa: E501
 # For the type[question_models.Question] see https://mypy.readthedocs.io/en/stable/kinds_of_types.html#the-type-of-class-objects # noqa: E501
 def update_question(
@@ -132,7 +993,9 @@ def update_question(
     question_id: int,
     question_update: question_schemas.QuestionUpdate,
     question_class: type[question_models.Question],
-) -> question_models.Question:
+) -> question_models.Question | dict:
+    if patch_repository.PATCH_RETURNING:
+        return patch_question(db, question_id, question_update, question_class)
     question_model = db.get(question_class, question_id)
     if not question_model:
         raise HTTPException(400, f"Question not found, id: {question_id}")
@@ -140,6 +1003,9 @@ def update_question(
     for key, value in question_data.items():
         if key != "tags" and key != "answers":
             setattr(question_model, key, value)
+    # Subclass only changes don't update the question table, bump updated_at
+    # so it (and the list ETag) reflects every change
+    question_model.updated_at = func.now()
 
     # if tags field is sent, replace all existing tags with the sent tags
     if question_update.tags:
@@ -147,30 +1013,126 @@ def update_question(
 
     db.add(question_model)
 
-    # Handling multiple choice answers- maybe we should split this out
+    # If answers are sent, replace all existing answers with the sent answers.
+    # The answers aren't loaded, they're read after the commit for the response.
     if (
         question_class == question_models.MultipleChoiceQuestion
         and question_update.answers
     ):
-        # If answers are sent, replace all existing answers with the sent answers
-        question_model.answers.clear()
-        # If we don't flush here a SQL update is run which can trigger
-        # the only one correct answer check constraint
-        db.flush()
+        upsert_answers(db, question_id, question_update.answers)
 
-        question_model.answers.extend(
-            [
-                question_models.MultipleChoiceAnswer(
-                    choice_number=answer.choice_number,
-                    answer_text=answer.answer_text,
-                    is_correct=answer.is_correct,
-                )
-                for answer in question_update.answers
-            ]
+    db.commit()
+    return question_model
+
+
+def json_rows(
+    table: Table, where: ColumnElement[bool], order_by: ColumnElement
+) -> ScalarSelect:
+    """A JSON array of the table's rows matching where, for a RETURNING clause."""
+    row_json = func.json_build_object(
+        *[item for column in table.c for item in (column.name, column)]
+    )
+    return (
+        select(
+            func.coalesce(
+                func.json_agg(aggregate_order_by(row_json, order_by)),
+                literal_column("'[]'::json"),
+            )
+        )
+        .where(where)
+        .correlate_except(table)
+        .scalar_subquery()
+    )
+
+
+def patch_question(
+    db: SessionLocal,
+    question_id: int,
+    question_update: question_schemas.QuestionUpdate,
+    question_class: type[question_models.Question],
+) -> dict:
+    """update_question with UPDATE ... RETURNING, one statement updating the
+    question's tables and tags, and returning them with its answers. Sent answers
+    are upserted first, see upsert_answers. The response is built from the
+    returned rows, instead of selecting the question before the update and
+    reloading it after the commit.
+    """
+    question_data = question_update.dict(
+        exclude_unset=True, exclude={"tags", "answers"}
+    )
+    question = question_models.Question.__table__
+    question_tag = question_models.question_tag_table
+    answer = question_models.MultipleChoiceAnswer.__table__
+    tag = tag_models.Tag.__table__
+    is_multiple_choice = question_class == question_models.MultipleChoiceQuestion
+    ctes, returning = [], []
+
+    # if tags field is sent, replace all existing tags with the sent tags
+    tag_ids = None
+    if question_update.tags:
+        tag_ids = sorted({tag_reference.id for tag_reference in question_update.tags})
+        ctes.append(
+            delete(question_tag)
+            .where(
+                question_tag.c.question_id == question_id,
+                question_tag.c.tag_id.not_in(tag_ids),
+            )
+            .cte("question_tag_delete")
+        )
+        # Through question and tag so a missing question or tag is a 400, not a
+        # foreign key error
+        new_tags = (
+            select(question.c.id, tag.c.id)
+            .join_from(question, tag, tag.c.id.in_(tag_ids))
+            .where(question.c.id == question_id)
+        )
+        ctes.append(
+            postgresql_insert(question_tag)
+            .from_select(["question_id", "tag_id"], new_tags)
+            .on_conflict_do_nothing()
+            .cte("question_tag_insert")
         )
+        # The statement's CTEs aren't visible to its RETURNING, so the sent tags
+        # are read from tag, not question_tag
+        tag_filter = tag.c.id.in_(tag_ids)
+    else:
+        tag_filter = tag.c.id.in_(
+            select(question_tag.c.tag_id)
+            .where(question_tag.c.question_id == question.c.id)
+            .correlate(question)
+        )
+    returning.append(json_rows(tag, tag_filter, tag.c.id).label("tags"))
+
+    if is_multiple_choice:
+        # Before the question's statement, which returns the answers
+        if question_update.answers:
+            upsert_answers(db, question_id, question_update.answers)
+        returning.append(
+            json_rows(
+                answer, answer.c.question_id == question.c.id, answer.c.choice_number
+            ).label("answers")
+        )
+
+    try:
+        row = patch_repository.patch_joined_row(
+            db,
+            question_class,
+            question_id,
+            question_data,
+            tuple(returning),
+            tuple(ctes),
+        )
+    except NoResultFound:
+        raise HTTPException(400, f"Question not found, id: {question_id}")
+    question_data = row._asdict()
+    if tag_ids is not None and len(question_data["tags"]) != len(tag_ids):
+        message = f"Could not find all tags in database- requested tag IDs: {tag_ids}"
+        logging.warning(message)
+        # The session is rolled back when it's closed
+        raise TagNotFoundException(message)
 
     db.commit()
-    return question_model
+    return question_data
 
 
 def get_tags(
@@ -180,7 +1142,24 @@ def get_tags(
     tag_ids = []
     if question.tags:
         tag_ids = [tag.id for tag in question.tags]
-    tags = db.query(tag_models.Tag).filter(tag_models.Tag.id.in_(tag_ids)).all()
+    return get_tags_by_ids(db, tag_ids)
+
+
+def get_tags_by_ids(db: SessionLocal, tag_ids: list[int]) -> List[tag_models.Tag]:
+    # A tag sent twice is added once, not once per question_tag primary key
+    tag_ids = list(dict.fromkeys(tag_ids))
+    tags_by_id = tag_repository.get_tags_by_id(db)
+    # Copies of the cached tags attached to this session without a query
+    tags = [
+        db.merge(tags_by_id[tag_id], load=False)
+        for tag_id in tag_ids
+        if tag_id in tags_by_id
+    ]
+    missing_tag_ids = [tag_id for tag_id in tag_ids if tag_id not in tags_by_id]
+    if missing_tag_ids:
+        # The cache may not have tags created through another worker yet
+        stmt = select(tag_models.Tag).where(tag_models.Tag.id.in_(missing_tag_ids))
+        tags += db.scalars(stmt).all()
     if len(tags) != len(tag_ids):
         message = f"Could not find all tags in database- requested tag IDs: {tag_ids}"
         logging.warning(message)
@@ -202,6 +1181,30 @@ def get_passages(db: SessionLocal) -> list[question_models.Passage]:
     return result
 
 
+def get_passage_suggest_index(db: SessionLocal) -> SuggestIndex[tuple]:
+    def build_index():
+        rows = db.execute(
+            select(
+                question_models.Passage.id,
+                question_models.Passage.title,
+                question_models.Passage.p_type,
+            )
+        )
+        return SuggestIndex((tuple(row), row.title) for row in rows)
+
+    return passage_cache.get_or_load("title_index", build_index)
+
+
+# Autocomplete on passage title, served from the cached index without a query
+def suggest_passages(db: SessionLocal, query: str, limit: int) -> list[dict]:
+    return [
+        {"id": passage_id, "title": title, "p_type": p_type}
+        for passage_id, title, p_type in get_passage_suggest_index(db).suggest(
+            query, limit
+        )
+    ]
+
+
 def create_image_passage(
     db: SessionLocal, passage: question_schemas.ImagePassageCreate
 ) -> question_models.ImagePassage:
@@ -217,6 +1220,7 @@ def create_image_passage(
 
     db.add(passage_model)
     db.commit()
+    passage_cache.invalidate()
 
     return passage_model
 
@@ -236,6 +1240,7 @@ def create_text_passage(
 
     db.add(passage_model)
     db.commit()
+    passage_cache.invalidate()
 
     return passage_model
 
@@ -245,15 +1250,39 @@ def update_passage(
     passage_id: int,
     passage_update: question_schemas.PassageUpdate,
     passage_class: type[question_models.Passage],
-) -> question_models.Passage:
+) -> question_models.Passage | dict:
+    if patch_repository.PATCH_RETURNING:
+        return patch_passage(db, passage_id, passage_update, passage_class)
     passage_model = db.get(passage_class, passage_id)
     if not passage_model:
         raise HTTPException(400, f"Passage not found, id: {passage_id}")
     passage_data = passage_update.dict(exclude_unset=True)
     for key, value in passage_data.items():
         setattr(passage_model, key, value)
+    passage_model.updated_at = func.now()
 
     db.add(passage_model)
 
     db.commit()
+    passage_cache.invalidate()
     return passage_model
+
+
+# update_passage with a single UPDATE ... RETURNING, see patch_question
+def patch_passage(
+    db: SessionLocal,
+    passage_id: int,
+    passage_update: question_schemas.PassageUpdate,
+    passage_class: type[question_models.Passage],
+) -> dict:
+    passage_data = passage_update.dict(exclude_unset=True)
+    try:
+        row = patch_repository.patch_joined_row(
+            db, passage_class, passage_id, passage_data
+        )
+    except NoResultFound:
+        raise HTTPException(400, f"Passage not found, id: {passage_id}")
+
+    db.commit()
+    passage_cache.invalidate()
+    return row._asdict()
@@ -0,0 +1,41 @@
+from collections import defaultdict
+from enum import Enum
+from typing import Any, Optional
+
+from app.database import SessionLocal
+from app.repositories import question_repository, tag_repository
+from app.schemas import question as question_schemas
+from utils.serializer_utils import compile_serializer
+
+serialize_question = compile_serializer(question_schemas.QuestionWithAnswers)
+serialize_passage = compile_serializer(question_schemas.PassageUnion)
+
+
+def get_shard_name(
+    kind: str, section: Optional[Enum], official_test_id: Optional[int]
+) -> str:
+    section_part = section.value if section else "no-section"
+    test_part = f"test-{official_test_id}" if official_test_id else "no-test"
+    return f"{kind}/{section_part}/{test_part}"
+
+
+def get_snapshot_content(db: SessionLocal) -> dict[str, list[Any]]:
+    """Every question, passage and the taxonomy as their API JSON, by shard name.
+    Questions and passages are partitioned by section and official test, each
+    ordered by id."""
+    content: defaultdict[str, list[Any]] = defaultdict(list)
+    filters = question_schemas.QuestionFilters()
+
+    question_stmt = question_repository.get_question_export_stmt(filters)
+    for question in db.scalars(question_stmt):
+        name = get_shard_name("questions", question.section, question.official_test_id)
+        content[name].append(serialize_question(question))
+
+    for passage in question_repository.get_passages(db):
+        name = get_shard_name("passages", passage.section, passage.official_test_id)
+        content[name].append(serialize_passage(passage))
+
+    content["taxonomy"] = [
+        category.dict(by_alias=True) for category in tag_repository.get_taxonomy(db)
+    ]
+    return dict(content)
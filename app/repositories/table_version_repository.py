@@ -0,0 +1,28 @@
+from typing import Optional
+
+from sqlalchemy import Row, Table, func, select, union_all
+
+from app.database import SessionLocal
+
+
+# Row count and latest updated_at of each table, in the order given
+# The count catches deletes, which don't move max(updated_at)
+def get_table_versions(
+    db: SessionLocal, tables: list[Table], known: Optional[dict[str, Row]] = None
+) -> list[Row]:
+    """Versions in known, by table name, aren't queried again, e.g. those
+    conditional_get checked for the request."""
+    known = known or {}
+    missing = [table for table in tables if table.name not in known]
+    if missing:
+        stmt = union_all(
+            *[
+                select(func.count(), func.max(table.c.updated_at)).select_from(table)
+                for table in missing
+            ]
+        )
+        known = {
+            **known,
+            **dict(zip([table.name for table in missing], db.execute(stmt))),
+        }
+    return [known[table.name] for table in tables]
@@ -1,33 +1,194 @@
+import os
+from collections import defaultdict
+from typing import Optional
+
 from fastapi import HTTPException
-from sqlalchemy import select
+from fastapi_camelcase import CamelModel
+from sqlalchemy import Row, Table, func, select
 
+from app.data.env_consts import (
+    TAXONOMY_CACHE_MAX_SIZE,
+    TAXONOMY_CACHE_TTL_SECONDS,
+)
 from app.database import SessionLocal
 from app.models import tag as tag_models
+from app.models.question import question_tag_table
+from app.repositories import patch_repository
 from app.schemas import tag as tag_schemas
+from utils.cache_utils import TTLCache
+from utils.suggest_utils import SuggestIndex
+
+# Read-through cache of the taxonomy. The create and update functions below clear
+# it, and entries read for a conditional GET are keyed on the versions of their
+# tables, so changes made through another worker are seen on the next such read.
+taxonomy_cache = TTLCache(
+    ttl_seconds=float(os.getenv(TAXONOMY_CACHE_TTL_SECONDS, "300")),
+    max_size=int(os.getenv(TAXONOMY_CACHE_MAX_SIZE, "64")),
+)
+CATEGORY_TABLES = [tag_models.Category.__table__]
+SUBCATEGORY_TABLES = [tag_models.Subcategory.__table__]
+TAG_TABLES = [tag_models.Tag.__table__]
+RESOURCE_TABLES = [tag_models.Resource.__table__]
+TAXONOMY_TABLES = CATEGORY_TABLES + SUBCATEGORY_TABLES + TAG_TABLES + RESOURCE_TABLES
+
+
+def taxonomy_key(
+    name: str, tables: list[Table], table_versions: Optional[dict[str, Row]]
+) -> tuple:
+    """Key of an entry read from tables. table_versions are those conditional_get
+    checked for the request, by table name. Without the versions of every table,
+    e.g. for the tag lookups of question writes, the entry is only as fresh as
+    the TTL and this worker's writes, which saves querying them."""
+    table_versions = table_versions or {}
+    if any(table.name not in table_versions for table in tables):
+        return (name,)
+    return (name, *(tuple(table_versions[table.name]) for table in tables))
+
+
+def load_detached(db: SessionLocal, stmt) -> list:
+    # Cached instances are shared between requests, so they must not belong to
+    # a session that could expire or refresh them. They are detached with their
+    # columns loaded, use db.merge(instance, load=False) to attach a copy.
+    result = db.scalars(stmt).all()
+    for instance in result:
+        db.expunge(instance)
+    return result
 
 
-def get_categories(db: SessionLocal) -> list[tag_models.Category]:
+def get_categories(
+    db: SessionLocal, table_versions: Optional[dict[str, Row]] = None
+) -> list[tag_models.Category]:
     stmt = select(tag_models.Category).order_by(tag_models.Category.name)
-    result = db.scalars(stmt).all()
-    return result
+    return taxonomy_cache.get_or_load(
+        taxonomy_key("categories", CATEGORY_TABLES, table_versions),
+        lambda: load_detached(db, stmt),
+    )
 
 
-def get_subcategories(db: SessionLocal) -> list[tag_models.Subcategory]:
+def get_subcategories(
+    db: SessionLocal, table_versions: Optional[dict[str, Row]] = None
+) -> list[tag_models.Subcategory]:
     stmt = select(tag_models.Subcategory).order_by(tag_models.Subcategory.name)
-    result = db.scalars(stmt).all()
-    return result
+    return taxonomy_cache.get_or_load(
+        taxonomy_key("subcategories", SUBCATEGORY_TABLES, table_versions),
+        lambda: load_detached(db, stmt),
+    )
 
 
-def get_tags(db: SessionLocal) -> list[tag_models.Tag]:
+def get_tags(
+    db: SessionLocal, table_versions: Optional[dict[str, Row]] = None
+) -> list[tag_models.Tag]:
     stmt = select(tag_models.Tag).order_by(tag_models.Tag.name)
-    result = db.scalars(stmt).all()
-    return result
+    return taxonomy_cache.get_or_load(
+        taxonomy_key("tags", TAG_TABLES, table_versions),
+        lambda: load_detached(db, stmt),
+    )
+
+
+def get_tags_by_id(
+    db: SessionLocal, table_versions: Optional[dict[str, Row]] = None
+) -> dict[int, tag_models.Tag]:
+    return taxonomy_cache.get_or_load(
+        taxonomy_key("tags_by_id", TAG_TABLES, table_versions),
+        lambda: {tag.id: tag for tag in get_tags(db, table_versions)},
+    )
+
+
+def get_tag_suggest_index(
+    db: SessionLocal, table_versions: Optional[dict[str, Row]] = None
+) -> SuggestIndex[int]:
+    return taxonomy_cache.get_or_load(
+        taxonomy_key("tag_suggest_index", TAG_TABLES, table_versions),
+        lambda: SuggestIndex(
+            (tag.id, tag.name) for tag in get_tags(db, table_versions)
+        ),
+    )
+
+
+# Autocomplete for tag pickers, served from the cache without a query
+def suggest_tags(db: SessionLocal, query: str, limit: int) -> list[tag_models.Tag]:
+    tags_by_id = get_tags_by_id(db)
+    return [
+        tags_by_id[tag_id]
+        for tag_id in get_tag_suggest_index(db).suggest(query, limit)
+        # The index may be older than tags_by_id if the cache was just cleared
+        if tag_id in tags_by_id
+    ]
 
 
-def get_resources(db: SessionLocal) -> list[tag_models.Resource]:
+def get_resources(
+    db: SessionLocal, table_versions: Optional[dict[str, Row]] = None
+) -> list[tag_models.Resource]:
     stmt = select(tag_models.Resource).order_by(tag_models.Resource.id)
-    result = db.scalars(stmt).all()
-    return result
+    return taxonomy_cache.get_or_load(
+        taxonomy_key("resources", RESOURCE_TABLES, table_versions),
+        lambda: load_detached(db, stmt),
+    )
+
+
+def get_taxonomy(
+    db: SessionLocal,
+    include_question_counts: bool = False,
+    table_versions: Optional[dict[str, Row]] = None,
+) -> list[tag_schemas.TaxonomyCategory]:
+    taxonomy = taxonomy_cache.get_or_load(
+        taxonomy_key("taxonomy", TAXONOMY_TABLES, table_versions),
+        lambda: build_taxonomy(db, table_versions),
+    )
+    if not include_question_counts:
+        return taxonomy
+
+    # Counts change with every question write so they aren't cached
+    question_counts = get_tag_question_counts(db)
+    taxonomy = [category.copy(deep=True) for category in taxonomy]
+    for category in taxonomy:
+        for subcategory in category.subcategories:
+            for tag in subcategory.tags:
+                tag.question_count = question_counts.get(tag.id, 0)
+    return taxonomy
+
+
+# Assembles the tree from the (cached) flat lists, keeping their orderings
+def build_taxonomy(
+    db: SessionLocal, table_versions: Optional[dict[str, Row]]
+) -> list[tag_schemas.TaxonomyCategory]:
+    resources_by_tag_id = defaultdict(list)
+    for resource in get_resources(db, table_versions):
+        resources_by_tag_id[resource.tag_id].append(
+            tag_schemas.Resource.from_orm(resource)
+        )
+
+    tags_by_subcategory_id = defaultdict(list)
+    for tag in get_tags(db, table_versions):
+        tags_by_subcategory_id[tag.subcategory_id].append(
+            tag_schemas.TaxonomyTag(
+                **tag_schemas.Tag.from_orm(tag).dict(),
+                resources=resources_by_tag_id[tag.id],
+            )
+        )
+
+    subcategories_by_category_id = defaultdict(list)
+    for subcategory in get_subcategories(db, table_versions):
+        subcategories_by_category_id[subcategory.category_id].append(
+            tag_schemas.TaxonomySubcategory(
+                **tag_schemas.Subcategory.from_orm(subcategory).dict(),
+                tags=tags_by_subcategory_id[subcategory.id],
+            )
+        )
+
+    return [
+        tag_schemas.TaxonomyCategory(
+            **tag_schemas.Category.from_orm(category).dict(),
+            subcategories=subcategories_by_category_id[category.id],
+        )
+        for category in get_categories(db, table_versions)
+    ]
+
+
+def get_tag_question_counts(db: SessionLocal) -> dict[int, int]:
+    question_tag = question_tag_table
+    stmt = select(question_tag.c.tag_id, func.count()).group_by(question_tag.c.tag_id)
+    return {tag_id: count for tag_id, count in db.execute(stmt)}
 
 
 def create_category(
@@ -37,6 +198,7 @@ def create_category(
 
     db.add(category_model)
     db.commit()
+    taxonomy_cache.invalidate()
 
     return category_model
 
@@ -50,6 +212,7 @@ def create_subcategory(
 
     db.add(subcategory_model)
     db.commit()
+    taxonomy_cache.invalidate()
 
     return subcategory_model
 
@@ -59,6 +222,7 @@ def create_tag(db: SessionLocal, tag: tag_schemas.TagCreate) -> tag_models.Tag:
 
     db.add(tag_model)
     db.commit()
+    taxonomy_cache.invalidate()
 
     return tag_model
 
@@ -75,13 +239,16 @@ def create_resource(
 
     db.add(resource_model)
     db.commit()
+    taxonomy_cache.invalidate()
 
     return resource_model
 
 
 def update_category(
     db: SessionLocal, category_id: int, category_update: tag_schemas.CategoryUpdate
-) -> tag_models.Category:
+) -> tag_models.Category | dict:
+    if patch_repository.PATCH_RETURNING:
+        return patch_taxonomy_row(db, tag_models.Category, category_id, category_update)
     category_model = db.get(tag_models.Category, category_id)
     if not category_model:
         raise HTTPException(400, f"Passage not found, id: {category_id}")
@@ -92,6 +259,7 @@ def update_category(
     db.add(category_model)
 
     db.commit()
+    taxonomy_cache.invalidate()
     return category_model
 
 
@@ -99,7 +267,11 @@ def update_subcategory(
     db: SessionLocal,
     subcategory_id: int,
     subcategory_update: tag_schemas.SubcategoryUpdate,
-) -> tag_models.Subcategory:
+) -> tag_models.Subcategory | dict:
+    if patch_repository.PATCH_RETURNING:
+        return patch_taxonomy_row(
+            db, tag_models.Subcategory, subcategory_id, subcategory_update
+        )
     subcategory_model = db.get(tag_models.Subcategory, subcategory_id)
     if not subcategory_model:
         raise HTTPException(400, f"Passage not found, id: {subcategory_id}")
@@ -110,12 +282,15 @@ def update_subcategory(
     db.add(subcategory_model)
 
     db.commit()
+    taxonomy_cache.invalidate()
     return subcategory_model
 
 
 def update_tag(
     db: SessionLocal, tag_id: int, tag_update: tag_schemas.TagUpdate
-) -> tag_models.Tag:
+) -> tag_models.Tag | dict:
+    if patch_repository.PATCH_RETURNING:
+        return patch_taxonomy_row(db, tag_models.Tag, tag_id, tag_update)
     tag_model = db.get(tag_models.Tag, tag_id)
     if not tag_model:
         raise HTTPException(400, f"Passage not found, id: {tag_id}")
@@ -126,12 +301,15 @@ def update_tag(
     db.add(tag_model)
 
     db.commit()
+    taxonomy_cache.invalidate()
     return tag_model
 
 
 def update_resource(
     db: SessionLocal, resource_id: int, resource_update: tag_schemas.ResourceUpdate
-) -> tag_models.Resource:
+) -> tag_models.Resource | dict:
+    if patch_repository.PATCH_RETURNING:
+        return patch_taxonomy_row(db, tag_models.Resource, resource_id, resource_update)
     resource_model = db.get(tag_models.Resource, resource_id)
     if not resource_model:
         raise HTTPException(400, f"Passage not found, id: {resource_id}")
@@ -142,4 +320,18 @@ def update_resource(
     db.add(resource_model)
 
     db.commit()
+    taxonomy_cache.invalidate()
     return resource_model
+
+
+# The update functions above with a single UPDATE ... RETURNING
+def patch_taxonomy_row(
+    db: SessionLocal, model: type, row_id: int, update: CamelModel
+) -> dict:
+    row = patch_repository.patch_row(db, model, row_id, update.dict(exclude_unset=True))
+    if row is None:
+        raise HTTPException(400, f"{model.__name__} not found, id: {row_id}")
+
+    db.commit()
+    taxonomy_cache.invalidate()
+    return row._asdict()
@@ -0,0 +1,30 @@
+from fastapi import APIRouter
+
+from app import database
+from app.repositories import tag_repository
+from app.schemas import metrics as metrics_schemas
+from utils.image_manifest_utils import get_image_manifest
+
+router = APIRouter()
+
+
+@router.get("/metrics/db-pool")
+async def get_db_pool_metrics() -> metrics_schemas.DbPoolMetrics:
+    return metrics_schemas.DbPoolMetrics(
+        sync_engine=database.pool_metrics.stats(database.engine.pool),
+        async_engine=(
+            database.async_pool_metrics.stats(database.async_engine.sync_engine.pool)
+            if database.DB_ASYNC
+            else None
+        ),
+    )
+
+
+@router.get("/metrics/image-cache")
+async def get_image_cache_metrics() -> metrics_schemas.ImageCacheStats:
+    return metrics_schemas.ImageCacheStats(**get_image_manifest().stats())
+
+
+@router.get("/metrics/taxonomy-cache")
+async def get_taxonomy_cache_metrics() -> metrics_schemas.TaxonomyCacheStats:
+    return metrics_schemas.TaxonomyCacheStats(**tag_repository.taxonomy_cache.stats())
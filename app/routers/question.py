@@ -1,104 +1,524 @@
+import asyncio
+import io
 import logging
 import os
-
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
-
-from app.data.env_consts import SHSAT_IMAGE_BUCKET
-from app.data.question_enums import QuestionOrAnswer
-from app.database import SessionLocal, get_db
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator, Optional, Sequence, Union
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import Row
+
+from app.data.env_consts import (
+    FAST_LIST_RESPONSES,
+    IMAGE_LOCAL_COPY,
+    IMAGE_UPLOAD_FROM_MEMORY,
+    QUESTIONS_FROM_READ_MODEL,
+    SHSAT_IMAGE_BUCKET,
+)
+from app.data.question_enums import (
+    QuestionOrAnswer,
+    QuestionType,
+    Section,
+    SubSection,
+    UsageType,
+)
+from app.database import (
+    SessionLocal,
+    get_db,
+    run_db,
+    run_db_response,
+    stream_db,
+)
+from app.dependencies.conditional_get import (
+    conditional_get,
+    get_checked_table_versions,
+)
 from app.models import question as question_models
+from app.models import tag as tag_models
 from app.repositories import question_repository
 from app.schemas import question as question_schemas
+from utils import image_batch_utils
 from utils.file_utils import (
     generate_official_passage_local_image_path,
     generate_official_passage_s3_image_path,
     generate_official_question_local_image_path,
     generate_official_question_s3_image_path,
 )
-from utils.image_utils import process_images
-from utils.s3_utils import upload_file
+from utils.image_batch_utils import parse_image_batch, read_zip
+from utils.image_manifest_utils import (
+    get_image_manifest,
+    hash_image,
+    hash_inputs,
+    manifest_key,
+)
+from utils.image_utils import (
+    process_contents,
+    process_contents_in_memory,
+    save_image,
+)
+from utils.s3_utils import upload_fileobj
+from utils.serializer_utils import compile_serializer
 
 router = APIRouter()
 
+DEFAULT_QUESTION_PAGE_SIZE = 100
+MAX_QUESTION_PAGE_SIZE = 1000
+# Read question lists from the denormalized question_read table, one query
+# instead of the question, tag and answer queries of the ORM path
+QUESTION_LIST_FROM_READ_MODEL = (
+    os.getenv(QUESTIONS_FROM_READ_MODEL, "false").lower() == "true"
+)
+# Build question and passage list JSON with compiled serializers and orjson,
+# skipping validation against the response models. The output is the same.
+FAST_LIST_SERIALIZATION = os.getenv(FAST_LIST_RESPONSES, "false").lower() == "true"
+serialize_question = compile_serializer(question_schemas.QuestionWithAnswers)
+serialize_question_page = compile_serializer(question_schemas.QuestionPage)
+serialize_passage = compile_serializer(question_schemas.PassageUnion)
+# Compress uploaded images in memory and upload them from memory, instead of
+# through the processed image dir. The local copy is then written after the
+# response, unless turned off.
+IN_MEMORY_IMAGES = os.getenv(IMAGE_UPLOAD_FROM_MEMORY, "false").lower() == "true"
+LOCAL_IMAGE_COPY = os.getenv(IMAGE_LOCAL_COPY, "true").lower() == "true"
+
+
+def fast_list_response(content, response: Response) -> ORJSONResponse:
+    # Returning a response skips the response model, and the headers
+    # dependencies set on response, such as the ETag from conditional_get
+    return ORJSONResponse(content, headers=dict(response.headers))
+
+
+def get_question_filters(
+    section: Optional[Section] = None,
+    sub_section: Optional[SubSection] = None,
+    usage: Optional[UsageType] = None,
+    q_type: Optional[QuestionType] = None,
+    official_test_id: Optional[int] = None,
+    passage_id: Optional[int] = None,
+    tag_ids: Optional[list[int]] = Query(None),
+) -> question_schemas.QuestionFilters:
+    return question_schemas.QuestionFilters(
+        section=section,
+        sub_section=sub_section,
+        usage=usage,
+        q_type=q_type,
+        official_test_id=official_test_id,
+        passage_id=passage_id,
+        tag_ids=tag_ids,
+    )
 
-@router.get("/questions", response_model=list[question_schemas.QuestionWithAnswers])
-def get_questions(db: SessionLocal = Depends(get_db)):
-    return question_repository.get_questions(db)
 
+# Every question as a list, as before paging. Passing limit or cursor returns a
+# page instead, with the cursor of the next one, see the README.
+@router.get(
+    "/questions",
+    **run_db_response(
+        Union[list[question_schemas.QuestionWithAnswers], question_schemas.QuestionPage]
+    ),
+    dependencies=[
+        Depends(
+            conditional_get(
+                question_models.Question.__table__,
+                question_models.MultipleChoiceAnswer.__table__,
+                question_models.question_tag_table,
+                tag_models.Tag.__table__,
+            )
+        )
+    ],
+)
+async def get_questions(
+    response: Response,
+    filters: question_schemas.QuestionFilters = Depends(get_question_filters),
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_QUESTION_PAGE_SIZE),
+    db: SessionLocal = Depends(get_db),
+):
+    paged = cursor is not None or limit is not None
+
+    def get_question_list(db: SessionLocal):
+        get_questions = (
+            question_repository.get_questions_from_read_model
+            if QUESTION_LIST_FROM_READ_MODEL
+            else question_repository.get_questions
+        )
+        if not paged:
+            questions, _ = get_questions(db, filters, limit=None)
+            return questions
+        questions, next_cursor = get_questions(
+            db, filters, cursor, limit or DEFAULT_QUESTION_PAGE_SIZE
+        )
+        return {"items": questions, "next_cursor": next_cursor}
+
+    if FAST_LIST_SERIALIZATION:
+
+        def get_serialized_question_list(db: SessionLocal):
+            if not paged:
+                return [
+                    serialize_question(question) for question in get_question_list(db)
+                ]
+            return serialize_question_page(get_question_list(db))
+
+        questions = await run_db(db, get_serialized_question_list)
+        return fast_list_response(questions, response)
+
+    return await run_db(
+        db,
+        get_question_list,
+        response_model=(
+            question_schemas.QuestionPage
+            if paged
+            else list[question_schemas.QuestionWithAnswers]
+        ),
+    )
+
+
+MAX_SUGGESTIONS = 50
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+# Counts of the filtered questions by section, sub section, usage, question type,
+# official test and tag, for dashboards
+@router.get(
+    "/questions/facets",
+    dependencies=[
+        Depends(
+            conditional_get(
+                question_models.Question.__table__,
+                question_models.question_tag_table,
+            )
+        )
+    ],
+    **run_db_response(question_schemas.QuestionFacets),
+)
+async def get_question_facets(
+    filters: question_schemas.QuestionFilters = Depends(get_question_filters),
+    table_versions: dict[str, Row] = Depends(get_checked_table_versions),
+    db: SessionLocal = Depends(get_db),
+) -> question_schemas.QuestionFacets:
+    return await run_db(
+        db,
+        question_repository.get_question_facets,
+        filters,
+        table_versions,
+        response_model=question_schemas.QuestionFacets,
+    )
+
+
+# Full text search of questions and passages. q takes web search syntax:
+# "quoted phrases", or, and -excluded words
+@router.get("/search", **run_db_response(question_schemas.SearchPage))
+async def search(
+    q: str = Query(..., min_length=1),
+    filters: question_schemas.QuestionFilters = Depends(get_question_filters),
+    limit: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: SessionLocal = Depends(get_db),
+) -> question_schemas.SearchPage:
+    return await run_db(
+        db,
+        question_repository.search,
+        q,
+        filters,
+        limit,
+        offset,
+        response_model=question_schemas.SearchPage,
+    )
+
+
+# Newline delimited JSON, one passage or question per line, for syncing the
+# whole bank without building it in memory. Passages come first when included
+# and can be told apart from questions by their pType field.
+@router.get("/questions/export")
+async def export_questions(
+    filters: question_schemas.QuestionFilters = Depends(get_question_filters),
+    include_passages: bool = False,
+    db: SessionLocal = Depends(get_db),
+) -> StreamingResponse:
+    def passage_lines(passages: Sequence[question_models.Passage]) -> str:
+        return "".join(
+            question_schemas.PassageUnion.from_orm(passage).json(by_alias=True) + "\n"
+            for passage in passages
+        )
+
+    def question_lines(questions: Sequence[question_models.Question]) -> str:
+        return "".join(
+            question_schemas.QuestionWithAnswers.from_orm(question).json(by_alias=True)
+            + "\n"
+            for question in questions
+        )
+
+    async def generate_lines() -> AsyncIterator[str]:
+        if include_passages:
+            passage_stmt = question_repository.get_passage_export_stmt(filters)
+            async for lines in stream_db(db, passage_stmt, passage_lines):
+                yield lines
+        question_stmt = question_repository.get_question_export_stmt(filters)
+        async for lines in stream_db(db, question_stmt, question_lines):
+            yield lines
+
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+
+# For loading a whole official test at once. Questions referencing missing
+# tags, passages or tests are reported in errors by their index in the body
+# and the rest are created, unless strict is set.
+@router.post("/questions/bulk", **run_db_response(question_schemas.BulkQuestionResult))
+async def create_questions_bulk(
+    questions: list[question_schemas.BulkQuestionCreate],
+    strict: bool = False,
+    db: SessionLocal = Depends(get_db),
+) -> question_schemas.BulkQuestionResult:
+    return await run_db(
+        db,
+        question_repository.create_questions_bulk,
+        questions,
+        strict,
+        response_model=question_schemas.BulkQuestionResult,
+    )
 
-@router.post("/fillInQuestion/")
-def create_fill_in_question(
+
+# Applies the same update to many questions of any type, such as moving them
+# to a new sub section. Only the fields shared by every type can be updated.
+# dry_run reports the questions the update would change without writing.
+@router.patch(
+    "/questions/bulk-update",
+    **run_db_response(question_schemas.BulkQuestionUpdateResult),
+)
+async def update_questions_bulk(
+    bulk_update: question_schemas.BulkQuestionUpdate,
+    dry_run: bool = False,
+    db: SessionLocal = Depends(get_db),
+) -> question_schemas.BulkQuestionUpdateResult:
+    return await run_db(
+        db,
+        question_repository.update_questions_bulk,
+        bulk_update,
+        dry_run,
+        response_model=question_schemas.BulkQuestionUpdateResult,
+    )
+
+
+# Add every tag to every question, or remove them, leaving the questions'
+# other tags alone. Returns the number of questions changed for each tag.
+@router.post(
+    "/questions/tags/add", **run_db_response(question_schemas.QuestionTagsChangeResult)
+)
+async def add_question_tags(
+    change: question_schemas.QuestionTagsChange, db: SessionLocal = Depends(get_db)
+) -> question_schemas.QuestionTagsChangeResult:
+    return await run_db(
+        db,
+        question_repository.add_question_tags,
+        change,
+        response_model=question_schemas.QuestionTagsChangeResult,
+    )
+
+
+@router.post(
+    "/questions/tags/remove",
+    **run_db_response(question_schemas.QuestionTagsChangeResult),
+)
+async def remove_question_tags(
+    change: question_schemas.QuestionTagsChange, db: SessionLocal = Depends(get_db)
+) -> question_schemas.QuestionTagsChangeResult:
+    return await run_db(
+        db,
+        question_repository.remove_question_tags,
+        change,
+        response_model=question_schemas.QuestionTagsChangeResult,
+    )
+
+
+@router.post("/fillInQuestion/", **run_db_response(question_schemas.FillInQuestion))
+async def create_fill_in_question(
     question: question_schemas.FillInQuestionCreate, db: SessionLocal = Depends(get_db)
 ) -> question_schemas.FillInQuestion:
-    return question_repository.create_fill_in_question(db, question)
+    return await run_db(
+        db,
+        question_repository.create_fill_in_question,
+        question,
+        response_model=question_schemas.FillInQuestion,
+    )
 
 
-@router.patch("/fillInQuestion/{question_id}")
-def update_fill_in_question(
+@router.patch(
+    "/fillInQuestion/{question_id}", **run_db_response(question_schemas.FillInQuestion)
+)
+async def update_fill_in_question(
     question_id: int,
     question_data: question_schemas.FillInQuestionUpdate,
     db: SessionLocal = Depends(get_db),
 ) -> question_schemas.FillInQuestion:
-    return question_repository.update_question(
-        db, question_id, question_data, question_models.FillInQuestion
+    return await run_db(
+        db,
+        question_repository.update_question,
+        question_id,
+        question_data,
+        question_models.FillInQuestion,
+        response_model=question_schemas.FillInQuestion,
     )
 
 
-@router.post("/multipleChoiceQuestion/")
-def create_multiple_choice_question(
+@router.post(
+    "/multipleChoiceQuestion/",
+    **run_db_response(question_schemas.MultipleChoiceQuestion),
+)
+async def create_multiple_choice_question(
     question: question_schemas.MultipleChoiceQuestionCreate,
     db: SessionLocal = Depends(get_db),
 ) -> question_schemas.MultipleChoiceQuestion:
-    return question_repository.create_multiple_choice_question(db, question)
+    return await run_db(
+        db,
+        question_repository.create_multiple_choice_question,
+        question,
+        response_model=question_schemas.MultipleChoiceQuestion,
+    )
 
 
-@router.patch("/multipleChoiceQuestion/{question_id}")
-def update_multiple_choice_question(
+@router.patch(
+    "/multipleChoiceQuestion/{question_id}",
+    **run_db_response(question_schemas.MultipleChoiceQuestion),
+)
+async def update_multiple_choice_question(
     question_id: int,
     question_data: question_schemas.MultipleChoiceQuestionUpdate,
     db: SessionLocal = Depends(get_db),
 ) -> question_schemas.MultipleChoiceQuestion:
-    return question_repository.update_question(
-        db, question_id, question_data, question_models.MultipleChoiceQuestion
+    return await run_db(
+        db,
+        question_repository.update_question,
+        question_id,
+        question_data,
+        question_models.MultipleChoiceQuestion,
+        response_model=question_schemas.MultipleChoiceQuestion,
     )
 
 
-@router.post("/fillInImageQuestion/")
-def create_fill_in_image_question(
+@router.post(
+    "/fillInImageQuestion/", **run_db_response(question_schemas.FillInImageQuestion)
+)
+async def create_fill_in_image_question(
     question: question_schemas.FillInImageQuestionCreate,
     db: SessionLocal = Depends(get_db),
 ) -> question_schemas.FillInImageQuestion:
-    return question_repository.create_fill_in_image_question(db, question)
+    return await run_db(
+        db,
+        question_repository.create_fill_in_image_question,
+        question,
+        response_model=question_schemas.FillInImageQuestion,
+    )
 
 
-@router.patch("/fillInImageQuestion/{question_id}")
-def update_fill_in_image_question(
+@router.patch(
+    "/fillInImageQuestion/{question_id}",
+    **run_db_response(question_schemas.FillInImageQuestion),
+)
+async def update_fill_in_image_question(
     question_id: int,
     question_data: question_schemas.FillInImageQuestionUpdate,
     db: SessionLocal = Depends(get_db),
 ) -> question_schemas.FillInImageQuestion:
-    return question_repository.update_question(
-        db, question_id, question_data, question_models.FillInImageQuestion
+    return await run_db(
+        db,
+        question_repository.update_question,
+        question_id,
+        question_data,
+        question_models.FillInImageQuestion,
+        response_model=question_schemas.FillInImageQuestion,
     )
 
 
-@router.post("/multipleChoiceImageQuestion/")
-def create_multiple_image_choice_question(
+@router.post(
+    "/multipleChoiceImageQuestion/",
+    **run_db_response(question_schemas.MultipleChoiceImageQuestion),
+)
+async def create_multiple_image_choice_question(
     question: question_schemas.MultipleChoiceImageQuestionCreate,
     db: SessionLocal = Depends(get_db),
 ) -> question_schemas.MultipleChoiceImageQuestion:
-    return question_repository.create_multiple_choice_image_question(db, question)
+    return await run_db(
+        db,
+        question_repository.create_multiple_choice_image_question,
+        question,
+        response_model=question_schemas.MultipleChoiceImageQuestion,
+    )
 
 
-@router.patch("/multipleChoiceImageQuestion/{question_id}")
-def update_multiple_choice_image_question(
+@router.patch(
+    "/multipleChoiceImageQuestion/{question_id}",
+    **run_db_response(question_schemas.MultipleChoiceImageQuestion),
+)
+async def update_multiple_choice_image_question(
     question_id: int,
     question_data: question_schemas.MultipleChoiceImageQuestionUpdate,
     db: SessionLocal = Depends(get_db),
 ) -> question_schemas.MultipleChoiceImageQuestion:
-    return question_repository.update_question(
-        db, question_id, question_data, question_models.MultipleChoiceImageQuestion
+    return await run_db(
+        db,
+        question_repository.update_question,
+        question_id,
+        question_data,
+        question_models.MultipleChoiceImageQuestion,
+        response_model=question_schemas.MultipleChoiceImageQuestion,
+    )
+
+
+async def process_and_upload_images(
+    files: list[UploadFile],
+    local_image_path: Path,
+    image_s3_key: str,
+    background_tasks: BackgroundTasks,
+    force: bool = False,
+) -> bool:
+    """Returns whether the image was skipped as unchanged, see
+    utils.image_manifest_utils."""
+    bucket = os.getenv(SHSAT_IMAGE_BUCKET)
+    manifest = get_image_manifest()
+    key = manifest_key(bucket, image_s3_key)
+    contents = [await file.read() for file in files]
+    input_hash = hash_inputs(contents)
+    # The manifest's file is shared with other processes, so it's read in a thread
+    if not force and await asyncio.to_thread(manifest.inputs_match, key, input_hash):
+        manifest.count(hit=True)
+        return True
+
+    try:
+        if IN_MEMORY_IMAGES:
+            image = await process_contents_in_memory(contents)
+        else:
+            await process_contents(contents, local_image_path)
+            image = await asyncio.to_thread(local_image_path.read_bytes)
+    except Exception as e:
+        logging.error(e)
+        raise HTTPException(status_code=500, detail="Error processing image")
+
+    output_hash = hash_image(image)
+    cache_hit = not force and await asyncio.to_thread(
+        manifest.output_matches, key, input_hash, output_hash
     )
+    manifest.count(cache_hit)
+    if not cache_hit:
+        await asyncio.to_thread(manifest.discard, key)
+        try:
+            await upload_fileobj(io.BytesIO(image), bucket, image_s3_key)
+        except Exception as e:
+            logging.error(e)
+            raise HTTPException(status_code=500, detail="Error uploading image to S3")
+        await asyncio.to_thread(manifest.put, key, input_hash, output_hash)
+
+    if IN_MEMORY_IMAGES and LOCAL_IMAGE_COPY:
+        background_tasks.add_task(save_image, local_image_path, image)
+    return cache_hit
 
 
 @router.post(
@@ -111,27 +531,19 @@ async def process_and_upload_question_images(
     official_test_form: str,
     question_or_answer: QuestionOrAnswer,
     question_number: int,
+    background_tasks: BackgroundTasks,
+    force: bool = False,
 ):
     local_image_path = generate_official_question_local_image_path(
         official_test_year, official_test_form, question_or_answer, question_number
     )
-    try:
-        await process_images(files, local_image_path)
-    except Exception as e:
-        logging.error(e)
-        raise HTTPException(status_code=500, detail="Error processing image")
-
     image_s3_key = generate_official_question_s3_image_path(
         official_test_year, official_test_form, question_or_answer, question_number
     )
-
-    try:
-        await upload_file(local_image_path, os.getenv(SHSAT_IMAGE_BUCKET), image_s3_key)
-    except Exception as e:
-        logging.error(e)
-        raise HTTPException(status_code=500, detail="Error uploading image to S3")
-
-    return {"image_s3_key": image_s3_key}
+    cache_hit = await process_and_upload_images(
+        files, local_image_path, image_s3_key, background_tasks, force
+    )
+    return {"image_s3_key": image_s3_key, "cache_hit": cache_hit}
 
 
 @router.post(
@@ -144,6 +556,8 @@ async def process_and_upload_passage_images(
     official_test_form: str,
     first_question_number: int,
     last_question_number: int,
+    background_tasks: BackgroundTasks,
+    force: bool = False,
 ):
     local_image_path = generate_official_passage_local_image_path(
         official_test_year,
@@ -151,66 +565,148 @@ async def process_and_upload_passage_images(
         first_question_number,
         last_question_number,
     )
-    try:
-        await process_images(files, local_image_path)
-    except Exception as e:
-        logging.error(e)
-        raise HTTPException(status_code=500, detail="Error processing image")
-
     image_s3_key = generate_official_passage_s3_image_path(
         official_test_year,
         official_test_form,
         first_question_number,
         last_question_number,
     )
+    cache_hit = await process_and_upload_images(
+        files, local_image_path, image_s3_key, background_tasks, force
+    )
+    return {"image_s3_key": image_s3_key, "cache_hit": cache_hit}
 
-    try:
-        await upload_file(local_image_path, os.getenv(SHSAT_IMAGE_BUCKET), image_s3_key)
-    except Exception as e:
-        logging.error(e)
-        raise HTTPException(status_code=500, detail="Error uploading image to S3")
 
-    return {"image_s3_key": image_s3_key}
+# The scans of a whole official test in one request, as a zip or as files named
+# by their path in the layout described in utils.image_batch_utils. The images
+# are processed and uploaded concurrently, those that fail are listed in errors.
+@router.post(
+    "/imageBatch/{official_test_year}/{official_test_form}",
+    response_model=question_schemas.ImageBatchResult,
+)
+async def ingest_image_batch(
+    files: list[UploadFile],
+    official_test_year: int,
+    official_test_form: str,
+    force: bool = False,
+):
+    contents: list[tuple[str, bytes]] = []
+    try:
+        for file in files:
+            data = await file.read()
+            if file.filename.lower().endswith(".zip"):
+                contents.extend(await asyncio.to_thread(read_zip, data))
+            else:
+                contents.append((file.filename, data))
+        items = parse_image_batch(contents)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await image_batch_utils.ingest_image_batch(
+        items, official_test_year, official_test_form, force
+    )
 
 
-@router.post("/imagePassage")
-def create_image_passage(
+@router.post("/imagePassage", **run_db_response(question_schemas.ImagePassage))
+async def create_image_passage(
     passage: question_schemas.ImagePassageCreate, db: SessionLocal = Depends(get_db)
 ) -> question_schemas.ImagePassage:
-    return question_repository.create_image_passage(db, passage)
+    return await run_db(
+        db,
+        question_repository.create_image_passage,
+        passage,
+        response_model=question_schemas.ImagePassage,
+    )
 
 
-@router.post("/textPassage")
-def create_text_passage(
+@router.post("/textPassage", **run_db_response(question_schemas.TextPassage))
+async def create_text_passage(
     passage: question_schemas.TextPassageCreate, db: SessionLocal = Depends(get_db)
 ) -> question_schemas.TextPassage:
-    return question_repository.create_text_passage(db, passage)
+    return await run_db(
+        db,
+        question_repository.create_text_passage,
+        passage,
+        response_model=question_schemas.TextPassage,
+    )
+
+
+@router.get(
+    "/passages",
+    **run_db_response(list[question_schemas.PassageUnion]),
+    dependencies=[Depends(conditional_get(question_models.Passage.__table__))],
+)
+async def get_passages(
+    response: Response,
+    db: SessionLocal = Depends(get_db),
+):
+    if FAST_LIST_SERIALIZATION:
+
+        def get_serialized_passages(db: SessionLocal):
+            return [
+                serialize_passage(passage)
+                for passage in question_repository.get_passages(db)
+            ]
 
+        passages = await run_db(db, get_serialized_passages)
+        return fast_list_response(passages, response)
 
-@router.get("/passages")
-def get_passages(
+    return await run_db(
+        db,
+        question_repository.get_passages,
+        response_model=list[question_schemas.PassageUnion],
+    )
+
+
+# Prefix and typo tolerant matches on passage title, best first
+@router.get(
+    "/passages/suggest", **run_db_response(list[question_schemas.PassageSuggestion])
+)
+async def suggest_passages(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
     db: SessionLocal = Depends(get_db),
-) -> list[question_schemas.PassageUnion]:
-    return question_repository.get_passages(db)
+) -> list[question_schemas.PassageSuggestion]:
+    return await run_db(
+        db,
+        question_repository.suggest_passages,
+        q,
+        limit,
+        response_model=list[question_schemas.PassageSuggestion],
+    )
 
 
-@router.patch("/textPassage/{passage_id}")
-def update_text_passage(
+@router.patch(
+    "/textPassage/{passage_id}", **run_db_response(question_schemas.TextPassage)
+)
+async def update_text_passage(
     passage_id: int,
     passage_data: question_schemas.TextPassageUpdate,
     db: SessionLocal = Depends(get_db),
 ) -> question_schemas.TextPassage:
-    return question_repository.update_passage(
-        db, passage_id, passage_data, question_models.TextPassage
+    return await run_db(
+        db,
+        question_repository.update_passage,
+        passage_id,
+        passage_data,
+        question_models.TextPassage,
+        response_model=question_schemas.TextPassage,
     )
 
 
-@router.patch("/imagePassage/{passage_id}")
-def update_image_passage(
+@router.patch(
+    "/imagePassage/{passage_id}", **run_db_response(question_schemas.ImagePassage)
+)
+async def update_image_passage(
     passage_id: int,
     passage_data: question_schemas.ImagePassageUpdate,
     db: SessionLocal = Depends(get_db),
 ) -> question_schemas.ImagePassage:
-    return question_repository.update_passage(
-        db, passage_id, passage_data, question_models.ImagePassage
+    return await run_db(
+        db,
+        question_repository.update_passage,
+        passage_id,
+        passage_data,
+        question_models.ImagePassage,
+        response_model=question_schemas.ImagePassage,
     )
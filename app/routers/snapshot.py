@@ -0,0 +1,118 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
+
+from app.data.env_consts import (
+    SHSAT_IMAGE_BUCKET,
+    SNAPSHOT_AFTER_WRITES,
+    SNAPSHOT_DELAY_SECONDS,
+    SNAPSHOT_UPLOAD,
+)
+from app.database import SessionLocal, get_db, run_db
+from app.repositories import snapshot_repository
+from app.schemas import snapshot as snapshot_schemas
+from utils.file_utils import (
+    generate_snapshot_local_dir,
+    generate_snapshot_s3_key,
+)
+from utils.s3_utils import object_exists, upload_file
+from utils.snapshot_utils import (
+    MANIFEST_NAME,
+    DebouncedTask,
+    Shard,
+    ShardFile,
+    build_manifest,
+    encode_shard,
+    write_snapshot,
+)
+
+router = APIRouter()
+
+PUBLISH_AFTER_WRITES = os.getenv(SNAPSHOT_AFTER_WRITES, "false").lower() == "true"
+UPLOAD_AFTER_WRITES = os.getenv(SNAPSHOT_UPLOAD, "false").lower() == "true"
+# Shard files never change as their names are their content hashes, while the
+# manifest has to be fetched again to see new snapshots
+SHARD_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MANIFEST_CACHE_CONTROL = "no-cache"
+
+
+def encode_and_write_snapshot(
+    content: dict[str, list[Any]]
+) -> tuple[list[Shard], dict[str, Any]]:
+    shards = [encode_shard(name, items) for name, items in content.items()]
+    manifest = build_manifest(shards, datetime.now(timezone.utc))
+    write_snapshot(generate_snapshot_local_dir(), shards, manifest)
+    return shards, manifest
+
+
+async def upload_snapshot_file(
+    directory: Path, path: str, extra_args: dict[str, str], overwrite: bool = False
+):
+    bucket = os.getenv(SHSAT_IMAGE_BUCKET)
+    object_name = generate_snapshot_s3_key(path)
+    if overwrite or not await object_exists(bucket, object_name):
+        await upload_file(directory / path, bucket, object_name, extra_args)
+
+
+async def upload_snapshot(shards: list[Shard]):
+    directory = generate_snapshot_local_dir()
+
+    def shard_file_args(file: ShardFile) -> dict[str, str]:
+        extra_args = {
+            "ContentType": "application/json",
+            "CacheControl": SHARD_CACHE_CONTROL,
+        }
+        if file.encoding:
+            extra_args["ContentEncoding"] = file.encoding
+        return extra_args
+
+    await asyncio.gather(
+        *(
+            upload_snapshot_file(directory, file.path, shard_file_args(file))
+            for shard in shards
+            for file in shard.files
+        )
+    )
+    # Last, so clients never see a manifest listing shards not uploaded yet
+    await upload_snapshot_file(
+        directory,
+        MANIFEST_NAME,
+        {"ContentType": "application/json", "CacheControl": MANIFEST_CACHE_CONTROL},
+        overwrite=True,
+    )
+
+
+async def publish_snapshot(db: SessionLocal, upload: bool) -> dict[str, Any]:
+    content = await run_db(db, snapshot_repository.get_snapshot_content)
+    # Compressing is CPU bound, keep it off the event loop
+    shards, manifest = await run_in_threadpool(encode_and_write_snapshot, content)
+    if upload:
+        await upload_snapshot(shards)
+    return manifest
+
+
+async def publish_snapshot_after_writes():
+    # Outside of a request, so with a session of its own
+    with SessionLocal() as db:
+        await publish_snapshot(db, UPLOAD_AFTER_WRITES)
+
+
+# Requested by the middleware in main after successful writes
+snapshot_publisher = DebouncedTask(
+    publish_snapshot_after_writes,
+    delay_seconds=float(os.getenv(SNAPSHOT_DELAY_SECONDS, "5")),
+)
+
+
+# Writes a read-only copy of the question bank for the student app to the
+# snapshot directory, and to S3 when upload is set. Questions and passages are
+# split into shards by section and official test, named by their content hash,
+# and listed in manifest.json.
+@router.post("/snapshots", response_model=snapshot_schemas.SnapshotManifest)
+async def create_snapshot(upload: bool = False, db: SessionLocal = Depends(get_db)):
+    return await publish_snapshot(db, upload)
@@ -1,91 +1,231 @@
-from fastapi import APIRouter, Depends
-
-from app.database import SessionLocal, get_db
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import Row
+
+from app.database import SessionLocal, get_db, run_db, run_db_response
+from app.dependencies.conditional_get import (
+    conditional_get,
+    get_checked_table_versions,
+)
+from app.models import tag as tag_models
+from app.models.question import question_tag_table
 from app.repositories import tag_repository
 from app.schemas import tag as tag_schemas
 
 router = APIRouter()
 
 
-@router.get("/categories")
-def get_categories(db: SessionLocal = Depends(get_db)) -> list[tag_schemas.Category]:
-    return tag_repository.get_categories(db)
-
-
-@router.get("/subcategories")
-def get_subcategories(
+@router.get(
+    "/categories",
+    dependencies=[Depends(conditional_get(tag_models.Category.__table__))],
+    **run_db_response(list[tag_schemas.Category]),
+)
+async def get_categories(
+    table_versions: dict[str, Row] = Depends(get_checked_table_versions),
+    db: SessionLocal = Depends(get_db),
+) -> list[tag_schemas.Category]:
+    return await run_db(
+        db,
+        tag_repository.get_categories,
+        table_versions,
+        response_model=list[tag_schemas.Category],
+    )
+
+
+@router.get(
+    "/subcategories",
+    dependencies=[Depends(conditional_get(tag_models.Subcategory.__table__))],
+    **run_db_response(list[tag_schemas.Subcategory]),
+)
+async def get_subcategories(
+    table_versions: dict[str, Row] = Depends(get_checked_table_versions),
     db: SessionLocal = Depends(get_db),
 ) -> list[tag_schemas.Subcategory]:
-    return tag_repository.get_subcategories(db)
-
-
-@router.get("/tags")
-def get_tags(db: SessionLocal = Depends(get_db)) -> list[tag_schemas.Tag]:
-    return tag_repository.get_tags(db)
+    return await run_db(
+        db,
+        tag_repository.get_subcategories,
+        table_versions,
+        response_model=list[tag_schemas.Subcategory],
+    )
+
+
+@router.get(
+    "/tags",
+    dependencies=[Depends(conditional_get(tag_models.Tag.__table__))],
+    **run_db_response(list[tag_schemas.Tag]),
+)
+async def get_tags(
+    table_versions: dict[str, Row] = Depends(get_checked_table_versions),
+    db: SessionLocal = Depends(get_db),
+) -> list[tag_schemas.Tag]:
+    return await run_db(
+        db,
+        tag_repository.get_tags,
+        table_versions,
+        response_model=list[tag_schemas.Tag],
+    )
 
 
-@router.get("/resources")
-def get_resources(db: SessionLocal = Depends(get_db)) -> list[tag_schemas.Resource]:
-    return tag_repository.get_resources(db)
+MAX_SUGGESTIONS = 50
 
 
-@router.post("/category")
-def create_category(
+# Prefix and typo tolerant matches on tag name, best first
+@router.get("/tags/suggest", **run_db_response(list[tag_schemas.Tag]))
+async def suggest_tags(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+    db: SessionLocal = Depends(get_db),
+) -> list[tag_schemas.Tag]:
+    return await run_db(
+        db,
+        tag_repository.suggest_tags,
+        q,
+        limit,
+        response_model=list[tag_schemas.Tag],
+    )
+
+
+@router.get(
+    "/resources",
+    dependencies=[Depends(conditional_get(tag_models.Resource.__table__))],
+    **run_db_response(list[tag_schemas.Resource]),
+)
+async def get_resources(
+    table_versions: dict[str, Row] = Depends(get_checked_table_versions),
+    db: SessionLocal = Depends(get_db),
+) -> list[tag_schemas.Resource]:
+    return await run_db(
+        db,
+        tag_repository.get_resources,
+        table_versions,
+        response_model=list[tag_schemas.Resource],
+    )
+
+
+@router.get(
+    "/taxonomy",
+    dependencies=[
+        Depends(
+            conditional_get(
+                tag_models.Category.__table__,
+                tag_models.Subcategory.__table__,
+                tag_models.Tag.__table__,
+                tag_models.Resource.__table__,
+                question_tag_table,
+            )
+        )
+    ],
+    **run_db_response(list[tag_schemas.TaxonomyCategory]),
+)
+async def get_taxonomy(
+    include_question_counts: bool = False,
+    table_versions: dict[str, Row] = Depends(get_checked_table_versions),
+    db: SessionLocal = Depends(get_db),
+) -> list[tag_schemas.TaxonomyCategory]:
+    return await run_db(
+        db,
+        tag_repository.get_taxonomy,
+        include_question_counts,
+        table_versions,
+        response_model=list[tag_schemas.TaxonomyCategory],
+    )
+
+
+@router.post("/category", **run_db_response(tag_schemas.Category))
+async def create_category(
     category: tag_schemas.CategoryCreate, db: SessionLocal = Depends(get_db)
 ) -> tag_schemas.Category:
-    return tag_repository.create_category(db, category)
+    return await run_db(
+        db,
+        tag_repository.create_category,
+        category,
+        response_model=tag_schemas.Category,
+    )
 
 
-@router.patch("/category/{category_id}")
-def update_category(
+@router.patch("/category/{category_id}", **run_db_response(tag_schemas.Category))
+async def update_category(
     category_id: int,
     category_data: tag_schemas.CategoryUpdate,
     db: SessionLocal = Depends(get_db),
 ) -> tag_schemas.Category:
-    return tag_repository.update_category(db, category_id, category_data)
+    return await run_db(
+        db,
+        tag_repository.update_category,
+        category_id,
+        category_data,
+        response_model=tag_schemas.Category,
+    )
 
 
-@router.post("/subcategory")
-def create_subcategory(
+@router.post("/subcategory", **run_db_response(tag_schemas.Subcategory))
+async def create_subcategory(
     subcategory: tag_schemas.SubcategoryCreate, db: SessionLocal = Depends(get_db)
 ) -> tag_schemas.Subcategory:
-    return tag_repository.create_subcategory(db, subcategory)
-
-
-@router.patch("/subcategory/{subcategory_id}")
-def update_subcategory(
+    return await run_db(
+        db,
+        tag_repository.create_subcategory,
+        subcategory,
+        response_model=tag_schemas.Subcategory,
+    )
+
+
+@router.patch(
+    "/subcategory/{subcategory_id}", **run_db_response(tag_schemas.Subcategory)
+)
+async def update_subcategory(
     subcategory_id: int,
     subcategory_data: tag_schemas.SubcategoryUpdate,
     db: SessionLocal = Depends(get_db),
 ) -> tag_schemas.Subcategory:
-    return tag_repository.update_subcategory(db, subcategory_id, subcategory_data)
+    return await run_db(
+        db,
+        tag_repository.update_subcategory,
+        subcategory_id,
+        subcategory_data,
+        response_model=tag_schemas.Subcategory,
+    )
 
 
-@router.post("/tag")
-def create_tag(
+@router.post("/tag", **run_db_response(tag_schemas.Tag))
+async def create_tag(
     tag: tag_schemas.TagCreate, db: SessionLocal = Depends(get_db)
 ) -> tag_schemas.Tag:
-    return tag_repository.create_tag(db, tag)
+    return await run_db(
+        db, tag_repository.create_tag, tag, response_model=tag_schemas.Tag
+    )
 
 
-@router.patch("/tag/{tag_id}")
-def update_tag(
+@router.patch("/tag/{tag_id}", **run_db_response(tag_schemas.Tag))
+async def update_tag(
     tag_id: int, tag_data: tag_schemas.TagUpdate, db: SessionLocal = Depends(get_db)
 ) -> tag_schemas.Tag:
-    return tag_repository.update_tag(db, tag_id, tag_data)
+    return await run_db(
+        db, tag_repository.update_tag, tag_id, tag_data, response_model=tag_schemas.Tag
+    )
 
 
-@router.post("/resource")
-def create_resource(
+@router.post("/resource", **run_db_response(tag_schemas.Resource))
+async def create_resource(
     resource: tag_schemas.ResourceCreate, db: SessionLocal = Depends(get_db)
 ) -> tag_schemas.Resource:
-    return tag_repository.create_resource(db, resource)
+    return await run_db(
+        db,
+        tag_repository.create_resource,
+        resource,
+        response_model=tag_schemas.Resource,
+    )
 
 
-@router.patch("/resource/{resource_id}")
-def update_resource(
+@router.patch("/resource/{resource_id}", **run_db_response(tag_schemas.Resource))
+async def update_resource(
     resource_id: int,
     resource_data: tag_schemas.ResourceUpdate,
     db: SessionLocal = Depends(get_db),
 ) -> tag_schemas.Resource:
-    return tag_repository.update_resource(db, resource_id, resource_data)
+    return await run_db(
+        db,
+        tag_repository.update_resource,
+        resource_id,
+        resource_data,
+        response_model=tag_schemas.Resource,
+    )
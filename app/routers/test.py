@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, run_db, run_db_response
+from app.dependencies.conditional_get import conditional_get
+from app.models import test as test_models
 from app.repositories import test_repository
 
 from ..schemas import test as test_schemas
@@ -9,6 +11,14 @@ from ..schemas import test as test_schemas
 router = APIRouter()
 
 
-@router.get("/officialTests/", response_model=list[test_schemas.OfficialTest])
-def get_official_tests(db: Session = Depends(get_db)):
-    return test_repository.get_official_tests(db)
+@router.get(
+    "/officialTests/",
+    **run_db_response(list[test_schemas.OfficialTest]),
+    dependencies=[Depends(conditional_get(test_models.OfficialTest.__table__))],
+)
+async def get_official_tests(db: Session = Depends(get_db)):
+    return await run_db(
+        db,
+        test_repository.get_official_tests,
+        response_model=list[test_schemas.OfficialTest],
+    )
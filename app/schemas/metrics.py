@@ -0,0 +1,46 @@
+from typing import Optional
+
+from fastapi_camelcase import CamelModel
+
+
+class DbPoolStats(CamelModel):
+    # Current state of the pool
+    size: Optional[int]
+    checkedout: Optional[int]
+    checkedin: Optional[int]
+    overflow: Optional[int]
+    # Counted since the process started
+    checkouts: int
+    checkins: int
+    connects: int
+    invalidations: int
+    timeouts: int
+    # Time spent waiting for a connection at checkout
+    wait_count: int
+    wait_seconds_avg: float
+    wait_seconds_p95: float
+    wait_seconds_max: float
+
+
+class DbPoolMetrics(CamelModel):
+    sync_engine: DbPoolStats
+    # Only set when DB_ASYNC is enabled
+    async_engine: Optional[DbPoolStats]
+
+
+class ImageCacheStats(CamelModel):
+    # Counted since the process started, images skipped as unchanged are hits
+    hits: int
+    misses: int
+    hit_rate: float
+    # Images in the manifest
+    size: int
+
+
+class TaxonomyCacheStats(CamelModel):
+    # Counted since the process started
+    hits: int
+    misses: int
+    evictions: int
+    # Entries in the cache
+    size: int
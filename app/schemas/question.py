@@ -1,8 +1,8 @@
 from datetime import datetime
-from typing import List, Literal, Optional, Union
+from typing import Dict, List, Literal, Optional, Union
 
 from fastapi_camelcase import CamelModel
-from pydantic import Field
+from pydantic import Field, validator
 
 from app.data.question_enums import PassageType, Section, SubSection
 from app.models.question import QuestionType, UsageType
@@ -172,6 +172,143 @@ class QuestionWithAnswers(CamelModel):
         orm_mode = True
 
 
+# Items of a bulk import, the create schemas with q_type narrowed so the
+# union can be discriminated on it
+
+
+class BulkFillInQuestionCreate(FillInQuestionCreate):
+    q_type: Literal[QuestionType.FILL_IN]
+
+
+class BulkMultipleChoiceQuestionCreate(MultipleChoiceQuestionCreate):
+    q_type: Literal[QuestionType.MULTIPLE_CHOICE]
+
+
+class BulkFillInImageQuestionCreate(FillInImageQuestionCreate):
+    q_type: Literal[QuestionType.FILL_IN_IMAGE]
+
+
+class BulkMultipleChoiceImageQuestionCreate(MultipleChoiceImageQuestionCreate):
+    q_type: Literal[QuestionType.MULTIPLE_CHOICE_IMAGE]
+
+
+class BulkQuestionCreate(CamelModel):
+    __root__: Union[
+        BulkFillInQuestionCreate,
+        BulkMultipleChoiceQuestionCreate,
+        BulkFillInImageQuestionCreate,
+        BulkMultipleChoiceImageQuestionCreate,
+    ] = Field(..., discriminator="q_type")
+
+    # QuestionType isn't a str enum, so the discriminator only matches the
+    # request JSON's q_type once it's a member
+    @validator("__root__", pre=True)
+    def parse_q_type(cls, value):
+        if isinstance(value, dict):
+            for key in ("qType", "q_type"):
+                if value.get(key) in QuestionType.__members__:
+                    value = {**value, key: QuestionType[value[key]]}
+        return value
+
+
+# index is the position of the question in the request body
+class BulkQuestionCreated(CamelModel):
+    index: int
+    id: int
+
+
+class BulkQuestionError(CamelModel):
+    index: int
+    detail: str
+
+
+class BulkQuestionResult(CamelModel):
+    created: List[BulkQuestionCreated]
+    errors: List[BulkQuestionError]
+
+
+# Filters shared by the question list and the routes built on top of it
+class QuestionFilters(CamelModel):
+    section: Optional[Section]
+    sub_section: Optional[SubSection]
+    usage: Optional[UsageType]
+    q_type: Optional[QuestionType]
+    official_test_id: Optional[int]
+    passage_id: Optional[int]
+    tag_ids: Optional[List[int]]
+
+
+# The questions to update are selected by ids, filters or both
+class BulkQuestionUpdate(CamelModel):
+    ids: Optional[List[int]]
+    filters: Optional[QuestionFilters]
+    update: QuestionUpdate
+
+
+# matched counts the selected questions, ids lists the ones the update changes
+class BulkQuestionUpdateResult(CamelModel):
+    matched: int
+    updated: int
+    ids: List[int]
+    dry_run: bool
+
+
+class QuestionTagsChange(CamelModel):
+    question_ids: List[int]
+    tag_ids: List[int]
+
+
+# count is the number of questions the tag was added to or removed from
+class QuestionTagCount(CamelModel):
+    tag_id: int
+    count: int
+
+
+class QuestionTagsChangeResult(CamelModel):
+    tags: List[QuestionTagCount]
+
+
+class QuestionPage(CamelModel):
+    items: List[QuestionWithAnswers]
+    # Pass as the cursor query param to get the next page, None on the last page
+    next_cursor: Optional[int]
+
+
+class FacetCount(CamelModel):
+    # None counts the questions without a value
+    value: Optional[Union[int, str]]
+    count: int
+
+
+# Question counts for each value of each field, ordered by count
+class QuestionFacets(CamelModel):
+    total: int
+    section: List[FacetCount]
+    sub_section: List[FacetCount]
+    usage: List[FacetCount]
+    q_type: List[FacetCount]
+    official_test_id: List[FacetCount]
+    tag_id: List[FacetCount]
+
+
+class SearchHit(CamelModel):
+    type: Literal["question", "passage"]
+    id: int
+    rank: float
+    # Matched words wrapped in <mark> tags
+    snippet: str
+    # Set on question hits
+    q_type: Optional[QuestionType]
+    # Set on passage hits
+    title: Optional[str]
+
+
+class SearchPage(CamelModel):
+    items: List[SearchHit]
+    # Hits across all pages
+    total: int
+
+
 class PassageBase(CamelModel):
     official_test_id: Optional[int]
     p_type: PassageType
@@ -234,6 +371,12 @@ class TextPassage(TextPassageBase, Passage):
     p_type: Literal[PassageType.TEXT]
 
 
+class PassageSuggestion(CamelModel):
+    id: int
+    title: str
+    p_type: PassageType
+
+
 class PassageUnion(CamelModel):
     __root__: Union[
         TextPassage,
@@ -242,3 +385,19 @@ class PassageUnion(CamelModel):
 
     class Config:
         orm_mode = True
+
+
+class ImageBatchError(CamelModel):
+    # kind/number of the image, e.g. question/12
+    name: str
+    detail: str
+
+
+# S3 keys of the uploaded images by question number, passages by first_last
+class ImageBatchResult(CamelModel):
+    question: Dict[int, str]
+    answer: Dict[int, str]
+    passage: Dict[str, str]
+    # kind/number of the images skipped as unchanged, see utils.image_manifest_utils
+    cache_hits: List[str]
+    errors: List[ImageBatchError]
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Dict, List
+
+from fastapi_camelcase import CamelModel
+
+
+class SnapshotFile(CamelModel):
+    # Relative to the manifest
+    path: str
+    size: int
+
+
+class SnapshotShard(SnapshotFile):
+    name: str
+    count: int
+    sha256: str
+    # Precompressed copies by Content-Encoding, gzip and br
+    encodings: Dict[str, SnapshotFile]
+
+
+class SnapshotManifest(CamelModel):
+    version: str
+    created_at: datetime
+    shards: List[SnapshotShard]
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from fastapi_camelcase import CamelModel
 
@@ -97,3 +97,20 @@ class Resource(ResourceBase):
     id: int
     created_at: datetime
     updated_at: datetime
+
+
+# Nested Category -> Subcategory -> Tag -> Resource tree for GET /taxonomy
+
+
+class TaxonomyTag(Tag):
+    resources: List[Resource]
+    # Only set when question counts are requested
+    question_count: Optional[int]
+
+
+class TaxonomySubcategory(Subcategory):
+    tags: List[TaxonomyTag]
+
+
+class TaxonomyCategory(Category):
+    subcategories: List[TaxonomySubcategory]
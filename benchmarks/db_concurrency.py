@@ -0,0 +1,77 @@
+"""Throughput of a read route under concurrent load, to compare the sync
+(psycopg2 on the threadpool) and async (asyncpg) database modes.
+
+Start the API once per mode, then run this against it:
+
+    DB_ASYNC=false uvicorn app.main:app --port 8000
+    python -m benchmarks.db_concurrency --base-url http://localhost:8000
+
+    DB_ASYNC=true uvicorn app.main:app --port 8000
+    python -m benchmarks.db_concurrency --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run_level(
+    client: httpx.AsyncClient, path: str, concurrency: int, duration: float
+) -> dict[str, float]:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        "errors": errors,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/questions?limit=100")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=60
+    ) as client:
+        # Warm up connections and caches
+        await run_level(client, args.path, 10, 2)
+        for concurrency in args.concurrency:
+            result = await run_level(client, args.path, concurrency, args.duration)
+            print(
+                f"concurrency={concurrency} "
+                f"req/s={result['requests_per_second']:.1f} "
+                f"p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms "
+                f"errors={result['errors']}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
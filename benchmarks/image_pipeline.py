@@ -0,0 +1,91 @@
+"""End-to-end latency per image of the image upload routes' two paths: through
+the processed image dir (pngquant writes the file and upload_file reads it
+back) against IMAGE_UPLOAD_FROM_MEMORY=true (pngquant over stdin and stdout,
+then upload_fileobj). The in-memory path's local copy is written after the
+response, so it isn't timed.
+
+Uploads to SHSAT_IMAGE_BUCKET under benchmarks/, or pass --no-upload to time
+the processing only. Takes PNG scans, or generates page sized ones:
+
+    python -m benchmarks.image_pipeline --repeat 10 scan1.png scan2.png
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from app.data.env_consts import SHSAT_IMAGE_BUCKET
+from utils.image_utils import process_contents, process_contents_in_memory
+from utils.s3_utils import upload_file, upload_fileobj
+
+
+def generate_scan(index: int) -> bytes:
+    # A 200 DPI letter page with some text sized boxes on it
+    image = Image.new("L", (1700, 2200), 255)
+    for line in range(20):
+        image.paste(0, (150, 200 + line * 80, 1300 + index * 10, 230 + line * 80))
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+async def run_disk_path(scan: bytes, path: Path, key: str, bucket):
+    await process_contents([scan], path)
+    if bucket:
+        await upload_file(path, bucket, key)
+
+
+async def run_memory_path(scan: bytes, path: Path, key: str, bucket):
+    image = await process_contents_in_memory([scan])
+    if bucket:
+        await upload_fileobj(io.BytesIO(image), bucket, key)
+
+
+async def time_path(run, scans: list[bytes], directory: Path, bucket, repeat):
+    timings = []
+    for iteration in range(repeat):
+        for index, scan in enumerate(scans):
+            key = f"benchmarks/{run.__name__}/{index}.png"
+            start = time.perf_counter()
+            await run(scan, directory / f"{iteration}-{index}.png", key, bucket)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def benchmark(scans: list[bytes], bucket, repeat: int):
+    with tempfile.TemporaryDirectory() as directory:
+        # Start the worker processes before timing
+        await process_contents_in_memory(scans[:1])
+        for run in (run_disk_path, run_memory_path):
+            timings = await time_path(run, scans, Path(directory), bucket, repeat)
+            print(
+                f"{run.__name__} images={len(timings)} "
+                f"p50={statistics.median(timings) * 1000:.1f}ms "
+                f"max={max(timings) * 1000:.1f}ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("scans", type=Path, nargs="*")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-upload", action="store_true")
+    args = parser.parse_args()
+
+    scans = [path.read_bytes() for path in args.scans] or [
+        generate_scan(index) for index in range(4)
+    ]
+    bucket = None if args.no_upload else os.getenv(SHSAT_IMAGE_BUCKET)
+    if not args.no_upload and not bucket:
+        parser.error(f"set {SHSAT_IMAGE_BUCKET} or pass --no-upload")
+    asyncio.run(benchmark(scans, bucket, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
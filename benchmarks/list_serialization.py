@@ -0,0 +1,102 @@
+"""Rows per second turning a loaded page of questions and the passage list into
+response bytes, with the response models as the routes do by default, against
+the compiled serializers and orjson used with FAST_LIST_RESPONSES=true.
+
+The response model path is timed as one validation, jsonable_encoder and
+JSONResponse, so it's a lower bound, as the routes validate results twice.
+Runs against the database configured by the DB_* environment variables, load
+some questions first (see POST /questions/bulk):
+
+    python -m benchmarks.list_serialization --limit 100 1000
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import parse_obj_as
+
+from app.database import SessionLocal
+from app.models import question, tag, test  # noqa: F401
+from app.repositories import question_repository
+from app.schemas import question as question_schemas
+from utils.serializer_utils import compile_serializer
+
+serialize_question_page = compile_serializer(question_schemas.QuestionPage)
+serialize_passage = compile_serializer(question_schemas.PassageUnion)
+
+
+def render_with_response_model(response_model: Any, content: Any) -> bytes:
+    validated = parse_obj_as(response_model, content)
+    return JSONResponse(jsonable_encoder(validated, by_alias=True)).body
+
+
+def time_render(render: Callable[[], bytes], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def report(name: str, rows: int, renders: dict[str, Callable[[], bytes]], repeat):
+    assert len(set(render() for render in renders.values())) == 1
+    for path, render in renders.items():
+        median = time_render(render, repeat)
+        print(
+            f"{name} rows={rows} path={path} "
+            f"p50={median * 1000:.1f}ms rows/s={rows / median:.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        for limit in args.limit:
+            for source, get_questions in (
+                ("orm", question_repository.get_questions),
+                ("read_model", question_repository.get_questions_from_read_model),
+            ):
+                questions, next_cursor = get_questions(
+                    db, question_schemas.QuestionFilters(), limit=limit
+                )
+                page = {"items": questions, "next_cursor": next_cursor}
+                report(
+                    f"questions source={source}",
+                    len(questions),
+                    {
+                        "response_model": lambda: render_with_response_model(
+                            question_schemas.QuestionPage, page
+                        ),
+                        "compiled": lambda: ORJSONResponse(
+                            serialize_question_page(page)
+                        ).body,
+                    },
+                    args.repeat,
+                )
+
+        passages = question_repository.get_passages(db)
+        report(
+            "passages",
+            len(passages),
+            {
+                "response_model": lambda: render_with_response_model(
+                    list[question_schemas.PassageUnion], passages
+                ),
+                "compiled": lambda: ORJSONResponse(
+                    [serialize_passage(passage) for passage in passages]
+                ).body,
+            },
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    main()
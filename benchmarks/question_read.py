@@ -0,0 +1,62 @@
+"""Time to load and serialize a page of questions through the ORM, joining the
+inheritance tables and loading tags and answers, against the single query on
+the question_read table.
+
+Runs against the database configured by the DB_* environment variables, load
+some questions first (see POST /questions/bulk):
+
+    python -m benchmarks.question_read --limit 100 1000
+"""
+import argparse
+import statistics
+import time
+from typing import Callable
+
+from pydantic import parse_obj_as
+
+from app.database import SessionLocal
+from app.models import question, tag, test  # noqa: F401
+from app.repositories import question_repository
+from app.schemas import question as question_schemas
+
+
+def time_page(get_questions: Callable, limit: int, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        with SessionLocal() as db:
+            start = time.perf_counter()
+            questions, _ = get_questions(
+                db, question_schemas.QuestionFilters(), limit=limit
+            )
+            page = parse_obj_as(
+                question_schemas.QuestionPage, {"items": questions}
+            ).json(by_alias=True)
+            timings.append(time.perf_counter() - start)
+    assert page
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for limit in args.limit:
+        for name, get_questions in (
+            ("orm", question_repository.get_questions),
+            ("read_model", question_repository.get_questions_from_read_model),
+        ):
+            # Warm up connections and statement caches
+            time_page(get_questions, limit, 2)
+            timings = time_page(get_questions, limit, args.repeat)
+            median = statistics.median(timings)
+            print(
+                f"limit={limit} path={name} "
+                f"p50={median * 1000:.1f}ms "
+                f"rows/s={limit / median:.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
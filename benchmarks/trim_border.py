@@ -0,0 +1,79 @@
+"""Milliseconds per image trimming the border of page sized scans, with the
+trim_border uploads use against the exact white trim it replaced, which
+compared the scan to a white page sized canvas. Also prints the size each
+trims the scan to, the exact trim keeps the noisy margins of real scans.
+Takes PNG scans, or generates 300 DPI letter pages with near-white noise:
+
+    python -m benchmarks.trim_border --repeat 10 scan1.png scan2.png
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from PIL import Image, ImageChops
+
+from utils.image_utils import TRIM_MIN_RUN, TRIM_TOLERANCE, trim_border
+
+
+def trim_exact_white(image: Image.Image) -> Image.Image:
+    rgb_image = image.convert("RGB")
+    bg = Image.new("RGB", rgb_image.size, (255, 255, 255))
+    bbox = ImageChops.difference(rgb_image, bg).getbbox()
+    if not bbox:
+        raise ValueError("Unable to trim border from image.")
+    return image.crop(bbox)
+
+
+def trim_with_tolerance(image: Image.Image) -> Image.Image:
+    return trim_border(image, tolerance=TRIM_TOLERANCE, min_run=TRIM_MIN_RUN)
+
+
+def generate_scan(seed: int) -> Image.Image:
+    # A 300 DPI letter page, off white with paper grain and a few specks of
+    # dust, with a block of text sized lines
+    rng = np.random.default_rng(seed)
+    pixels = rng.normal(246, 3, (3300, 2550, 3)).clip(0, 255).astype(np.uint8)
+    for line in range(30):
+        top = 300 + line * 90
+        pixels[top:top + 40, 225:2000 + seed * 10] = 20
+    for _ in range(20):
+        y, x = rng.integers(0, 3300), rng.integers(0, 2550)
+        pixels[y:y + 2, x:x + 2] = 60
+    return Image.fromarray(pixels)
+
+
+def time_trim(trim: Callable[[Image.Image], Image.Image], scans, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        for scan in scans:
+            start = time.perf_counter()
+            trimmed = trim(scan)
+            timings.append(time.perf_counter() - start)
+    return timings, trimmed.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("scans", type=Path, nargs="*")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    scans = [Image.open(path) for path in args.scans] or [
+        generate_scan(seed) for seed in range(4)
+    ]
+    for scan in scans:
+        scan.load()
+    for trim in (trim_exact_white, trim_with_tolerance):
+        timings, size = time_trim(trim, scans, args.repeat)
+        print(
+            f"{trim.__name__} images={len(timings)} "
+            f"p50={statistics.median(timings) * 1000:.1f}ms "
+            f"max={max(timings) * 1000:.1f}ms last_size={size}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -64,12 +64,32 @@ CREATE TRIGGER update_updated_at_question BEFORE
 UPDATE
     ON question FOR EACH ROW EXECUTE PROCEDURE update_updated_at_column();
 
+-- Indexes for the filters and keyset pagination (ORDER BY id) of the question list
+CREATE INDEX question_section_id_idx ON question (section, id);
+
+CREATE INDEX question_sub_section_id_idx ON question (sub_section, id);
+
+CREATE INDEX question_usage_id_idx ON question (usage, id);
+
+CREATE INDEX question_q_type_id_idx ON question (q_type, id);
+
+CREATE INDEX question_official_test_id_id_idx ON question (official_test_id, id);
+
+CREATE INDEX question_passage_id_id_idx ON question (passage_id, id);
+
 CREATE TABLE text_question (
     question_id BIGINT PRIMARY KEY REFERENCES question(id) ON DELETE CASCADE,
     question_text TEXT NOT NULL,
-    explanation TEXT NOT NULL
+    explanation TEXT NOT NULL,
+    -- For full text search, matches in the question text rank above the explanation
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', question_text), 'A')
+        || setweight(to_tsvector('english', explanation), 'B')
+    ) STORED
 );
 
+CREATE INDEX text_question_search_vector_idx ON text_question USING GIN (search_vector);
+
 -- Fill In Question Table
 CREATE TABLE fill_in_question (
     question_id BIGINT PRIMARY KEY REFERENCES text_question(question_id) ON DELETE CASCADE,
@@ -87,29 +107,32 @@ CREATE TABLE multiple_choice_answer (
     is_correct BOOLEAN,
     created_at TIMESTAMPTZ DEFAULT current_timestamp NOT NULL,
     updated_at TIMESTAMPTZ DEFAULT current_timestamp NOT NULL,
-    PRIMARY KEY (question_id, choice_number)
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        to_tsvector('english', answer_text)
+    ) STORED,
+    PRIMARY KEY (question_id, choice_number),
+    -- At most one correct choice per question. Deferrable so it's checked at the
+    -- end of each statement instead of for each row, and an upsert can move the
+    -- correct answer from one choice to another. The app requires exactly one.
+    CONSTRAINT multiple_choice_answer_one_correct EXCLUDE USING btree (
+        question_id WITH =
+    ) WHERE (is_correct) DEFERRABLE INITIALLY IMMEDIATE
 );
 
+CREATE INDEX multiple_choice_answer_search_vector_idx ON multiple_choice_answer USING GIN (search_vector);
+
 CREATE TRIGGER update_updated_at_multiple_choice_answer BEFORE
 UPDATE
     ON multiple_choice_answer FOR EACH ROW EXECUTE PROCEDURE update_updated_at_column();
 
--- Check that there is exactly one correct choice per question 
-CREATE OR REPLACE FUNCTION check_correct_choices()
-RETURNS TRIGGER AS $$
-BEGIN
-    IF (SELECT COUNT(*) FROM multiple_choice_answer WHERE question_id = NEW.question_id AND is_correct = TRUE) > 1 THEN
-        RAISE EXCEPTION 'More than one correct choice for question %', NEW.question_id;
-    END IF;
-    RETURN NEW;
-END;
-$$ language 'plpgsql';
-
-CREATE TRIGGER check_correct_choices_trigger BEFORE
-INSERT
-    OR
-UPDATE
-    ON multiple_choice_answer FOR EACH ROW EXECUTE PROCEDURE check_correct_choices();
+-- multiple_choice_answer_one_correct replaces the check_correct_choices trigger,
+-- which counted the correct answers of the question for each row written. On an
+-- existing database:
+-- DROP TRIGGER check_correct_choices_trigger ON multiple_choice_answer;
+-- DROP FUNCTION check_correct_choices();
+-- ALTER TABLE multiple_choice_answer ADD CONSTRAINT multiple_choice_answer_one_correct
+--     EXCLUDE USING btree (question_id WITH =) WHERE (is_correct)
+--     DEFERRABLE INITIALLY IMMEDIATE;
 
 -- Image Question Table
 CREATE TABLE image_question (
@@ -200,6 +223,9 @@ CREATE TRIGGER update_updated_at_question_tag BEFORE
 UPDATE
     ON question_tag FOR EACH ROW EXECUTE PROCEDURE update_updated_at_column();
 
+-- The primary key covers lookups by question, this covers lookups by tag
+CREATE INDEX question_tag_tag_id_question_id_idx ON question_tag (tag_id, question_id);
+
 CREATE TABLE passage (
     id BIGINT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
     official_test_id BIGINT REFERENCES official_test(id),
@@ -218,10 +244,294 @@ UPDATE
 
 CREATE TABLE text_passage (
     passage_id BIGINT PRIMARY KEY REFERENCES passage(id) ON DELETE CASCADE,
-    passage_text TEXT NOT NULL
+    passage_text TEXT NOT NULL,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        to_tsvector('english', passage_text)
+    ) STORED
 );
 
+CREATE INDEX text_passage_search_vector_idx ON text_passage USING GIN (search_vector);
+
 CREATE TABLE image_passage (
     passage_id BIGINT PRIMARY KEY REFERENCES passage(id) ON DELETE CASCADE,
     passage_image_s3_key TEXT NOT NULL
-);
\ No newline at end of file
+);
+
+-- Question Read Model
+-- One row per question with its subclass columns, tags and answers, for
+-- reading questions without the inheritance joins. Kept current by the
+-- triggers below, to fill it for existing questions run
+-- SELECT refresh_question_read(id) FROM question;
+CREATE TABLE question_read (
+    id BIGINT PRIMARY KEY,
+    official_test_id BIGINT,
+    official_test_question_number INT,
+    q_type question_type NOT NULL,
+    usage usage_type,
+    section section,
+    sub_section sub_section,
+    passage_id BIGINT,
+    question_text TEXT,
+    explanation TEXT,
+    answer NUMERIC(7, 3),
+    question_image_s3_key TEXT,
+    answer_image_s3_key TEXT,
+    correct_choice INT,
+    -- Arrays of objects with the tag and multiple_choice_answer columns
+    tags JSONB NOT NULL,
+    answers JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL
+);
+
+-- Same as on question, for the list filters
+CREATE INDEX question_read_section_id_idx ON question_read (section, id);
+
+CREATE INDEX question_read_sub_section_id_idx ON question_read (sub_section, id);
+
+CREATE INDEX question_read_usage_id_idx ON question_read (usage, id);
+
+CREATE INDEX question_read_q_type_id_idx ON question_read (q_type, id);
+
+CREATE INDEX question_read_official_test_id_id_idx ON question_read (official_test_id, id);
+
+CREATE INDEX question_read_passage_id_id_idx ON question_read (passage_id, id);
+
+-- Rebuilds the read model rows of the questions, removing those of questions
+-- that are gone. An upsert, so transactions refreshing the same question at once
+-- don't both insert it
+CREATE OR REPLACE FUNCTION refresh_question_read(refresh_question_ids BIGINT[])
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO question_read
+    SELECT
+        q.id,
+        q.official_test_id,
+        q.official_test_question_number,
+        q.q_type,
+        q.usage,
+        q.section,
+        q.sub_section,
+        q.passage_id,
+        tq.question_text,
+        tq.explanation,
+        COALESCE(fq.answer, fiq.answer),
+        iq.question_image_s3_key,
+        iq.answer_image_s3_key,
+        mciq.correct_choice,
+        COALESCE(
+            (
+                SELECT jsonb_agg(to_jsonb(t) ORDER BY t.id)
+                FROM question_tag qt
+                JOIN tag t ON t.id = qt.tag_id
+                WHERE qt.question_id = q.id
+            ),
+            '[]'
+        ),
+        COALESCE(
+            (
+                SELECT jsonb_agg(to_jsonb(a) - 'search_vector' ORDER BY a.choice_number)
+                FROM multiple_choice_answer a
+                WHERE a.question_id = q.id
+            ),
+            '[]'
+        ),
+        q.created_at,
+        q.updated_at
+    FROM question q
+    LEFT JOIN text_question tq ON tq.question_id = q.id
+    LEFT JOIN fill_in_question fq ON fq.question_id = q.id
+    LEFT JOIN image_question iq ON iq.question_id = q.id
+    LEFT JOIN fill_in_image_question fiq ON fiq.question_id = q.id
+    LEFT JOIN multiple_choice_image_question mciq ON mciq.question_id = q.id
+    WHERE q.id = ANY(refresh_question_ids)
+    ON CONFLICT (id) DO UPDATE SET
+        official_test_id = EXCLUDED.official_test_id,
+        official_test_question_number = EXCLUDED.official_test_question_number,
+        q_type = EXCLUDED.q_type,
+        usage = EXCLUDED.usage,
+        section = EXCLUDED.section,
+        sub_section = EXCLUDED.sub_section,
+        passage_id = EXCLUDED.passage_id,
+        question_text = EXCLUDED.question_text,
+        explanation = EXCLUDED.explanation,
+        answer = EXCLUDED.answer,
+        question_image_s3_key = EXCLUDED.question_image_s3_key,
+        answer_image_s3_key = EXCLUDED.answer_image_s3_key,
+        correct_choice = EXCLUDED.correct_choice,
+        tags = EXCLUDED.tags,
+        answers = EXCLUDED.answers,
+        created_at = EXCLUDED.created_at,
+        updated_at = EXCLUDED.updated_at;
+    DELETE FROM question_read
+    WHERE id = ANY(refresh_question_ids)
+        AND NOT EXISTS (SELECT FROM question q WHERE q.id = question_read.id);
+END;
+$$ language 'plpgsql';
+
+-- Refreshes the questions of the rows a statement changed, once each however
+-- many of their rows it changed. The argument is the name of the column holding
+-- the question id, old_rows and new_rows are the statement's transition tables.
+CREATE OR REPLACE FUNCTION refresh_question_read_trigger()
+RETURNS TRIGGER AS $$
+DECLARE
+    question_ids BIGINT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        EXECUTE format('SELECT ARRAY(SELECT DISTINCT %I FROM new_rows)', TG_ARGV[0])
+        INTO question_ids;
+    ELSIF TG_OP = 'DELETE' THEN
+        EXECUTE format('SELECT ARRAY(SELECT DISTINCT %I FROM old_rows)', TG_ARGV[0])
+        INTO question_ids;
+    ELSE
+        EXECUTE format(
+            'SELECT ARRAY(SELECT %1$I FROM old_rows UNION SELECT %1$I FROM new_rows)',
+            TG_ARGV[0]
+        )
+        INTO question_ids;
+    END IF;
+    PERFORM refresh_question_read(question_ids);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Transition tables need a trigger per event
+CREATE TRIGGER refresh_question_read_question_insert AFTER
+INSERT
+    ON question REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('id');
+
+CREATE TRIGGER refresh_question_read_question_update AFTER
+UPDATE
+    ON question REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('id');
+
+CREATE TRIGGER refresh_question_read_question_delete AFTER
+DELETE
+    ON question REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('id');
+
+CREATE TRIGGER refresh_question_read_text_question_insert AFTER
+INSERT
+    ON text_question REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_text_question_update AFTER
+UPDATE
+    ON text_question REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_text_question_delete AFTER
+DELETE
+    ON text_question REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_fill_in_question_insert AFTER
+INSERT
+    ON fill_in_question REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_fill_in_question_update AFTER
+UPDATE
+    ON fill_in_question REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_fill_in_question_delete AFTER
+DELETE
+    ON fill_in_question REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_image_question_insert AFTER
+INSERT
+    ON image_question REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_image_question_update AFTER
+UPDATE
+    ON image_question REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_image_question_delete AFTER
+DELETE
+    ON image_question REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_fill_in_image_question_insert AFTER
+INSERT
+    ON fill_in_image_question REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_fill_in_image_question_update AFTER
+UPDATE
+    ON fill_in_image_question REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_fill_in_image_question_delete AFTER
+DELETE
+    ON fill_in_image_question REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_multiple_choice_image_question_insert AFTER
+INSERT
+    ON multiple_choice_image_question REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_multiple_choice_image_question_update AFTER
+UPDATE
+    ON multiple_choice_image_question REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_multiple_choice_image_question_delete AFTER
+DELETE
+    ON multiple_choice_image_question REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_multiple_choice_answer_insert AFTER
+INSERT
+    ON multiple_choice_answer REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_multiple_choice_answer_update AFTER
+UPDATE
+    ON multiple_choice_answer REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_multiple_choice_answer_delete AFTER
+DELETE
+    ON multiple_choice_answer REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_question_tag_insert AFTER
+INSERT
+    ON question_tag REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_question_tag_update AFTER
+UPDATE
+    ON question_tag REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+CREATE TRIGGER refresh_question_read_question_tag_delete AFTER
+DELETE
+    ON question_tag REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_trigger('question_id');
+
+-- Tag names are copied into the read model, refresh the renamed tags' questions
+CREATE OR REPLACE FUNCTION refresh_question_read_tag()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_question_read(
+        ARRAY(
+            SELECT DISTINCT qt.question_id
+            FROM question_tag qt
+            JOIN new_rows ON new_rows.id = qt.tag_id
+        )
+    );
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER refresh_question_read_tag AFTER
+UPDATE
+    ON tag REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE refresh_question_read_tag();
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.data.env_consts import DB_PORT, TEST_DB_URI
+
+# app.database builds its engine at import time and needs a numeric port
+os.environ.setdefault(DB_PORT, "5432")
+
+from app.database import Base  # noqa: E402
+from app.models import question, tag, test  # noqa: E402, F401
+
+
+@pytest.fixture
+def db_engine():
+    # The routes run the session on threadpool threads
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(db_engine):
+    # Repository functions commit, so run each test in a transaction
+    # and turn those commits into savepoints
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = Session(
+        bind=connection,
+        autoflush=False,
+        join_transaction_mode="create_savepoint",
+    )
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def pg_db():
+    # For statements SQLite can't run. The tables are created in the test's
+    # transaction, so the database is left empty.
+    db_uri = os.environ.get(TEST_DB_URI)
+    if not db_uri:
+        pytest.skip(f"{TEST_DB_URI} is not set")
+    engine = create_engine(db_uri)
+    connection = engine.connect()
+    transaction = connection.begin()
+    Base.metadata.create_all(connection)
+    session = Session(
+        bind=connection,
+        autoflush=False,
+        join_transaction_mode="create_savepoint",
+    )
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+    engine.dispose()
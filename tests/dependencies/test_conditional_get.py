@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+from starlette.requests import Request
+
+from app.dependencies.conditional_get import (
+    generate_etag,
+    get_last_modified,
+    is_not_modified,
+)
+
+VERSIONS = [
+    (12, datetime(2023, 6, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)),
+    (0, None),
+]
+
+
+def make_request(headers: dict[str, str]) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.lower().encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def test_etag_changes_with_count_and_updated_at():
+    etag = generate_etag(VERSIONS)
+
+    assert etag == generate_etag(list(VERSIONS))
+    assert etag != generate_etag([(11, VERSIONS[0][1]), (0, None)])
+    assert etag != generate_etag([(12, datetime(2023, 6, 2)), (0, None)])
+
+
+def test_is_not_modified_if_none_match():
+    etag = generate_etag(VERSIONS)
+    last_modified = get_last_modified(VERSIONS)
+
+    assert is_not_modified(make_request({"If-None-Match": etag}), etag, last_modified)
+    assert is_not_modified(
+        make_request({"If-None-Match": f'"other", {etag.removeprefix("W/")}'}),
+        etag,
+        last_modified,
+    )
+    # If-None-Match wins over a matching If-Modified-Since
+    assert not is_not_modified(
+        make_request(
+            {
+                "If-None-Match": '"other"',
+                "If-Modified-Since": "Thu, 01 Jun 2023 12:30:15 GMT",
+            }
+        ),
+        etag,
+        last_modified,
+    )
+
+
+def test_is_not_modified_if_modified_since():
+    etag = generate_etag(VERSIONS)
+    last_modified = get_last_modified(VERSIONS)
+
+    assert is_not_modified(
+        make_request({"If-Modified-Since": "Thu, 01 Jun 2023 12:30:15 GMT"}),
+        etag,
+        last_modified,
+    )
+    assert not is_not_modified(
+        make_request({"If-Modified-Since": "Thu, 01 Jun 2023 12:30:14 GMT"}),
+        etag,
+        last_modified,
+    )
+    assert not is_not_modified(
+        make_request({"If-Modified-Since": "not a date"}), etag, last_modified
+    )
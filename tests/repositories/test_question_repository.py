@@ -0,0 +1,1012 @@
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import (
+    delete,
+    event,
+    insert,
+    literal_column,
+    select,
+    text,
+    update,
+)
+
+from app.data.question_enums import (
+    PassageType,
+    QuestionType,
+    Section,
+    SubSection,
+    UsageType,
+)
+from app.exceptions.exceptions import TagNotFoundException
+from app.models import question as question_models
+from app.models import tag as tag_models
+from app.models import test as test_models
+from app.repositories import (
+    question_repository,
+    table_version_repository,
+    tag_repository,
+)
+from app.schemas import question as question_schemas
+
+SCHEMA_PATH = Path(__file__).parents[2] / "db_schema" / "schema.sql"
+
+QUESTION_TYPES = [
+    QuestionType.FILL_IN,
+    QuestionType.MULTIPLE_CHOICE,
+    QuestionType.FILL_IN_IMAGE,
+    QuestionType.MULTIPLE_CHOICE_IMAGE,
+]
+
+
+def insert_questions(db, count):
+    db.execute(
+        insert(test_models.OfficialTest.__table__),
+        [{"id": 1, "year": 2022, "form": "A"}],
+    )
+    db.execute(insert(tag_models.Category.__table__), [{"id": 1, "name": "Math"}])
+    db.execute(
+        insert(tag_models.Subcategory.__table__),
+        [{"id": 1, "category_id": 1, "name": "Algebra"}],
+    )
+    db.execute(
+        insert(tag_models.Tag.__table__),
+        [{"id": i, "subcategory_id": 1, "name": f"Tag {i}"} for i in (1, 2)],
+    )
+
+    questions, text_questions, image_questions, tags, answers = [], [], [], [], []
+    fill_ins, fill_in_images, multiple_choice_images = [], [], []
+    for question_id in range(1, count + 1):
+        q_type = QUESTION_TYPES[question_id % len(QUESTION_TYPES)]
+        questions.append(
+            {
+                "id": question_id,
+                "official_test_id": 1,
+                "official_test_question_number": question_id,
+                "q_type": q_type,
+            }
+        )
+        tags.append({"question_id": question_id, "tag_id": 1 + question_id % 2})
+        if q_type in (QuestionType.FILL_IN, QuestionType.MULTIPLE_CHOICE):
+            text_questions.append(
+                {
+                    "question_id": question_id,
+                    "question_text": f"Question {question_id}",
+                    "explanation": "Explanation",
+                }
+            )
+        else:
+            image_questions.append(
+                {
+                    "question_id": question_id,
+                    "question_image_s3_key": "question.png",
+                    "answer_image_s3_key": "answer.png",
+                }
+            )
+        if q_type == QuestionType.FILL_IN:
+            fill_ins.append({"question_id": question_id, "answer": 1.5})
+        elif q_type == QuestionType.MULTIPLE_CHOICE:
+            answers.extend(
+                {
+                    "question_id": question_id,
+                    "choice_number": choice_number,
+                    "answer_text": f"Choice {choice_number}",
+                    "is_correct": choice_number == 1,
+                }
+                for choice_number in range(1, 5)
+            )
+        elif q_type == QuestionType.FILL_IN_IMAGE:
+            fill_in_images.append({"question_id": question_id, "answer": 2})
+        else:
+            multiple_choice_images.append(
+                {"question_id": question_id, "correct_choice": 3}
+            )
+
+    for model, rows in (
+        (question_models.Question, questions),
+        (question_models.TextQuestion, text_questions),
+        (question_models.ImageQuestion, image_questions),
+        (question_models.FillInQuestion, fill_ins),
+        (question_models.FillInImageQuestion, fill_in_images),
+        (question_models.MultipleChoiceImageQuestion, multiple_choice_images),
+        (question_models.MultipleChoiceAnswer, answers),
+        (question_models.question_tag_table, tags),
+    ):
+        if rows:
+            db.execute(insert(getattr(model, "__table__", model)), rows)
+    db.commit()
+
+
+@pytest.mark.parametrize("count", [10, 1_000, 10_000])
+def test_get_questions_statement_count(db, count):
+    insert_questions(db, count)
+    db.expunge_all()
+    # Start the session's next savepoint so only the list statements are counted
+    db.connection()
+
+    statements = []
+    event.listen(
+        db.get_bind(),
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    questions, next_cursor = question_repository.get_questions(
+        db, question_schemas.QuestionFilters(), limit=count
+    )
+    # Serializing touches every column and relationship the route returns
+    serialized = [
+        question_schemas.QuestionWithAnswers.from_orm(question)
+        for question in questions
+    ]
+
+    assert len(serialized) == count
+    assert next_cursor is None
+    # Questions with subclass tables, tags, multiple choice answers
+    assert len(statements) == 3, statements
+
+
+def bulk_question(q_type: QuestionType, number: int, **fields):
+    question: dict[str, Any] = {
+        "officialTestId": 1,
+        "officialTestQuestionNumber": number,
+        "qType": q_type.value,
+        "tags": [{"id": 1}],
+    }
+    if q_type in (QuestionType.FILL_IN, QuestionType.MULTIPLE_CHOICE):
+        question.update(questionText=f"Question {number}", explanation="Because")
+    else:
+        question.update(questionImageS3Key="question.png", answerImageS3Key="a.png")
+    if q_type in (QuestionType.FILL_IN, QuestionType.FILL_IN_IMAGE):
+        question["answer"] = 1.5
+    elif q_type == QuestionType.MULTIPLE_CHOICE:
+        question["answers"] = [
+            {"choiceNumber": k, "answerText": f"Choice {k}", "isCorrect": k == 2}
+            for k in range(1, 5)
+        ]
+    else:
+        question["correctChoice"] = 4
+    question.update(fields)
+    return question_schemas.BulkQuestionCreate.parse_obj(question)
+
+
+def test_create_questions_bulk(db):
+    insert_questions(db, 0)
+    questions = [
+        bulk_question(q_type, number)
+        for number in range(1, 41)
+        for q_type in QUESTION_TYPES
+    ]
+    questions.insert(1, bulk_question(QuestionType.FILL_IN, 99, tags=[{"id": 3}]))
+    db.connection()
+
+    statements = []
+    event.listen(
+        db.get_bind(),
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    result = question_repository.create_questions_bulk(db, questions)
+
+    assert result["errors"] == [{"index": 1, "detail": "Tags not found, ids: [3]"}]
+    assert [created["index"] for created in result["created"]] == [
+        index for index in range(len(questions)) if index != 1
+    ]
+    # Tag and test lookups, one insert per subclass table of each question type,
+    # answers, question tags and the commit's RELEASE SAVEPOINT. The question
+    # table inserts are left out as SQLite runs the ordered INSERT ... RETURNING
+    # row by row where PostgreSQL batches it
+    statements = [s for s in statements if not s.startswith("INSERT INTO question ")]
+    assert len(statements) == 12, statements
+
+    db.expunge_all()
+    questions, _ = question_repository.get_questions(
+        db, question_schemas.QuestionFilters(), limit=1000
+    )
+    assert len(questions) == 160
+    # Index 2 is the first multiple choice question, after the invalid one
+    multiple_choice = db.get(
+        question_models.MultipleChoiceQuestion, result["created"][1]["id"]
+    )
+    assert [answer.is_correct for answer in multiple_choice.answers] == [
+        False,
+        True,
+        False,
+        False,
+    ]
+    assert [tag.id for tag in multiple_choice.tags] == [1]
+
+
+def test_create_questions_bulk_strict(db):
+    insert_questions(db, 0)
+    questions = [
+        bulk_question(QuestionType.FILL_IN, 1),
+        bulk_question(QuestionType.FILL_IN, 2, passageId=5),
+    ]
+
+    with pytest.raises(HTTPException) as exc_info:
+        question_repository.create_questions_bulk(db, questions, strict=True)
+
+    assert exc_info.value.detail["errors"] == [
+        {"index": 1, "detail": "Passage not found, id: 5"}
+    ]
+    assert db.scalars(select(question_models.Question)).all() == []
+
+
+def bulk_update(**fields) -> question_schemas.BulkQuestionUpdate:
+    return question_schemas.BulkQuestionUpdate.parse_obj(fields)
+
+
+def get_question_tags(db) -> dict[int, list[int]]:
+    question_tag = question_models.question_tag_table
+    rows = db.execute(
+        select(question_tag.c.question_id, question_tag.c.tag_id).order_by(
+            question_tag.c.question_id, question_tag.c.tag_id
+        )
+    )
+    tags: dict[int, list[int]] = {}
+    for question_id, tag_id in rows:
+        tags.setdefault(question_id, []).append(tag_id)
+    return tags
+
+
+def test_update_questions_bulk(db):
+    insert_questions(db, 8)
+    update = bulk_update(
+        ids=[1, 2, 3, 4, 5, 9],
+        update={"subSection": "MATH_FILL_IN", "usage": "TEST_QUESTION"},
+    )
+    statements = record_statements(db)
+
+    result = question_repository.update_questions_bulk(db, update)
+
+    assert result == {
+        "matched": 5,
+        "updated": 5,
+        "ids": [1, 2, 3, 4, 5],
+        "dry_run": False,
+    }
+    # The count and the update, whatever the number of questions
+    assert len(statements) == 2, statements
+    rows = db.execute(
+        select(question_models.Question.id, question_models.Question.sub_section)
+        .where(question_models.Question.usage == UsageType.TEST_QUESTION)
+        .order_by(question_models.Question.id)
+    ).all()
+    assert rows == [(k, SubSection.MATH_FILL_IN) for k in range(1, 6)]
+
+    # Questions already up to date aren't written
+    result = question_repository.update_questions_bulk(db, update)
+    assert (result["matched"], result["updated"]) == (5, 0)
+
+
+def test_update_questions_bulk_tags(db):
+    insert_questions(db, 8)
+    update = bulk_update(
+        filters={"qType": "FILL_IN"}, update={"tags": [{"id": 1}, {"id": 2}]}
+    )
+
+    dry_run = question_repository.update_questions_bulk(db, update, dry_run=True)
+    assert dry_run == {"matched": 2, "updated": 2, "ids": [4, 8], "dry_run": True}
+    assert get_question_tags(db)[4] == [1]
+
+    question_repository.update_questions_bulk(db, update)
+    tags = get_question_tags(db)
+    assert tags[4] == [1, 2]
+    # Not a fill in question
+    assert tags[5] == [2]
+
+    update = bulk_update(filters={"qType": "FILL_IN"}, update={"tags": [{"id": 2}]})
+    result = question_repository.update_questions_bulk(db, update)
+    assert result["ids"] == [4, 8]
+    assert get_question_tags(db)[4] == [2]
+
+
+def test_update_questions_bulk_filtered_column(db):
+    insert_questions(db, 8)
+    question_repository.update_questions_bulk(
+        db, bulk_update(ids=[4, 8], update={"subSection": "MATH_FILL_IN"})
+    )
+    # The update moves the questions out of the filtered sub section
+    update = bulk_update(
+        filters={"subSection": "MATH_FILL_IN"},
+        update={"subSection": "MATH_MULTIPLE_CHOICE", "tags": [{"id": 1}, {"id": 2}]},
+    )
+
+    result = question_repository.update_questions_bulk(db, update)
+
+    assert result["ids"] == [4, 8]
+    tags = get_question_tags(db)
+    assert tags[4] == tags[8] == [1, 2]
+    assert tags[5] == [2]
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"update": {"usage": "TEST_QUESTION"}},
+        {"filters": {}, "update": {"usage": "TEST_QUESTION"}},
+        {"ids": [1], "update": {}},
+        {"ids": [1], "update": {"tags": [{"id": 3}]}},
+        {"ids": [1], "update": {"passageId": 5}},
+    ],
+)
+def test_update_questions_bulk_invalid(db, fields):
+    insert_questions(db, 4)
+
+    with pytest.raises(HTTPException):
+        question_repository.update_questions_bulk(db, bulk_update(**fields))
+
+
+def create_question_read_triggers(db):
+    # The read model functions and triggers, which create_all doesn't make
+    schema = SCHEMA_PATH.read_text()
+    start = schema.index("CREATE OR REPLACE FUNCTION refresh_question_read(")
+    end_marker = "EXECUTE PROCEDURE refresh_question_read_tag();"
+    end = schema.index(end_marker) + len(end_marker)
+    # Escaped for the driver's parameter style, format() in the SQL uses %
+    db.connection().exec_driver_sql(schema[start:end].replace("%", "%%"))
+
+
+def get_question_read(db) -> dict[int, question_models.QuestionRead]:
+    db.expire_all()
+    return {row.id: row for row in db.scalars(select(question_models.QuestionRead))}
+
+
+def test_question_read_triggers(pg_db):
+    db = pg_db
+    create_question_read_triggers(db)
+    insert_questions(db, 4)
+
+    rows = get_question_read(db)
+    assert sorted(rows) == [1, 2, 3, 4]
+    assert rows[1].q_type == QuestionType.MULTIPLE_CHOICE
+    assert rows[1].question_text == "Question 1"
+    assert [answer["choice_number"] for answer in rows[1].answers] == [1, 2, 3, 4]
+    assert [tag["name"] for tag in rows[1].tags] == ["Tag 2"]
+    assert float(rows[2].answer) == 2
+    assert rows[3].correct_choice == 3
+    assert rows[4].question_image_s3_key is None
+    assert float(rows[4].answer) == 1.5
+
+    question = question_models.Question.__table__
+    answer = question_models.MultipleChoiceAnswer.__table__
+    question_tag = question_models.question_tag_table
+    db.execute(update(question).where(question.c.id == 1).values(section="MATH"))
+    db.execute(
+        update(question_models.TextQuestion.__table__)
+        .where(question_models.TextQuestion.question_id == 1)
+        .values(question_text="Edited")
+    )
+    db.execute(
+        update(answer)
+        .where(answer.c.question_id == 1, answer.c.choice_number == 2)
+        .values(answer_text="Edited choice")
+    )
+    db.execute(insert(question_tag), [{"question_id": 1, "tag_id": 1}])
+    db.execute(
+        update(tag_models.Tag.__table__)
+        .where(tag_models.Tag.id == 2)
+        .values(name="Renamed")
+    )
+    db.execute(delete(question_tag).where(question_tag.c.question_id.in_([3, 4])))
+    for model in (question_models.FillInQuestion, question_models.TextQuestion):
+        db.execute(delete(model.__table__).where(model.question_id == 4))
+    db.execute(delete(question).where(question.c.id == 4))
+
+    rows = get_question_read(db)
+    assert sorted(rows) == [1, 2, 3]
+    assert rows[1].section.value == "MATH"
+    assert rows[1].question_text == "Edited"
+    assert rows[1].answers[1]["answer_text"] == "Edited choice"
+    assert [tag["name"] for tag in rows[1].tags] == ["Tag 1", "Renamed"]
+    assert rows[3].tags == []
+
+
+def get_refresh_calls(db) -> int:
+    stmt = text(
+        "SELECT COALESCE(sum(calls), 0) FROM pg_stat_xact_user_functions "
+        "WHERE funcname = 'refresh_question_read'"
+    )
+    return db.execute(stmt).scalar_one()
+
+
+def test_question_read_triggers_per_statement(pg_db):
+    db = pg_db
+    create_question_read_triggers(db)
+    insert_questions(db, 8)
+    db.execute(text("SET LOCAL track_functions = 'pl'"))
+    answer = question_models.MultipleChoiceAnswer.__table__
+    calls = get_refresh_calls(db)
+
+    # Every answer of two questions, and two tags used by all of them
+    db.execute(
+        update(answer)
+        .where(answer.c.question_id.in_([1, 5]))
+        .values(answer_text=answer.c.answer_text + "!")
+    )
+    db.execute(update(tag_models.Tag.__table__).values(name=tag_models.Tag.name + "!"))
+
+    # Once per statement, not once per row
+    assert get_refresh_calls(db) - calls == 2
+    rows = get_question_read(db)
+    assert rows[5].answers[0]["answer_text"] == "Choice 1!"
+    assert [tag["name"] for tag in rows[8].tags] == ["Tag 1!"]
+
+
+def test_get_questions_from_read_model(db):
+    insert_questions(db, 0)
+    tag = {
+        "id": 2,
+        "subcategory_id": 1,
+        "name": "Tag 2",
+        "created_at": "2023-06-01T12:00:00+00:00",
+        "updated_at": "2023-06-01T12:00:00+00:00",
+    }
+    answers = [
+        {
+            "question_id": 2,
+            "choice_number": choice_number,
+            "answer_text": f"Choice {choice_number}",
+            "is_correct": choice_number == 1,
+            "created_at": "2023-06-01T12:00:00+00:00",
+            "updated_at": "2023-06-01T12:00:00+00:00",
+        }
+        for choice_number in range(1, 5)
+    ]
+    common = {
+        "official_test_id": 1,
+        "created_at": datetime(2023, 6, 1),
+        "updated_at": datetime(2023, 6, 1),
+    }
+    db.execute(
+        insert(question_models.QuestionRead),
+        [
+            {
+                **common,
+                "id": 1,
+                "official_test_question_number": 1,
+                "q_type": QuestionType.FILL_IN_IMAGE,
+                "question_image_s3_key": "question.png",
+                "answer_image_s3_key": "answer.png",
+                "answer": 2.5,
+                "tags": [],
+                "answers": [],
+            },
+            {
+                **common,
+                "id": 2,
+                "official_test_question_number": 2,
+                "q_type": QuestionType.MULTIPLE_CHOICE,
+                "question_text": "Question",
+                "explanation": "Explanation",
+                "tags": [tag],
+                "answers": answers,
+            },
+        ],
+    )
+    db.execute(
+        insert(question_models.question_tag_table), [{"question_id": 2, "tag_id": 2}]
+    )
+
+    questions, next_cursor = question_repository.get_questions_from_read_model(
+        db, question_schemas.QuestionFilters(), limit=1
+    )
+    assert [question["id"] for question in questions] == [1]
+    assert next_cursor == 1
+
+    questions, next_cursor = question_repository.get_questions_from_read_model(
+        db, question_schemas.QuestionFilters(tag_ids=[2]), cursor=next_cursor
+    )
+    page = question_schemas.QuestionPage.parse_obj(
+        {"items": questions, "next_cursor": next_cursor}
+    )
+    question = page.items[0].__root__
+    assert isinstance(question, question_schemas.MultipleChoiceQuestion)
+    assert [tag.name for tag in question.tags] == ["Tag 2"]
+    assert [answer.is_correct for answer in question.answers] == [
+        True,
+        False,
+        False,
+        False,
+    ]
+    assert page.next_cursor is None
+
+
+def record_statements(db) -> list[str]:
+    # Starts the session's next savepoint first, savepoints aren't recorded
+    db.connection()
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if "SAVEPOINT" not in statement:
+            statements.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    return statements
+
+
+def serialize_patched(question) -> dict:
+    data = question_schemas.QuestionWithAnswers.parse_obj(question).dict()
+    # The two updates run one after the other
+    data["__root__"].pop("updated_at")
+    for answer in data["__root__"].get("answers", []):
+        answer.pop("created_at")
+        answer.pop("updated_at")
+    return data
+
+
+@pytest.mark.parametrize(
+    "question_class, question_id, update, statement_count",
+    [
+        (
+            question_models.FillInQuestion,
+            4,
+            question_schemas.FillInQuestionUpdate(answer=2.5),
+            1,
+        ),
+        (
+            question_models.FillInQuestion,
+            4,
+            question_schemas.FillInQuestionUpdate(
+                official_test_question_number=40,
+                question_text="Changed",
+                tags=[{"id": 2}, {"id": 1}],
+            ),
+            1,
+        ),
+        (
+            question_models.MultipleChoiceQuestion,
+            1,
+            question_schemas.MultipleChoiceQuestionUpdate(explanation="Changed"),
+            1,
+        ),
+        (
+            question_models.MultipleChoiceQuestion,
+            1,
+            question_schemas.MultipleChoiceQuestionUpdate(
+                answers=[
+                    {
+                        "choice_number": number,
+                        "answer_text": f"Choice {number}",
+                        "is_correct": number == 3,
+                    }
+                    for number in range(1, 5)
+                ]
+            ),
+            # Plus upserting the answers
+            2,
+        ),
+        (
+            question_models.FillInImageQuestion,
+            2,
+            question_schemas.FillInImageQuestionUpdate(answer_image_s3_key="a.png"),
+            1,
+        ),
+        (
+            question_models.MultipleChoiceImageQuestion,
+            3,
+            question_schemas.MultipleChoiceImageQuestionUpdate(correct_choice=1),
+            1,
+        ),
+    ],
+)
+def test_patch_question(pg_db, question_class, question_id, update, statement_count):
+    db = pg_db
+    insert_questions(db, 4)
+    tag_repository.taxonomy_cache.invalidate()
+    # Load the tag cache, as it usually is
+    tag_repository.get_tags_by_id(db)
+
+    statements = record_statements(db)
+    patched = question_repository.patch_question(
+        db, question_id, update, question_class
+    )
+    assert len(statements) == statement_count, statements
+
+    # Same as loading and flushing the model
+    updated = question_repository.update_question(
+        db, question_id, update, question_class
+    )
+    assert serialize_patched(patched) == serialize_patched(updated)
+
+
+def test_patch_question_not_found(pg_db):
+    db = pg_db
+    insert_questions(db, 4)
+    update = question_schemas.FillInQuestionUpdate(question_text="Changed")
+
+    # Question 1 is a multiple choice question, sharing the text_question table
+    for question_id in (1, 5):
+        with pytest.raises(HTTPException):
+            question_repository.patch_question(
+                db, question_id, update, question_models.FillInQuestion
+            )
+        # As when the request's session is closed
+        db.rollback()
+
+    question_text = db.scalar(
+        select(question_models.TextQuestion.question_text).where(
+            question_models.TextQuestion.id == 1
+        )
+    )
+    assert question_text == "Question 1"
+
+
+def test_patch_question_tag_not_found(pg_db):
+    db = pg_db
+    insert_questions(db, 4)
+    update = question_schemas.FillInQuestionUpdate(tags=[{"id": 1}, {"id": 3}])
+
+    with pytest.raises(TagNotFoundException):
+        question_repository.patch_question(
+            db, 4, update, question_models.FillInQuestion
+        )
+    # As when the request's session is closed
+    db.rollback()
+
+    assert get_question_tags(db)[4] == [1]
+
+
+def test_patch_passage(pg_db):
+    db = pg_db
+    db.execute(
+        insert(question_models.Passage.__table__),
+        [{"id": 1, "p_type": PassageType.TEXT, "title": "Title"}],
+    )
+    db.execute(
+        insert(question_models.TextPassage.__table__),
+        [{"passage_id": 1, "passage_text": "Text"}],
+    )
+
+    statements = record_statements(db)
+    passage = question_repository.patch_passage(
+        db,
+        1,
+        question_schemas.TextPassageUpdate(passage_text="Changed"),
+        question_models.TextPassage,
+    )
+
+    assert len(statements) == 1, statements
+    assert question_schemas.TextPassage.parse_obj(passage).passage_text == "Changed"
+
+
+def get_answers(db, question_id) -> list[tuple]:
+    answer = question_models.MultipleChoiceAnswer
+    return db.execute(
+        select(answer.choice_number, answer.answer_text, answer.is_correct)
+        .where(answer.question_id == question_id)
+        .order_by(answer.choice_number)
+    ).all()
+
+
+def sent_answers(*answers: tuple) -> list[question_schemas.MultipleChoiceAnswerCreate]:
+    return [
+        question_schemas.MultipleChoiceAnswerCreate(
+            choice_number=choice_number, answer_text=answer_text, is_correct=is_correct
+        )
+        for choice_number, answer_text, is_correct in answers
+    ]
+
+
+def test_upsert_answers(pg_db):
+    db = pg_db
+    insert_questions(db, 4)
+    answers = [
+        (1, "Choice 1", False),
+        (2, "Changed", False),
+        (3, "Choice 3", True),
+        (4, "Choice 4", False),
+    ]
+
+    def get_row_versions() -> dict[int, str]:
+        # Updating a row writes a new version of it, at a new ctid
+        answer = question_models.MultipleChoiceAnswer
+        rows = db.execute(
+            select(answer.choice_number, literal_column("ctid::text")).where(
+                answer.question_id == 1
+            )
+        )
+        return dict(rows.all())
+
+    versions = get_row_versions()
+    statements = record_statements(db)
+    question_repository.upsert_answers(db, 1, sent_answers(*answers))
+
+    # Moving the correct answer from choice 1 to 3 passes the constraint, checked
+    # at the end of the statement
+    assert len(statements) == 1, statements
+    assert get_answers(db, 1) == answers
+    new_versions = get_row_versions()
+    # Choice 4 is unchanged and not written
+    assert [k for k in versions if versions[k] != new_versions[k]] == [1, 2, 3]
+
+
+def test_upsert_answers_deletes_missing_choices(pg_db):
+    db = pg_db
+    insert_questions(db, 4)
+
+    question_repository.upsert_answers(
+        db, 1, sent_answers((1, "Choice 1", False), (2, "Choice 2", True))
+    )
+
+    assert get_answers(db, 1) == [(1, "Choice 1", False), (2, "Choice 2", True)]
+
+
+@pytest.mark.parametrize("correct", [[], [1, 2]])
+def test_upsert_answers_correct_count(pg_db, correct):
+    db = pg_db
+    insert_questions(db, 4)
+
+    with pytest.raises(HTTPException):
+        question_repository.upsert_answers(
+            db,
+            1,
+            sent_answers(*[(k, f"Choice {k}", k in correct) for k in range(1, 5)]),
+        )
+
+    assert get_answers(db, 1)[0] == (1, "Choice 1", True)
+
+
+def test_upsert_answers_not_multiple_choice(pg_db):
+    db = pg_db
+    insert_questions(db, 4)
+
+    # Question 4 is a fill in question
+    question_repository.upsert_answers(db, 4, sent_answers((1, "Choice 1", True)))
+
+    assert get_answers(db, 4) == []
+
+
+def test_add_and_remove_question_tags(pg_db):
+    db = pg_db
+    insert_questions(db, 4)
+    # Questions 2 and 4 have tag 1, 1 and 3 have tag 2
+    change = question_schemas.QuestionTagsChange(
+        question_ids=[1, 2, 3, 5], tag_ids=[1, 2]
+    )
+
+    statements = record_statements(db)
+    result = question_repository.add_question_tags(db, change)
+
+    # The tag lookup and the insert
+    assert len(statements) == 2, statements
+    assert result == {"tags": [{"tag_id": 1, "count": 2}, {"tag_id": 2, "count": 1}]}
+    assert get_question_tags(db) == {1: [1, 2], 2: [1, 2], 3: [1, 2], 4: [1]}
+
+    change = question_schemas.QuestionTagsChange(question_ids=[2, 4], tag_ids=[1])
+    result = question_repository.remove_question_tags(db, change)
+
+    assert result == {"tags": [{"tag_id": 1, "count": 2}]}
+    assert get_question_tags(db) == {1: [1, 2], 2: [2], 3: [1, 2]}
+
+
+def test_add_question_tags_not_found(pg_db):
+    db = pg_db
+    insert_questions(db, 4)
+    change = question_schemas.QuestionTagsChange(question_ids=[1], tag_ids=[1, 3])
+
+    with pytest.raises(HTTPException) as exc_info:
+        question_repository.add_question_tags(db, change)
+
+    assert exc_info.value.detail == "Tags not found, ids: [3]"
+
+
+def test_get_tags_by_ids_duplicates(db):
+    insert_questions(db, 0)
+    tag_repository.taxonomy_cache.invalidate()
+
+    tags = question_repository.get_tags_by_ids(db, [2, 1, 2])
+
+    assert [tag.id for tag in tags] == [2, 1]
+    with pytest.raises(TagNotFoundException):
+        question_repository.get_tags_by_ids(db, [1, 3, 3])
+
+
+def facet_counts(facets: dict) -> dict[str, dict]:
+    # Facet values by count, ties come in any order
+    return {
+        name: {count["value"]: count["count"] for count in counts}
+        for name, counts in facets.items()
+        if name != "total"
+    }
+
+
+def test_get_question_facets(pg_db):
+    db = pg_db
+    insert_questions(db, 8)
+    # Question 1 also has tag 1, questions 1 to 3 are math questions
+    db.execute(
+        insert(question_models.question_tag_table), [{"question_id": 1, "tag_id": 1}]
+    )
+    db.execute(
+        update(question_models.Question.__table__)
+        .where(question_models.Question.__table__.c.id <= 3)
+        .values(section=Section.MATH)
+    )
+    db.commit()
+    question_repository.facet_cache.invalidate()
+
+    facets = question_repository.get_question_facets(
+        db, question_schemas.QuestionFilters(tag_ids=[1])
+    )
+
+    # Questions 1, 2, 4, 6 and 8, each counted once for its two tags
+    assert facets["total"] == 5
+    assert facet_counts(facets) == {
+        "section": {"MATH": 2, None: 3},
+        "sub_section": {None: 5},
+        "usage": {None: 5},
+        "q_type": {
+            QuestionType.FILL_IN.value: 2,
+            QuestionType.MULTIPLE_CHOICE.value: 1,
+            QuestionType.FILL_IN_IMAGE.value: 2,
+        },
+        "official_test_id": {1: 5},
+        "tag_id": {1: 5, 2: 1},
+    }
+    assert [count["count"] for count in facets["tag_id"]] == [5, 1]
+
+    facets = question_repository.get_question_facets(
+        db, question_schemas.QuestionFilters(section=Section.MATH)
+    )
+
+    # Questions 1 to 3
+    assert facets["total"] == 3
+    assert facet_counts(facets)["tag_id"] == {1: 2, 2: 2}
+
+
+def test_get_question_facets_cache(pg_db):
+    db = pg_db
+    insert_questions(db, 4)
+    question_repository.facet_cache.invalidate()
+    filters = question_schemas.QuestionFilters()
+    facets = question_repository.get_question_facets(db, filters)
+
+    statements = record_statements(db)
+    assert question_repository.get_question_facets(db, filters) == facets
+    # Only the table versions
+    assert len(statements) == 1, statements
+
+    # Versions conditional_get already checked aren't queried again
+    tables = [question_models.Question.__table__, question_models.question_tag_table]
+    versions = table_version_repository.get_table_versions(db, tables)
+    statements.clear()
+    table_versions = {table.name: version for table, version in zip(tables, versions)}
+    assert (
+        question_repository.get_question_facets(db, filters, table_versions) == facets
+    )
+    assert statements == []
+
+    # Tag changes are counted straight away
+    db.execute(
+        insert(question_models.question_tag_table), [{"question_id": 1, "tag_id": 1}]
+    )
+    facets = question_repository.get_question_facets(db, filters)
+    assert facet_counts(facets)["tag_id"] == {1: 3, 2: 2}
+
+
+def create_search_vectors(db):
+    # The generated search_vector columns, which aren't mapped on the models
+    schema = SCHEMA_PATH.read_text()
+    for table, column in re.findall(
+        r"CREATE TABLE (\w+) \((?:(?!CREATE TABLE).)*?"
+        r"(search_vector TSVECTOR GENERATED ALWAYS AS \(.*?\) STORED)",
+        schema,
+        re.DOTALL,
+    ):
+        db.connection().exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column}")
+
+
+def insert_search_content(db):
+    insert_questions(db, 4)
+    create_search_vectors(db)
+    db.execute(
+        insert(question_models.Passage.__table__),
+        [{"id": 1, "p_type": PassageType.TEXT, "title": "Orchard"}],
+    )
+    db.execute(
+        insert(question_models.TextPassage.__table__),
+        [{"passage_id": 1, "passage_text": "The orchard grows apples and pears."}],
+    )
+    text_question = question_models.TextQuestion.__table__
+    # Question 1 only matches apples through an answer
+    db.execute(
+        update(text_question)
+        .where(text_question.c.question_id == 1)
+        .values(question_text="Which fruit does the farmer sell?")
+    )
+    answer = question_models.MultipleChoiceAnswer.__table__
+    db.execute(
+        update(answer)
+        .where(answer.c.question_id == 1, answer.c.choice_number == 2)
+        .values(answer_text="Apples")
+    )
+    db.execute(
+        update(text_question)
+        .where(text_question.c.question_id == 4)
+        .values(
+            question_text="How many apples grow on each tree?",
+            explanation="Divide the apples by the trees.",
+        )
+    )
+    db.execute(
+        update(question_models.Question.__table__)
+        .where(question_models.Question.__table__.c.id == 4)
+        .values(passage_id=1)
+    )
+
+
+def search_hits(result: dict) -> list[tuple[str, int]]:
+    return [(item["type"], item["id"]) for item in result["items"]]
+
+
+def test_search(pg_db):
+    db = pg_db
+    insert_search_content(db)
+    filters = question_schemas.QuestionFilters()
+
+    result = question_repository.search(db, "apples", filters)
+
+    assert result["total"] == 3
+    # Matches in the question text rank first
+    assert search_hits(result)[0] == ("question", 4)
+    assert set(search_hits(result)) == {
+        ("question", 4),
+        ("question", 1),
+        ("passage", 1),
+    }
+    ranks = [item["rank"] for item in result["items"]]
+    assert ranks == sorted(ranks, reverse=True)
+    items = {(item["type"], item["id"]): item for item in result["items"]}
+    assert "<mark>Apples</mark>" in items["question", 1]["snippet"]
+    assert items["question", 1]["q_type"] == QuestionType.MULTIPLE_CHOICE
+    assert "<mark>apples</mark>" in items["passage", 1]["snippet"]
+    assert items["passage", 1]["title"] == "Orchard"
+
+    # Web search syntax, pears only appears in the passage
+    result = question_repository.search(db, "apples -pears", filters)
+    assert sorted(search_hits(result)) == [("question", 1), ("question", 4)]
+
+
+def test_search_filters_and_pages(pg_db):
+    db = pg_db
+    insert_search_content(db)
+
+    # Passages are limited to those of the filtered questions
+    result = question_repository.search(
+        db, "apples", question_schemas.QuestionFilters(q_type=QuestionType.FILL_IN)
+    )
+    assert search_hits(result) == [("question", 4), ("passage", 1)]
+    result = question_repository.search(
+        db,
+        "apples",
+        question_schemas.QuestionFilters(q_type=QuestionType.MULTIPLE_CHOICE),
+    )
+    assert search_hits(result) == [("question", 1)]
+
+    filters = question_schemas.QuestionFilters()
+    result = question_repository.search(db, "apples", filters, limit=1, offset=1)
+    assert len(result["items"]) == 1
+    assert result["total"] == 3
+    # Past the last page
+    result = question_repository.search(db, "apples", filters, offset=5)
+    assert result == {"items": [], "total": 3}
+
+
+@pytest.mark.parametrize("query_text", ["the", "-", "zebras"])
+def test_search_no_hits(pg_db, query_text):
+    db = pg_db
+    insert_search_content(db)
+
+    # Stop words and bare operators make an empty query, which matches nothing
+    result = question_repository.search(
+        db, query_text, question_schemas.QuestionFilters()
+    )
+
+    assert result == {"items": [], "total": 0}
@@ -0,0 +1,105 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, insert
+
+from app.models import tag as tag_models
+from app.repositories import table_version_repository, tag_repository
+from app.schemas import tag as tag_schemas
+
+
+def record_statements(db) -> list[str]:
+    db.connection()
+    statements: list[str] = []
+    event.listen(
+        db.get_bind(),
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    return statements
+
+
+def test_patch_taxonomy_row(db):
+    db.execute(insert(tag_models.Category.__table__), [{"id": 1, "name": "Math"}])
+    db.execute(
+        insert(tag_models.Subcategory.__table__),
+        [{"id": 1, "category_id": 1, "name": "Algebra"}],
+    )
+    statements = record_statements(db)
+
+    subcategory = tag_repository.patch_taxonomy_row(
+        db,
+        tag_models.Subcategory,
+        1,
+        tag_schemas.SubcategoryUpdate(name="Geometry"),
+    )
+
+    # The UPDATE ... RETURNING and the commit's RELEASE SAVEPOINT
+    assert len(statements) == 2, statements
+    subcategory = tag_schemas.Subcategory.parse_obj(subcategory)
+    assert (subcategory.id, subcategory.category_id, subcategory.name) == (
+        1,
+        1,
+        "Geometry",
+    )
+
+    with pytest.raises(HTTPException):
+        tag_repository.patch_taxonomy_row(
+            db, tag_models.Subcategory, 2, tag_schemas.SubcategoryUpdate(name="X")
+        )
+
+
+def checked_versions(db) -> dict:
+    # As conditional_get checks them for the request
+    tables = tag_repository.TAXONOMY_TABLES
+    versions = table_version_repository.get_table_versions(db, tables)
+    return {table.name: version for table, version in zip(tables, versions)}
+
+
+def test_taxonomy_cache_sees_other_writes(db):
+    tag_repository.taxonomy_cache.invalidate()
+    db.execute(insert(tag_models.Category.__table__), [{"id": 1, "name": "Math"}])
+    categories = tag_repository.get_categories(db, checked_versions(db))
+    assert [c.name for c in categories] == ["Math"]
+
+    # As another worker would, without clearing this worker's cache
+    db.execute(insert(tag_models.Category.__table__), [{"id": 2, "name": "English"}])
+
+    categories = tag_repository.get_categories(db, checked_versions(db))
+    assert [c.name for c in categories] == ["English", "Math"]
+
+
+def test_taxonomy_cache_checked_versions(db):
+    tag_repository.taxonomy_cache.invalidate()
+    db.execute(insert(tag_models.Category.__table__), [{"id": 1, "name": "Math"}])
+    table_versions = checked_versions(db)
+    tag_repository.get_taxonomy(db, table_versions=table_versions)
+    statements = record_statements(db)
+
+    # The versions conditional_get checked aren't queried again
+    taxonomy = tag_repository.get_taxonomy(db, table_versions=table_versions)
+
+    assert [category.name for category in taxonomy] == ["Math"]
+    assert statements == []
+
+
+def test_taxonomy_cache_without_versions(db):
+    tag_repository.taxonomy_cache.invalidate()
+    db.execute(insert(tag_models.Category.__table__), [{"id": 1, "name": "Math"}])
+    db.execute(
+        insert(tag_models.Subcategory.__table__),
+        [{"id": 1, "category_id": 1, "name": "Algebra"}],
+    )
+    db.execute(
+        insert(tag_models.Tag.__table__), [{"id": 1, "subcategory_id": 1, "name": "A"}]
+    )
+    assert list(tag_repository.get_tags_by_id(db)) == [1]
+    statements = record_statements(db)
+
+    # Without versions, e.g. for question writes, a hit costs no query
+    assert list(tag_repository.get_tags_by_id(db)) == [1]
+    assert statements == []
+
+    # Writes through this worker clear the cache
+    tag_repository.create_tag(db, tag_schemas.TagCreate(subcategory_id=1, name="B"))
+    assert sorted(tag_repository.get_tags_by_id(db)) == [1, 2]
+    assert tag_repository.taxonomy_cache.stats()["hits"] >= 1
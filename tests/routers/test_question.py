@@ -0,0 +1,153 @@
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, update
+
+from app.data.question_enums import PassageType, QuestionType
+from app.database import get_db, stream_db
+from app.main import app
+from app.models import question as question_models
+from app.repositories import question_repository
+from app.routers import question as question_router
+from tests.repositories.test_question_repository import (
+    QUESTION_TYPES,
+    insert_questions,
+)
+
+
+# yield_per buffers the rows on SQLite, and streams them from a server side
+# cursor on Postgres
+@pytest.mark.parametrize("db_fixture", ["db", "pg_db"])
+def test_export_questions(db_fixture, request, monkeypatch):
+    db = request.getfixturevalue(db_fixture)
+    insert_questions(db, 10)
+    db.execute(
+        insert(question_models.Passage.__table__),
+        [{"id": 1, "p_type": PassageType.TEXT, "title": "Title"}],
+    )
+    db.execute(
+        insert(question_models.TextPassage.__table__),
+        [{"passage_id": 1, "passage_text": "Text"}],
+    )
+    db.execute(
+        update(question_models.Question.__table__)
+        .where(question_models.Question.id.in_([2, 3]))
+        .values(passage_id=1)
+    )
+    db.commit()
+    # Several partitions per statement
+    monkeypatch.setattr(question_repository, "EXPORT_BATCH_SIZE", 3)
+
+    # The session has to stay open until the last line is streamed
+    events = []
+
+    def get_test_db():
+        events.append("open")
+        try:
+            yield db
+        finally:
+            events.append("close")
+
+    async def recording_stream_db(*args):
+        async for lines in stream_db(*args):
+            events.append("lines")
+            yield lines
+
+    monkeypatch.setattr(question_router, "stream_db", recording_stream_db)
+    app.dependency_overrides[get_db] = get_test_db
+    try:
+        response = TestClient(app).get(
+            "/questions/export", params={"include_passages": True}
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    passage, *questions = [json.loads(line) for line in response.text.splitlines()]
+    assert passage["id"] == 1
+    assert passage["pType"] == PassageType.TEXT.value
+    assert passage["passageText"] == "Text"
+    assert [question["id"] for question in questions] == list(range(1, 11))
+    for question in questions:
+        question_id = question["id"]
+        q_type = QUESTION_TYPES[question_id % len(QUESTION_TYPES)]
+        assert question["qType"] == q_type.value
+        assert question["passageId"] == (1 if question_id in (2, 3) else None)
+        assert [tag["id"] for tag in question["tags"]] == [1 + question_id % 2]
+        if q_type == QuestionType.MULTIPLE_CHOICE:
+            assert [answer["choiceNumber"] for answer in question["answers"]] == [
+                1,
+                2,
+                3,
+                4,
+            ]
+    # One partition of passages and four of questions, all before the close
+    assert events == ["open"] + ["lines"] * 5 + ["close"]
+
+
+@pytest.fixture
+def client(db):
+    def get_test_db():
+        yield db
+
+    app.dependency_overrides[get_db] = get_test_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_get_questions(db, client, monkeypatch, fast):
+    monkeypatch.setattr(question_router, "FAST_LIST_SERIALIZATION", fast)
+    insert_questions(db, 5)
+
+    # Unpaged for clients from before paging
+    response = client.get("/questions", params={"official_test_id": 1})
+    assert response.status_code == 200
+    questions = response.json()
+    assert [question["id"] for question in questions] == [1, 2, 3, 4, 5]
+    assert questions[1]["qType"] == QuestionType.FILL_IN_IMAGE.value
+
+    response = client.get("/questions", params={"limit": 3})
+    assert response.status_code == 200
+    page = response.json()
+    assert [question["id"] for question in page["items"]] == [1, 2, 3]
+    assert page["items"] == questions[:3]
+    assert page["nextCursor"] == 3
+
+    response = client.get("/questions", params={"cursor": page["nextCursor"]})
+    assert response.json() == {"items": questions[3:], "nextCursor": None}
+
+
+def test_run_db_routes_validate_once():
+    # run_db converts the result, FastAPI only documents the model
+    route = next(route for route in app.routes if route.path == "/search")
+    response = app.openapi()["paths"]["/search"]["get"]["responses"]["200"]
+
+    assert route.response_field is None
+    assert response["content"]["application/json"]["schema"] == {
+        "$ref": "#/components/schemas/SearchPage"
+    }
+
+
+def zip_of(*names: str) -> bytes:
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        for name in names:
+            archive.writestr(name, b"")
+    return data.getvalue()
+
+
+def test_ingest_image_batch_same_image():
+    files = [
+        ("files", ("first.zip", zip_of("question/12.png"))),
+        ("files", ("second.zip", zip_of("question/12.png", "question/13.png"))),
+    ]
+
+    response = TestClient(app).post("/imageBatch/2022/A", files=files)
+
+    assert response.status_code == 400
+    assert "question/12.png and question/12.png" in response.json()["detail"]
@@ -0,0 +1,51 @@
+from utils.cache_utils import TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_get_or_load_expires_after_ttl():
+    timer = FakeTimer()
+    cache = TTLCache(ttl_seconds=10, max_size=4, timer=timer)
+    loads = []
+
+    def loader():
+        loads.append(timer.now)
+        return len(loads)
+
+    assert cache.get_or_load("tags", loader) == 1
+    timer.now = 9
+    assert cache.get_or_load("tags", loader) == 1
+    timer.now = 10
+    assert cache.get_or_load("tags", loader) == 2
+
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0, "size": 1}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(ttl_seconds=10, max_size=2, timer=FakeTimer())
+    cache.get_or_load("categories", lambda: "categories")
+    cache.get_or_load("tags", lambda: "tags")
+    cache.get_or_load("categories", lambda: "reloaded")
+    cache.get_or_load("resources", lambda: "resources")
+
+    assert cache.get_or_load("categories", lambda: "reloaded") == "categories"
+    assert cache.get_or_load("tags", lambda: "reloaded") == "reloaded"
+    assert cache.evictions == 2
+
+
+def test_invalidate_during_load_does_not_store_stale_value():
+    cache = TTLCache(ttl_seconds=10, max_size=2, timer=FakeTimer())
+
+    def stale_loader():
+        # A write that invalidates the cache lands while this load runs
+        cache.invalidate()
+        return "stale"
+
+    assert cache.get_or_load("tags", stale_loader) == "stale"
+    assert cache.get_or_load("tags", lambda: "fresh") == "fresh"
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+
+from utils.db_pool_utils import PoolMetrics, timed_pool_class
+
+
+@pytest.fixture
+def metrics():
+    return PoolMetrics()
+
+
+@pytest.fixture
+def pool_engine(metrics, tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=timed_pool_class(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+    metrics.listen(engine.pool)
+    yield engine
+    engine.dispose()
+
+
+def test_events_count_checkouts_and_checkins(metrics, pool_engine):
+    for _ in range(3):
+        with pool_engine.connect() as connection:
+            connection.execute(text("select 1"))
+
+    stats = metrics.stats(pool_engine.pool)
+    assert stats["connects"] == 1
+    assert stats["checkouts"] == 3
+    assert stats["checkins"] == 3
+    assert stats["wait_count"] == 3
+    assert stats["checkedout"] == 0
+    assert stats["checkedin"] == 1
+
+
+def test_timeouts_are_counted_with_their_wait(metrics, pool_engine):
+    with pool_engine.connect():
+        assert metrics.stats(pool_engine.pool)["checkedout"] == 1
+        with pytest.raises(exc.TimeoutError):
+            pool_engine.connect()
+
+    stats = metrics.stats(pool_engine.pool)
+    assert stats["timeouts"] == 1
+    assert stats["wait_count"] == 2
+    assert stats["wait_seconds_max"] >= 0.01
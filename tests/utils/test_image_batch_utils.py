@@ -0,0 +1,126 @@
+import asyncio
+import io
+import shutil
+import zipfile
+
+import pytest
+
+from app.data.env_consts import (
+    IMAGE_LOCAL_COPY,
+    IMAGE_UPLOAD_CONCURRENCY,
+    SHSAT_IMAGE_BUCKET,
+)
+from tests.utils.test_image_utils import scan
+from utils import image_batch_utils
+from utils.image_batch_utils import parse_image_batch, read_zip
+from utils.image_manifest_utils import ImageManifest
+
+
+def test_parse_image_batch():
+    files = {
+        "2022A/question/9.png": b"question 9",
+        "2022A/question/10/2.png": b"question 10 part 2",
+        "2022A/question/10/1.png": b"question 10 part 1",
+        "2022A/answer/10.png": b"answer 10",
+        "2022A/passage/32_36.png": b"passage",
+        "2022A/.DS_Store": b"",
+        "__MACOSX/2022A/question/._9.png": b"",
+    }
+
+    items = parse_image_batch(files.items())
+
+    assert [(item.name, item.parts) for item in items] == [
+        ("answer/10", {0: b"answer 10"}),
+        ("passage/32_36", {0: b"passage"}),
+        ("question/9", {0: b"question 9"}),
+        ("question/10", {1: b"question 10 part 1", 2: b"question 10 part 2"}),
+    ]
+    assert items[1].s3_key(2022, "A") == "test-images/2022/A/passage/32_36.png"
+    assert items[3].s3_key(2022, "A") == "test-images/2022/A/question/10.png"
+
+
+@pytest.mark.parametrize(
+    "name", ["question/9.jpg", "question/32_36.png", "passage/32.png", "notes.txt"]
+)
+def test_parse_image_batch_invalid(name):
+    with pytest.raises(ValueError) as exc_info:
+        parse_image_batch([("answer/1.png", b""), (name, b"")])
+
+    assert name in str(exc_info.value)
+
+
+def test_read_zip():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        archive.writestr("scans/", "")
+        archive.writestr("scans/question/1.png", b"question 1")
+
+    assert read_zip(data.getvalue()) == [("scans/question/1.png", b"question 1")]
+
+
+@pytest.mark.parametrize(
+    "names, error",
+    [
+        # In two zips, or two copies of a folder
+        (["a/question/12.png", "b/question/12.png"], "a/question/12.png"),
+        (["question/12.png", "question/012.png"], "question/012.png"),
+        (["question/12/1.png", "question/12/01.png"], "question/12/01.png"),
+        (["passage/32_36.png", "passage/032_036.png"], "passage/032_036.png"),
+        (["question/12.png", "question/12/1.png"], "question/12"),
+    ],
+)
+def test_parse_image_batch_same_image(names, error):
+    with pytest.raises(ValueError) as exc_info:
+        parse_image_batch([(name, b"") for name in names])
+
+    assert error in str(exc_info.value)
+
+
+@pytest.mark.skipif(shutil.which("pngquant") is None, reason="pngquant not installed")
+def test_ingest_image_batch(monkeypatch, tmp_path):
+    monkeypatch.setenv(SHSAT_IMAGE_BUCKET, "bucket")
+    monkeypatch.setenv(IMAGE_LOCAL_COPY, "false")
+    monkeypatch.setenv(IMAGE_UPLOAD_CONCURRENCY, "3")
+    uploads, in_flight, max_in_flight = {}, set(), []
+
+    async def upload_fileobj(file_obj, bucket, object_name):
+        in_flight.add(object_name)
+        max_in_flight.append(len(in_flight))
+        # Slower than processing an image, so uploads pile up
+        await asyncio.sleep(0.5)
+        uploads[object_name] = file_obj.read()
+        in_flight.remove(object_name)
+
+    monkeypatch.setattr(image_batch_utils, "upload_fileobj", upload_fileobj)
+    manifest = ImageManifest(tmp_path / "manifest.json")
+    monkeypatch.setattr(image_batch_utils, "get_image_manifest", lambda: manifest)
+    files = {
+        f"question/{number}.png": scan(400, 300, (50, 40, 250, 140))
+        for number in range(1, 11)
+    }
+    files["question/11.png"] = b"not a png"
+    items = parse_image_batch(files.items())
+
+    result = asyncio.run(image_batch_utils.ingest_image_batch(items, 2022, "A"))
+
+    assert result["question"] == {
+        str(number): f"test-images/2022/A/question/{number}.png"
+        for number in range(1, 11)
+    }
+    assert [error["name"] for error in result["errors"]] == ["question/11"]
+    assert result["cache_hits"] == []
+    assert len(uploads) == 10
+    assert max(max_in_flight) == 3
+    assert all(image.startswith(b"\x89PNG") for image in uploads.values())
+
+    # Ingested again with one image changed, only that one is uploaded
+    uploads.clear()
+    files["question/1.png"] = scan(400, 300, (50, 40, 260, 140))
+    items = parse_image_batch(files.items())
+
+    result = asyncio.run(image_batch_utils.ingest_image_batch(items, 2022, "A"))
+
+    assert len(result["question"]) == 10
+    assert len(result["cache_hits"]) == 9
+    assert list(uploads) == ["test-images/2022/A/question/1.png"]
+    assert manifest.stats()["hits"] == 9
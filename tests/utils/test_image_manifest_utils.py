@@ -0,0 +1,60 @@
+from utils.image_manifest_utils import ImageManifest, hash_image, hash_inputs
+
+
+def test_hash_inputs():
+    assert hash_inputs([b"ab", b"c"]) == hash_inputs([b"ab", b"c"])
+    assert hash_inputs([b"ab", b"c"]) != hash_inputs([b"a", b"bc"])
+    assert hash_inputs([b"ab", b"c"]) != hash_inputs([b"c", b"ab"])
+
+
+def test_image_manifest(tmp_path):
+    manifest = ImageManifest(tmp_path / "manifest.json")
+    input_hash, output_hash = hash_inputs([b"scan"]), hash_image(b"image")
+
+    assert not manifest.inputs_match("bucket/1.png", input_hash)
+    assert not manifest.output_matches("bucket/1.png", input_hash, output_hash)
+    manifest.put("bucket/1.png", input_hash, output_hash)
+
+    manifest = ImageManifest(tmp_path / "manifest.json")
+    assert manifest.inputs_match("bucket/1.png", input_hash)
+    assert not manifest.inputs_match("other-bucket/1.png", input_hash)
+    # Scanned again, to the same processed image
+    rescan_hash = hash_inputs([b"scan again"])
+    assert not manifest.inputs_match("bucket/1.png", rescan_hash)
+    assert manifest.output_matches("bucket/1.png", rescan_hash, output_hash)
+    assert manifest.inputs_match("bucket/1.png", rescan_hash)
+
+    manifest.discard("bucket/1.png")
+    assert not manifest.inputs_match("bucket/1.png", rescan_hash)
+
+
+def test_image_manifest_shared(tmp_path):
+    # As in two processes uploading images
+    worker = ImageManifest(tmp_path / "manifest.json")
+    batch = ImageManifest(tmp_path / "manifest.json")
+    old_hash, new_hash = hash_inputs([b"scan"]), hash_inputs([b"new scan"])
+    worker.put("bucket/1.png", old_hash, hash_image(b"image"))
+    assert worker.inputs_match("bucket/1.png", old_hash)
+
+    batch.put("bucket/1.png", new_hash, hash_image(b"new image"))
+    batch.put("bucket/2.png", new_hash, hash_image(b"image 2"))
+    worker.put("bucket/3.png", old_hash, hash_image(b"image 3"))
+
+    # Each sees the other's uploads, and neither lost its own
+    assert not worker.inputs_match("bucket/1.png", old_hash)
+    assert worker.inputs_match("bucket/1.png", new_hash)
+    assert batch.inputs_match("bucket/3.png", old_hash)
+    assert worker.stats()["size"] == 3
+
+
+def test_image_manifest_stats(tmp_path):
+    (tmp_path / "manifest.json").write_text("{not json")
+    manifest = ImageManifest(tmp_path / "manifest.json")
+
+    assert not manifest.inputs_match("bucket/1.png", hash_inputs([b"scan"]))
+    manifest.count(hit=False)
+    manifest.count(hit=True)
+    manifest.count(hit=True)
+    manifest.count(hit=True)
+
+    assert manifest.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "size": 0}
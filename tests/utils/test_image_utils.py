@@ -0,0 +1,142 @@
+import asyncio
+import io
+import shutil
+import time
+
+import httpx
+import pytest
+from PIL import Image
+
+from app.main import app
+from utils.image_utils import (
+    process_contents,
+    process_contents_in_memory,
+    render_image,
+    trim_border,
+)
+
+
+def scan(width: int, height: int, box: tuple[int, int, int, int]) -> bytes:
+    # A white page with a black box, as the scans are
+    image = Image.new("RGB", (width, height), "white")
+    image.paste((0, 0, 0), box)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_render_image():
+    question = scan(400, 300, (50, 40, 250, 140))
+    answer = scan(400, 300, (100, 100, 400, 150))
+
+    image = Image.open(io.BytesIO(render_image([question, answer])))
+
+    assert image.format == "PNG"
+    # The trimmed boxes with a 16px border, stacked
+    assert image.size == (300 + 32, 100 + 32 + 50 + 32)
+    assert image.getpixel((16, 132 + 16)) == (0, 0, 0)
+    # The narrower question box is centered above the answer
+    assert image.getpixel((65, 16)) == (255, 255, 255)
+    assert image.getpixel((66, 16)) == (0, 0, 0)
+
+
+def test_render_image_not_png():
+    output = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(output, format="JPEG")
+
+    with pytest.raises(ValueError):
+        render_image([output.getvalue()])
+
+
+requires_pngquant = pytest.mark.skipif(
+    shutil.which("pngquant") is None, reason="pngquant not installed"
+)
+
+
+@requires_pngquant
+def test_process_contents_in_memory(tmp_path):
+    image = asyncio.run(
+        process_contents_in_memory([scan(400, 300, (50, 40, 250, 140))])
+    )
+
+    contents = [scan(400, 300, (50, 40, 250, 140))]
+    asyncio.run(process_contents(contents, tmp_path / "image.png"))
+
+    assert Image.open(io.BytesIO(image)).size == (232, 132)
+    assert image == (tmp_path / "image.png").read_bytes()
+
+
+@requires_pngquant
+def test_process_contents_concurrently(tmp_path):
+    # Page sized scans, each with a box of its own size
+    scans = [scan(1700, 2200, (100, 100, 1000 + i, 1500 + i)) for i in range(20)]
+
+    async def upload_all() -> list[float]:
+        latencies = []
+        done = asyncio.Event()
+
+        async def ping():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+                while not done.is_set():
+                    start = time.perf_counter()
+                    response = await c.get("/")
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200
+                    await asyncio.sleep(0.01)
+
+        async def upload(index: int):
+            path = tmp_path / "images" / f"{index}.png"
+            await process_contents([scans[index]], path)
+
+        pinger = asyncio.create_task(ping())
+        await asyncio.gather(*(upload(index) for index in range(20)))
+        done.set()
+        await pinger
+        return latencies
+
+    latencies = asyncio.run(upload_all())
+
+    for index in range(20):
+        image = Image.open(tmp_path / "images" / f"{index}.png")
+        assert image.size == (900 + index + 32, 1400 + index + 32)
+    # The event loop kept serving other requests while the images were processed
+    assert len(latencies) >= 10
+    assert max(latencies) < 0.2, latencies
+
+
+def noisy_scan(width: int, height: int, box: tuple[int, int, int, int]) -> Image.Image:
+    # A scan's off white page, with specks of dust
+    image = Image.new("RGB", (width, height), (240, 244, 238))
+    image.paste((30, 30, 30), box)
+    for x, y in [(5, 5), (6, 5), (390, 150), (200, 290)]:
+        image.putpixel((x, y), (0, 0, 0))
+    return image
+
+
+def test_trim_border_tolerance():
+    image = noisy_scan(400, 300, (50, 40, 250, 140))
+
+    assert trim_border(image, tolerance=24, min_run=3).size == (200, 100)
+    # The specks are kept without a minimum run, the page without a tolerance
+    assert trim_border(image, tolerance=24).size == (386, 286)
+    assert trim_border(image).size == (400, 300)
+
+
+def test_trim_border_grayscale():
+    image = noisy_scan(400, 300, (50, 40, 250, 140)).convert("L")
+
+    assert trim_border(image, tolerance=24, min_run=3).size == (200, 100)
+
+
+def test_trim_border_max_trim():
+    image = noisy_scan(400, 300, (50, 40, 250, 140))
+
+    trimmed = trim_border(image, tolerance=24, min_run=3, max_trim=(20, None, 100, 0))
+
+    assert trimmed.size == (300 - 20, 300 - 40)
+
+
+def test_trim_border_blank():
+    with pytest.raises(ValueError):
+        trim_border(noisy_scan(400, 300, (0, 0, 0, 0)), tolerance=24, min_run=3)
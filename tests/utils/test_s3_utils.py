@@ -0,0 +1,109 @@
+import asyncio
+import io
+import socket
+
+import boto3
+import pytest
+
+from utils.s3_utils import MB, S3TransferService
+
+
+def test_s3_transfer_service_config():
+    service = S3TransferService(
+        max_pool_connections=16, max_attempts=3, multipart_threshold=5 * MB
+    )
+
+    assert service.client.meta.config.max_pool_connections == 16
+    assert service.client.meta.config.retries == {
+        "total_max_attempts": 3,
+        "mode": "adaptive",
+    }
+    assert service.transfer_config.multipart_threshold == 5 * MB
+
+
+@pytest.fixture(scope="module")
+def s3_endpoint():
+    moto_server = pytest.importorskip("moto.server")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def bucket(s3_endpoint, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    s3 = boto3.client("s3", endpoint_url=s3_endpoint)
+    s3.create_bucket(Bucket="images")
+    yield s3
+    for item in s3.list_objects_v2(Bucket="images").get("Contents", []):
+        s3.delete_object(Bucket="images", Key=item["Key"])
+    s3.delete_bucket(Bucket="images")
+
+
+def test_upload(s3_endpoint, bucket, tmp_path):
+    service = S3TransferService(
+        endpoint_url=s3_endpoint, multipart_threshold=5 * MB, multipart_chunksize=5 * MB
+    )
+    # Uploaded in three parts
+    (tmp_path / "snapshot.json").write_bytes(bytes(range(256)) * 48 * 1024)
+
+    async def upload():
+        assert not await service.object_exists("images", "snapshot.json")
+        await service.upload_file(
+            tmp_path / "snapshot.json",
+            "images",
+            "snapshot.json",
+            {"ContentType": "application/json"},
+        )
+        await service.upload_fileobj(io.BytesIO(b"image"), "images", "1.png")
+        assert await service.object_exists("images", "snapshot.json")
+
+    asyncio.run(upload())
+
+    snapshot = bucket.get_object(Bucket="images", Key="snapshot.json")
+    assert snapshot["ContentType"] == "application/json"
+    assert snapshot["ETag"].endswith('-3"')
+    assert snapshot["Body"].read() == (tmp_path / "snapshot.json").read_bytes()
+    assert bucket.get_object(Bucket="images", Key="1.png")["Body"].read() == b"image"
+
+
+def test_upload_concurrently(s3_endpoint, bucket):
+    service = S3TransferService(endpoint_url=s3_endpoint, max_pool_connections=8)
+
+    async def upload_all():
+        await asyncio.gather(
+            *(
+                service.upload_fileobj(
+                    io.BytesIO(f"image {index}".encode()), "images", f"{index}.png"
+                )
+                for index in range(40)
+            )
+        )
+
+    asyncio.run(upload_all())
+
+    keys = [item["Key"] for item in bucket.list_objects_v2(Bucket="images")["Contents"]]
+    assert sorted(keys) == sorted(f"{index}.png" for index in range(40))
+
+
+def test_upload_async_client(s3_endpoint, bucket):
+    pytest.importorskip("aiobotocore")
+    service = S3TransferService(endpoint_url=s3_endpoint, use_async_client=True)
+
+    async def upload():
+        await service.upload_fileobj(
+            io.BytesIO(b"image"), "images", "1.png", {"ContentType": "image/png"}
+        )
+        exists = await service.object_exists("images", "1.png")
+        missing = await service.object_exists("images", "2.png")
+        await service.close()
+        return exists, missing
+
+    assert asyncio.run(upload()) == (True, False)
+    assert bucket.get_object(Bucket="images", Key="1.png")["ContentType"] == "image/png"
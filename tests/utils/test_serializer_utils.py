@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Optional, Union
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi_camelcase import CamelModel
+from pydantic import parse_obj_as
+
+from app.data.question_enums import (
+    PassageType,
+    QuestionType,
+    Section,
+    UsageType,
+)
+from app.models import question as question_models
+from app.models import tag as tag_models
+from app.schemas import question as question_schemas
+from utils.serializer_utils import compile_serializer
+
+CREATED_AT = datetime(2023, 6, 1, 12, 30, 15, 120000, tzinfo=timezone.utc)
+UPDATED_AT = datetime(2023, 6, 2, 8, 0, tzinfo=timezone(timedelta(hours=-4)))
+
+
+def response_model_body(response_model, content) -> bytes:
+    validated = parse_obj_as(response_model, content)
+    return JSONResponse(jsonable_encoder(validated, by_alias=True)).body
+
+
+def orm_questions():
+    tag = tag_models.Tag(
+        id=1,
+        subcategory_id=1,
+        name='Café – "quoted"',
+        created_at=CREATED_AT,
+        updated_at=UPDATED_AT,
+    )
+    timestamps = {"created_at": CREATED_AT, "updated_at": datetime(2023, 6, 3)}
+    return [
+        question_models.MultipleChoiceQuestion(
+            id=1,
+            official_test_id=1,
+            official_test_question_number=1,
+            q_type=QuestionType.MULTIPLE_CHOICE,
+            usage=UsageType.OFFICIAL_TEST_QUESTION,
+            section=Section.MATH,
+            question_text="Line\nbreak, tab\t and é中\U0001f600",
+            explanation="Backslash \\ and control \x01",
+            tags=[tag],
+            answers=[
+                question_models.MultipleChoiceAnswer(
+                    question_id=1,
+                    choice_number=choice_number,
+                    answer_text=f"Choice {choice_number}",
+                    is_correct=choice_number == 2,
+                    **timestamps,
+                )
+                for choice_number in range(1, 5)
+            ],
+            **timestamps,
+        ),
+        question_models.FillInQuestion(
+            id=2,
+            official_test_id=1,
+            official_test_question_number=2,
+            q_type=QuestionType.FILL_IN,
+            question_text="Question",
+            explanation="Explanation",
+            answer=0.1,
+            tags=[],
+            **timestamps,
+        ),
+        question_models.FillInImageQuestion(
+            id=3,
+            official_test_id=1,
+            official_test_question_number=3,
+            q_type=QuestionType.FILL_IN_IMAGE,
+            question_image_s3_key="question.png",
+            answer_image_s3_key="answer.png",
+            answer=Decimal("-1234.567"),
+            tags=[tag],
+            **timestamps,
+        ),
+        question_models.MultipleChoiceImageQuestion(
+            id=4,
+            official_test_id=1,
+            official_test_question_number=4,
+            q_type=QuestionType.MULTIPLE_CHOICE_IMAGE,
+            passage_id=1,
+            question_image_s3_key="question.png",
+            answer_image_s3_key="answer.png",
+            correct_choice=3,
+            tags=[],
+            **timestamps,
+        ),
+    ]
+
+
+def test_compile_serializer_orm_question_page():
+    page = {"items": orm_questions(), "next_cursor": 4}
+    serialize = compile_serializer(question_schemas.QuestionPage)
+
+    assert ORJSONResponse(serialize(page)).body == response_model_body(
+        question_schemas.QuestionPage, page
+    )
+
+
+def test_compile_serializer_mapping_rows():
+    # As read from question_read, with tags in a JSON column
+    page = {
+        "items": [
+            {
+                "id": 1,
+                "official_test_id": 1,
+                "official_test_question_number": 1,
+                "q_type": QuestionType.FILL_IN,
+                "usage": None,
+                "section": None,
+                "sub_section": None,
+                "passage_id": None,
+                "question_text": "Question",
+                "explanation": "Explanation",
+                "answer": 2,
+                "tags": [
+                    {
+                        "id": 1,
+                        "subcategory_id": 1,
+                        "name": "Tag",
+                        "created_at": "2023-06-01T12:30:15.12+00:00",
+                        "updated_at": "2023-06-01T12:30:15+00:00",
+                    }
+                ],
+                "answers": [],
+                "created_at": CREATED_AT,
+                "updated_at": CREATED_AT,
+            }
+        ],
+        "next_cursor": None,
+    }
+    serialize = compile_serializer(question_schemas.QuestionPage)
+
+    assert ORJSONResponse(serialize(page)).body == response_model_body(
+        question_schemas.QuestionPage, page
+    )
+
+
+def test_compile_serializer_passages():
+    timestamps = {"created_at": CREATED_AT, "updated_at": UPDATED_AT}
+    passages = [
+        question_models.TextPassage(
+            id=1,
+            p_type=PassageType.TEXT,
+            title="Title",
+            passage_text="Text",
+            section=Section.ENGLISH,
+            **timestamps,
+        ),
+        question_models.ImagePassage(
+            id=2,
+            official_test_id=1,
+            p_type=PassageType.IMAGE,
+            title="Image",
+            passage_image_s3_key="passage.png",
+            **timestamps,
+        ),
+    ]
+    serialize = compile_serializer(question_schemas.PassageUnion)
+
+    body = ORJSONResponse([serialize(passage) for passage in passages]).body
+    assert body == response_model_body(list[question_schemas.PassageUnion], passages)
+
+
+def test_compile_serializer_unsupported_type():
+    class Unsupported(CamelModel):
+        value: Optional[Union[int, str]]
+
+    with pytest.raises(TypeError):
+        compile_serializer(Unsupported)
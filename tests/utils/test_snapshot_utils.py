@@ -0,0 +1,154 @@
+import asyncio
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import orjson
+
+from utils.snapshot_utils import (
+    MANIFEST_NAME,
+    DebouncedTask,
+    build_manifest,
+    encode_shard,
+    write_atomically,
+    write_snapshot,
+)
+
+CREATED_AT = datetime(2023, 6, 1, tzinfo=timezone.utc)
+
+
+def test_encode_shard():
+    items = [{"id": 1, "questionText": "Question"}]
+
+    shard = encode_shard("questions/MATH/test-1", items)
+
+    assert shard == encode_shard("questions/MATH/test-1", list(items))
+    assert shard.count == 1
+    plain, compressed = shard.files[:2]
+    assert plain.path == f"questions/MATH/test-1.{shard.sha256[:16]}.json"
+    assert orjson.loads(plain.data) == items
+    assert compressed.path == plain.path + ".gz"
+    assert compressed.encoding == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert encode_shard("questions/MATH/test-1", [{"id": 2}]).sha256 != shard.sha256
+
+
+def test_build_manifest():
+    taxonomy = encode_shard("taxonomy", [])
+    questions = encode_shard("questions/MATH/test-1", [{"id": 1}])
+
+    manifest = build_manifest([taxonomy, questions], CREATED_AT)
+
+    assert manifest == build_manifest([questions, taxonomy], CREATED_AT)
+    assert [shard["name"] for shard in manifest["shards"]] == [
+        "questions/MATH/test-1",
+        "taxonomy",
+    ]
+    shard = manifest["shards"][0]
+    assert shard["path"] == questions.files[0].path
+    assert shard["encodings"]["gzip"] == {
+        "path": questions.files[1].path,
+        "size": len(questions.files[1].data),
+    }
+    changed = encode_shard("questions/MATH/test-1", [{"id": 2}])
+    assert (
+        build_manifest([taxonomy, changed], CREATED_AT)["version"]
+        != manifest["version"]
+    )
+
+
+def test_write_snapshot(tmp_path):
+    shards = [encode_shard("taxonomy", []), encode_shard("questions/test-1", [])]
+    manifest = build_manifest(shards, CREATED_AT)
+
+    written = write_snapshot(tmp_path, shards, manifest)
+
+    assert written == [file for shard in shards for file in shard.files]
+    for file in written:
+        assert (tmp_path / file.path).read_bytes() == file.data
+    assert orjson.loads((tmp_path / MANIFEST_NAME).read_bytes())["version"] == (
+        manifest["version"]
+    )
+
+    changed = [shards[0], encode_shard("questions/test-1", [{"id": 1}])]
+    written = write_snapshot(tmp_path, changed, build_manifest(changed, CREATED_AT))
+
+    assert written == changed[1].files
+
+
+def test_write_snapshot_prunes_unreferenced_shards(tmp_path):
+    snapshots = [
+        [encode_shard("taxonomy", []), encode_shard("questions/test-1", items)]
+        for items in ([], [{"id": 1}], [{"id": 2}])
+    ]
+    write_snapshot(tmp_path, snapshots[0], build_manifest(snapshots[0], CREATED_AT))
+    # Written by a publish running at the same time
+    other_path = tmp_path / "questions/test-1.other.json"
+    other_path.write_bytes(b"[]")
+    # Recent files are kept, as another publish may reference them
+    write_snapshot(tmp_path, snapshots[1], build_manifest(snapshots[1], CREATED_AT))
+    assert other_path.exists()
+
+    write_snapshot(
+        tmp_path,
+        snapshots[2],
+        build_manifest(snapshots[2], CREATED_AT),
+        prune_after_seconds=0,
+    )
+
+    # The previous snapshot's files are kept for clients that just read it
+    files = {
+        path.relative_to(tmp_path).as_posix()
+        for path in tmp_path.rglob("*")
+        if path.is_file()
+    }
+    assert files == {MANIFEST_NAME} | {
+        file.path
+        for shards in snapshots[1:]
+        for shard in shards
+        for file in shard.files
+    }
+
+
+def test_write_atomically_concurrently(tmp_path):
+    path = tmp_path / MANIFEST_NAME
+
+    def write(number: int):
+        for _ in range(20):
+            write_atomically(path, str(number).encode())
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(write, range(8)))
+
+    assert path.read_bytes() in {str(number).encode() for number in range(8)}
+    assert os.listdir(tmp_path) == [MANIFEST_NAME]
+
+
+def test_debounced_task_coalesces_requests():
+    runs = []
+
+    async def request_publishes():
+        running = asyncio.Event()
+        release = asyncio.Event()
+
+        async def publish():
+            runs.append(len(runs))
+            running.set()
+            await release.wait()
+
+        task = DebouncedTask(publish, delay_seconds=0)
+        # Requests while waiting to run are coalesced
+        task.request()
+        task.request()
+        await running.wait()
+        assert runs == [0]
+
+        # Requests while running make it run once more afterwards
+        task.request()
+        task.request()
+        release.set()
+        await task._task
+        assert runs == [0, 1]
+
+    asyncio.run(request_publishes())
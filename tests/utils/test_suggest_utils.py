@@ -0,0 +1,37 @@
+from utils.suggest_utils import SuggestIndex, trigrams
+
+TAGS = [
+    (1, "Linear Equations"),
+    (2, "Inequalities"),
+    (3, "Equation Solving"),
+    (4, "Ratios and Rates"),
+    (5, "Main Idea"),
+]
+
+
+def test_name_prefix_matches_come_before_word_prefix_matches():
+    index = SuggestIndex(TAGS)
+
+    assert index.suggest("equ") == [3, 1]
+    assert index.suggest("  EQUATION  ") == [3, 1]
+    assert index.suggest("rat") == [4]
+
+
+def test_similar_names_fill_in_after_prefix_matches():
+    index = SuggestIndex(TAGS)
+
+    assert index.suggest("inequalites") == [2]
+    assert index.suggest("main ideas") == [5]
+    assert index.suggest("xyz") == []
+
+
+def test_limit():
+    index = SuggestIndex((i, f"Tag {i:03}") for i in range(100))
+
+    assert index.suggest("tag", limit=3) == [0, 1, 2]
+    assert index.suggest("tag", limit=0) == []
+
+
+def test_trigrams_match_pg_trgm():
+    # SELECT show_trgm('Cat')
+    assert trigrams("Cat") == {"  c", " ca", "cat", "at "}
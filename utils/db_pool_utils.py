@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool
+
+
+class PoolMetrics:
+    """Thread safe counters for a connection pool. Checkouts, checkins, new
+    connections and invalidations come from pool events, waits for a connection
+    are recorded by the pool class from timed_pool_class."""
+
+    def __init__(self, window_size: int = 1000):
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # Most recent waits, for percentiles
+        self._waits: deque[float] = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def listen(self, pool: Pool):
+        """Registers the event listeners on a pool. They're carried over to the
+        new pool when an engine is disposed."""
+
+        def on_connect(dbapi_connection, connection_record):
+            self._increment("connects")
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self._increment("checkouts")
+
+        def on_checkin(dbapi_connection, connection_record):
+            self._increment("checkins")
+
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            self._increment("invalidations")
+
+        event.listen(pool, "connect", on_connect)
+        event.listen(pool, "checkout", on_checkout)
+        event.listen(pool, "checkin", on_checkin)
+        event.listen(pool, "invalidate", on_invalidate)
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            self._waits.append(seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def stats(self, pool: Pool) -> dict[str, Any]:
+        """Event counters and wait times combined with the current state of the
+        pool."""
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_count": self.wait_count,
+                "wait_seconds_avg": (
+                    self.wait_seconds_total / self.wait_count
+                    if self.wait_count
+                    else 0.0
+                ),
+                "wait_seconds_p95": percentile(waits, 0.95),
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+        # QueuePool only, other pool classes don't track these
+        for name in ("size", "checkedout", "checkedin", "overflow"):
+            method: Callable[[], int] | None = getattr(pool, name, None)
+            stats[name] = method() if method else None
+        # Negative while fewer than pool size connections are open
+        if stats["overflow"] is not None:
+            stats["overflow"] = max(stats["overflow"], 0)
+        return stats
+
+    def _increment(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def timed_pool_class(
+    pool_class: type[Pool],
+    metrics: PoolMetrics,
+    timer: Callable[[], float] = time.perf_counter,
+) -> type[Pool]:
+    """Returns a subclass of pool_class that records how long each checkout waits
+    for a connection, including checkouts that time out. Pool events only fire
+    once a connection has been checked out, so the wait can't be timed with them.
+    """
+
+    def connect(self):
+        start = timer()
+        try:
+            connection = pool_class.connect(self)
+        except exc.TimeoutError:
+            metrics.record_wait(timer() - start, timed_out=True)
+            raise
+        metrics.record_wait(timer() - start)
+        return connection
+
+    return type(f"Timed{pool_class.__name__}", (pool_class,), {"connect": connect})
@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 
-from app.data.env_consts import IMAGE_DIR, PROCESSED_IMAGE_DIR
+from app.data.env_consts import IMAGE_DIR, IMAGE_MANIFEST, PROCESSED_IMAGE_DIR, SNAPSHOT_DIR
 from app.data.question_enums import QuestionOrAnswer
 
 
@@ -25,4 +25,15 @@ def generate_official_passage_s3_image_path(test_year: int, test_form: str, firs
     return f"test-images/{test_year}/{test_form}/passage/{first_question_number}_{last_question_number}.png"
 
 def generate_official_passage_image_path(test_year: int, test_form: str, first_question_number: int, last_question_number: int) -> Path:
-    return Path(str(test_year)).joinpath(test_form).joinpath("passage").joinpath(f"{first_question_number}_{last_question_number}.png")
\ No newline at end of file
+    return Path(str(test_year)).joinpath(test_form).joinpath("passage").joinpath(f"{first_question_number}_{last_question_number}.png")
+
+def generate_image_manifest_local_path() -> Path:
+    if os.getenv(IMAGE_MANIFEST):
+        return Path(os.getenv(IMAGE_MANIFEST)).expanduser()
+    return Path(os.getenv(IMAGE_DIR)).joinpath(os.getenv(PROCESSED_IMAGE_DIR)).joinpath("image-manifest.json").expanduser()
+
+def generate_snapshot_local_dir() -> Path:
+    return Path(os.getenv(IMAGE_DIR)).joinpath(os.getenv(SNAPSHOT_DIR, "snapshots")).expanduser()
+
+def generate_snapshot_s3_key(snapshot_path: str) -> str:
+    return f"{os.getenv(SNAPSHOT_DIR, 'snapshots')}/{snapshot_path}"
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""Ingests the scans of a whole official test at once, laid out by path:
+
+    question/12.png            one image
+    question/12/1.png          or parts stitched top to bottom, in part order
+    answer/12.png
+    passage/32_36.png          passages by their first and last question number
+
+A leading folder, e.g. from zipping a directory, is ignored. Run from the
+command line with a zip or a directory:
+
+    python -m utils.image_batch_utils 2022 A scans.zip
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.data.env_consts import (
+    IMAGE_LOCAL_COPY,
+    IMAGE_UPLOAD_CONCURRENCY,
+    SHSAT_IMAGE_BUCKET,
+)
+from app.data.question_enums import QuestionOrAnswer
+from utils.file_utils import (
+    generate_official_passage_local_image_path,
+    generate_official_passage_s3_image_path,
+    generate_official_question_local_image_path,
+    generate_official_question_s3_image_path,
+)
+from utils.image_manifest_utils import (
+    get_image_manifest, hash_image, hash_inputs, manifest_key)
+from utils.image_utils import process_contents_in_memory, save_image
+from utils.s3_utils import upload_fileobj
+
+NAME_PATTERN = re.compile(
+    r"(?:^|/)(question|answer|passage)/(\d+|\d+_\d+)(?:/(\d+))?\.png$", re.IGNORECASE
+)
+
+
+@dataclass
+class ImageBatchItem:
+    kind: str
+    # The question number, or first_last for passages
+    number: str
+    # Stitched in order of their part numbers
+    parts: Dict[int, bytes] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return f"{self.kind}/{self.number}"
+
+    def local_path(self, test_year: int, test_form: str) -> Path:
+        if self.kind == "passage":
+            first, last = map(int, self.number.split("_"))
+            return generate_official_passage_local_image_path(
+                test_year, test_form, first, last)
+        return generate_official_question_local_image_path(
+            test_year, test_form, QuestionOrAnswer(self.kind), int(self.number))
+
+    def s3_key(self, test_year: int, test_form: str) -> str:
+        if self.kind == "passage":
+            first, last = map(int, self.number.split("_"))
+            return generate_official_passage_s3_image_path(
+                test_year, test_form, first, last)
+        return generate_official_question_s3_image_path(
+            test_year, test_form, QuestionOrAnswer(self.kind), int(self.number))
+
+
+def is_ignored(name: str) -> bool:
+    # Folders and the files archivers and Finder add
+    parts = name.split("/")
+    return name.endswith("/") or "__MACOSX" in parts or parts[-1].startswith(".")
+
+
+def parse_image_batch(files: Iterable[Tuple[str, bytes]]) -> List[ImageBatchItem]:
+    """Groups the files, as name and content pairs, by the image they're part of.
+    Raises ValueError listing the files that don't follow the layout, and those
+    that are the same image or part, e.g. question/12.png in two zips or beside
+    question/012.png, or whole beside its parts, as they'd race on one S3 key."""
+    items: Dict[str, ImageBatchItem] = {}
+    # The file each image came from, by part number, None for a whole image
+    sources: Dict[str, Dict[Optional[int], str]] = {}
+    invalid, duplicates = [], []
+    for name, content in files:
+        name = name.replace("\\", "/")
+        if is_ignored(name):
+            continue
+        match = NAME_PATTERN.search(name)
+        if not match:
+            invalid.append(name)
+            continue
+        kind, number, part = match.groups()
+        kind = kind.lower()
+        if (kind == "passage") != ("_" in number):
+            invalid.append(name)
+            continue
+        # Without leading zeros, as in the S3 key
+        number = "_".join(str(int(n)) for n in number.split("_"))
+        part_number = None if part is None else int(part)
+        item_sources = sources.setdefault(f"{kind}/{number}", {})
+        if part_number in item_sources:
+            duplicates.append(f"{item_sources[part_number]} and {name}")
+            continue
+        item_sources[part_number] = name
+        item = items.setdefault(f"{kind}/{number}", ImageBatchItem(kind, number))
+        item.parts[part_number or 0] = content
+    mixed = [item_name for item_name, item_sources in sources.items()
+             if None in item_sources and len(item_sources) > 1]
+    errors = []
+    if invalid:
+        errors.append(f"Files not named kind/number.png: {sorted(invalid)}")
+    if duplicates:
+        errors.append(f"Files for the same image: {sorted(duplicates)}")
+    if mixed:
+        errors.append(f"Images both whole and in parts: {sorted(mixed)}")
+    if errors:
+        raise ValueError("; ".join(errors))
+    return sorted(items.values(), key=lambda item: (
+        item.kind, [int(number) for number in item.number.split("_")]))
+
+
+def read_zip(data: bytes) -> List[Tuple[str, bytes]]:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return [(info.filename, archive.read(info)) for info in archive.infolist()
+                if not info.is_dir()]
+
+
+def read_directory(directory: Path) -> List[Tuple[str, bytes]]:
+    return [(path.relative_to(directory).as_posix(), path.read_bytes())
+            for path in directory.rglob("*") if path.is_file()]
+
+
+async def ingest_image_batch(
+    items: List[ImageBatchItem], test_year: int, test_form: str, force: bool = False
+) -> Dict[str, Any]:
+    """Processes every image at once, spread over the image worker processes,
+    and uploads each to S3 as soon as it's ready, with at most
+    IMAGE_UPLOAD_CONCURRENCY uploads in flight. Images the image manifest has as
+    unchanged are skipped, unless forced. Returns the S3 keys of the images by
+    kind and number, the names of those skipped, and the images that failed by
+    name."""
+    bucket = os.getenv(SHSAT_IMAGE_BUCKET)
+    local_copy = os.getenv(IMAGE_LOCAL_COPY, "true").lower() == "true"
+    upload_slots = asyncio.Semaphore(int(os.getenv(IMAGE_UPLOAD_CONCURRENCY, "8")))
+    manifest = get_image_manifest()
+    result: Dict[str, Any] = {
+        "question": {}, "answer": {}, "passage": {}, "cache_hits": [], "errors": []}
+
+    async def ingest(item: ImageBatchItem):
+        s3_key = item.s3_key(test_year, test_form)
+        key = manifest_key(bucket, s3_key)
+        try:
+            parts = [item.parts[part] for part in sorted(item.parts)]
+            input_hash = hash_inputs(parts)
+            if not force and await asyncio.to_thread(
+                    manifest.inputs_match, key, input_hash):
+                manifest.count(hit=True)
+                result["cache_hits"].append(item.name)
+                result[item.kind][item.number] = s3_key
+                return
+            image = await process_contents_in_memory(parts)
+            output_hash = hash_image(image)
+            cache_hit = not force and await asyncio.to_thread(
+                manifest.output_matches, key, input_hash, output_hash)
+            manifest.count(cache_hit)
+            if cache_hit:
+                result["cache_hits"].append(item.name)
+            else:
+                await asyncio.to_thread(manifest.discard, key)
+                async with upload_slots:
+                    await upload_fileobj(io.BytesIO(image), bucket, s3_key)
+                await asyncio.to_thread(manifest.put, key, input_hash, output_hash)
+            if local_copy:
+                await asyncio.to_thread(
+                    save_image, item.local_path(test_year, test_form), image)
+        except Exception as e:
+            logging.error(e)
+            result["errors"].append({"name": item.name, "detail": str(e)})
+            return
+        result[item.kind][item.number] = s3_key
+
+    await asyncio.gather(*(ingest(item) for item in items))
+    result["cache_hits"].sort()
+    result["errors"].sort(key=lambda error: error["name"])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("test_year", type=int)
+    parser.add_argument("test_form")
+    parser.add_argument("path", type=Path, help="a zip or a directory")
+    parser.add_argument("--force", action="store_true",
+                        help="process and upload images the manifest has as unchanged")
+    args = parser.parse_args()
+
+    if args.path.is_dir():
+        files = read_directory(args.path)
+    else:
+        files = read_zip(args.path.read_bytes())
+    items = parse_image_batch(files)
+    result = asyncio.run(ingest_image_batch(
+        items, args.test_year, args.test_form, args.force))
+    print(json.dumps(result, indent=2))
+    if result["errors"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Content addressed dedup of processed images. The manifest keeps, by bucket and
+S3 key, the SHA-256 of the inputs an image was processed from and of the
+processed image last uploaded there. An image is skipped when its inputs match,
+without processing it, or when the processed image matches, without uploading
+it. The manifest is only as good as the bucket it describes: pass force to the
+image routes to upload again, e.g. after objects were removed by hand."""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils.file_utils import generate_image_manifest_local_path
+from utils.image_utils import IMAGE_PIPELINE_VERSION, TRIM_MIN_RUN, TRIM_TOLERANCE
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_manifest: Optional["ImageManifest"] = None
+
+
+def hash_inputs(contents: List[bytes]) -> str:
+    # Each part hashed on its own, so moving bytes between parts changes the hash
+    digest = hashlib.sha256(
+        f"pipeline {IMAGE_PIPELINE_VERSION} trim {TRIM_TOLERANCE} {TRIM_MIN_RUN}".encode())
+    for content in contents:
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def hash_image(image: bytes) -> str:
+    return hashlib.sha256(image).hexdigest()
+
+
+class ImageManifest:
+    """Manifest of the uploaded images, saved as JSON and shared by every process
+    uploading images, e.g. several uvicorn workers and the batch command. Each
+    lookup reads the file again when another process replaced it, and each change
+    is merged into the file under an exclusive lock, so processes don't overwrite
+    each other's entries. Blocking, run it in a thread from async code. Counts the
+    images skipped as hits and those uploaded as misses."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock_path = path.with_name(f"{path.name}.lock")
+        self.hits = 0
+        self.misses = 0
+        # bucket/key -> {"input": hash, "output": hash}
+        self._entries: Dict[str, Dict[str, str]] = {}
+        # Inode, modification time and size of the file the entries were read from
+        self._file_id: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            # Only this process is locked out where fcntl isn't available
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            # Closing the file releases the lock
+            yield
+
+    def _read(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._entries, self._file_id = {}, None
+            return
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id == self._file_id:
+            return
+        try:
+            self._entries = json.loads(self.path.read_text())
+        except ValueError as e:
+            # Everything is uploaded again and the manifest rewritten
+            logging.warning(f"Ignoring unreadable image manifest {self.path}: {e}")
+            self._entries = {}
+        self._file_id = file_id
+
+    def _write(self):
+        # Replaced at once, so no process reads half a manifest
+        with tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, prefix=f".{self.path.name}.",
+                delete=False) as temp_file:
+            json.dump(self._entries, temp_file, indent=1, sort_keys=True)
+        os.replace(temp_file.name, self.path)
+        stat = os.stat(self.path)
+        self._file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def inputs_match(self, key: str, input_hash: str) -> bool:
+        """Whether the image at key was processed from these inputs."""
+        with self._lock, self._file_lock(exclusive=False):
+            self._read()
+            entry = self._entries.get(key)
+            return bool(entry) and entry["input"] == input_hash
+
+    def output_matches(self, key: str, input_hash: str, output_hash: str) -> bool:
+        """Whether the image at key is this processed image, for inputs that
+        changed without changing it, e.g. scanned again. Records the new inputs if
+        so."""
+        with self._lock, self._file_lock(exclusive=True):
+            self._read()
+            entry = self._entries.get(key)
+            if entry and entry["output"] == output_hash:
+                if entry["input"] != input_hash:
+                    entry["input"] = input_hash
+                    self._write()
+                return True
+            return False
+
+    def count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def discard(self, key: str):
+        """Forgets the image at key, before uploading another, so no process takes
+        the image it replaces as current while it's uploaded."""
+        with self._lock, self._file_lock(exclusive=True):
+            self._read()
+            if self._entries.pop(key, None) is not None:
+                self._write()
+
+    def put(self, key: str, input_hash: str, output_hash: str):
+        with self._lock, self._file_lock(exclusive=True):
+            self._read()
+            self._entries[key] = {"input": input_hash, "output": output_hash}
+            self._write()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
+
+
+def get_image_manifest() -> ImageManifest:
+    global _manifest
+    if _manifest is None:
+        _manifest = ImageManifest(generate_image_manifest_local_path())
+    return _manifest
+
+
+def manifest_key(bucket: str, s3_key: str) -> str:
+    return f"{bucket}/{s3_key}"
@@ -1,37 +1,128 @@
+import asyncio
 import io
+import multiprocessing
 import os
-import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
+from weakref import WeakKeyDictionary
 
-from fastapi import UploadFile
-from PIL import Image, ImageChops, ImageOps
+import numpy as np
+from PIL import Image, ImageOps
 
+from app.data.env_consts import (
+    IMAGE_PROCESS_WORKERS,
+    IMAGE_TRIM_MIN_RUN,
+    IMAGE_TRIM_TOLERANCE,
+)
 
-def trim_border(image: Image.Image, border_color=(255, 255, 255)) -> Image.Image:
-    rgb_image = image.convert("RGB")
-    # Exclude alpha value
-    bg = Image.new('RGB', rgb_image.size, border_color)
-    diff = ImageChops.difference(rgb_image, bg)
-    bbox = diff.getbbox()
-    if bbox:
-        return image.crop(bbox)
+# Image jobs run at once, in worker processes for the Pillow work so it doesn't
+# block the event loop, then in pngquant subprocesses
+IMAGE_WORKERS = int(os.getenv(IMAGE_PROCESS_WORKERS, "0")) or os.cpu_count() or 1
+_executor: Optional[ProcessPoolExecutor] = None
+# By event loop, which a semaphore is bound to
+_pngquant_slots: WeakKeyDictionary = WeakKeyDictionary()
+# Part of the hash of an image's inputs in the image manifest. Bump it when
+# render_image or the pngquant settings change, so images processed before aren't
+# taken as up to date
+IMAGE_PIPELINE_VERSION = 2
+# How far from white a pixel of a scan can be and still be trimmed, and the
+# fewest rows or columns of content in a row that aren't trimmed as noise
+TRIM_TOLERANCE = int(os.getenv(IMAGE_TRIM_TOLERANCE, "24"))
+TRIM_MIN_RUN = int(os.getenv(IMAGE_TRIM_MIN_RUN, "3"))
+
+
+def get_image_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Spawned, as forking the server's threads isn't safe
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def get_pngquant_slots() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if loop not in _pngquant_slots:
+        _pngquant_slots[loop] = asyncio.Semaphore(IMAGE_WORKERS)
+    return _pngquant_slots[loop]
+
+
+def find_content_run(profile: np.ndarray, min_run: int) -> Optional[Tuple[int, int]]:
+    """First and past the last index of the runs of at least min_run content rows
+    or columns, so thinner specks of noise are left out."""
+    if min_run > profile.size:
+        return None
+    if min_run <= 1:
+        indexes = np.flatnonzero(profile)
+        return (indexes[0], indexes[-1] + 1) if indexes.size else None
+    # Content rows in each window of min_run rows, by the window's first row
+    counts = np.convolve(profile.astype(np.int32), np.ones(min_run, np.int32), "valid")
+    starts = np.flatnonzero(counts == min_run)
+    return (starts[0], starts[-1] + min_run) if starts.size else None
+
+
+def trim_border(image: Image.Image, border_color=(255, 255, 255), tolerance: int = 0,
+                min_run: int = 1,
+                max_trim: Optional[Tuple[Optional[int], ...]] = None) -> Image.Image:
+    """Crops the border around the content of the image. Pixels within tolerance
+    of border_color in every channel are border, and rows and columns of content
+    count only in runs of at least min_run, so noise in near-white scans doesn't
+    stop the trim. max_trim limits the pixels trimmed from the left, top, right
+    and bottom edges, None for no limit. Alpha is ignored."""
+    if image.mode == "L" and len(set(border_color)) == 1:
+        pixels = np.asarray(image)[..., np.newaxis]
+        border_color = border_color[:1]
+    elif image.mode in ("RGB", "RGBA"):
+        pixels = np.asarray(image)
     else:
+        pixels = np.asarray(image.convert("RGB"))
+
+    # Content where any channel is out of bounds, one byte a pixel, rows first
+    content = np.zeros(image.size[::-1], dtype=np.bool_)
+    for channel, color in enumerate(border_color):
+        values = pixels[..., channel]
+        if color - tolerance > 0:
+            content |= values < color - tolerance
+        if color + tolerance < 255:
+            content |= values > color + tolerance
+
+    rows = find_content_run(np.any(content, axis=1), min_run)
+    # Columns only within the content rows
+    columns = rows and find_content_run(np.any(content[rows[0]:rows[1]], axis=0), min_run)
+    if not columns:
         raise ValueError("Unable to trim border from image.")
+    (top, bottom), (left, right) = rows, columns
+
+    width, height = image.size
+    max_left, max_top, max_right, max_bottom = max_trim or (None,) * 4
+    if max_left is not None:
+        left = min(left, max_left)
+    if max_top is not None:
+        top = min(top, max_top)
+    if max_right is not None:
+        right = max(right, width - max_right)
+    if max_bottom is not None:
+        bottom = max(bottom, height - max_bottom)
+    return image.crop((int(left), int(top), int(right), int(bottom)))
 
 
-async def process_images(files: List[UploadFile], local_image_path: Path):
+def render_image(contents: List[bytes]) -> bytes:
+    """Trims the white space around each PNG, adds a 16px white border and
+    stacks them top to bottom, centered. Returns the result as PNG bytes.
+    CPU bound, run in the image executor by render_contents."""
     images = []
     # Read files into PIL Images
-    for file in files:
-        content = await file.read()  # async read
+    for content in contents:
         img = Image.open(io.BytesIO(content))
         if img.format != 'PNG':
             raise ValueError("All files must be in PNG format.")
         images.append(img)
 
-    # Trim existing white space
-    images = [trim_border(img) for img in images]
+    # Trim existing white space, and the near-white noise around it in scans
+    images = [trim_border(img, tolerance=TRIM_TOLERANCE, min_run=TRIM_MIN_RUN)
+              for img in images]
     # Add 16px of white border to each image
     images = [ImageOps.expand(img, border=16, fill='white')
               for img in images]
@@ -53,16 +144,48 @@ async def process_images(files: List[UploadFile], local_image_path: Path):
     else:
         new_img = images[0]
 
-    temp_path = Path("temp").joinpath("temp_image.png")
+    output = io.BytesIO()
+    new_img.save(output, format='PNG')
+    return output.getvalue()
+
+
+async def run_pngquant(png: bytes, *args: str) -> bytes:
+    # pngquant reads the image from stdin, and writes it to stdout unless an
+    # --output path is given
+    async with get_pngquant_slots():
+        process = await asyncio.create_subprocess_exec(
+            'pngquant', '--force', *args, '-',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate(png)
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"pngquant exited with {process.returncode}: {stderr.decode()}")
+    return stdout
+
+
+async def render_contents(contents: List[bytes]) -> bytes:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_image_executor(), render_image, contents)
+
 
-    # Save the image to a temporary file
-    new_img.save(temp_path)
+async def process_contents(contents: List[bytes], local_image_path: Path):
+    png = await render_contents(contents)
 
     # Create dir and parent dirs if not exists
     local_image_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Use pngquant to compress the image
-    subprocess.run(['pngquant', '--force', '--output',
-                     str(local_image_path), str(temp_path)])
-    
-    os.remove(temp_path)
+    await run_pngquant(png, '--output', str(local_image_path))
+
+
+async def process_contents_in_memory(contents: List[bytes]) -> bytes:
+    """process_contents without touching the disk, returns the compressed PNG."""
+    return await run_pngquant(await render_contents(contents))
+
+
+def save_image(local_image_path: Path, image: bytes):
+    local_image_path.parent.mkdir(parents=True, exist_ok=True)
+    local_image_path.write_bytes(image)
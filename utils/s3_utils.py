@@ -1,23 +1,199 @@
 import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
 from pathlib import Path
+from typing import Any, BinaryIO, Optional
+from weakref import WeakKeyDictionary
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-s3_client = boto3.client("s3")
+from app.data.env_consts import (
+    S3_ASYNC_CLIENT,
+    S3_ENDPOINT_URL,
+    S3_MAX_ATTEMPTS,
+    S3_MAX_CONCURRENCY,
+    S3_MAX_POOL_CONNECTIONS,
+    S3_MULTIPART_CHUNKSIZE_MB,
+    S3_MULTIPART_THRESHOLD_MB,
+    S3_RETRY_MODE,
+)
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session as get_aiobotocore_session
+except ImportError:
+    get_aiobotocore_session = None
+
+MB = 1024 * 1024
+
+_service: Optional["S3TransferService"] = None
+_service_lock = threading.Lock()
+
+
+class S3TransferService:
+    """Every S3 call goes through one client, created on first use, with a
+    connection pool sized for the uploads in flight and adaptive retries, which
+    back off when S3 throttles. Files are uploaded with TransferConfig, in
+    concurrent parts above the multipart threshold.
+
+    The blocking boto3 calls run on a thread pool of their own, as big as the
+    connection pool, so uploads neither wait on the default executor's threads
+    nor on connections. With use_async_client and aiobotocore installed, objects
+    below the multipart threshold are put and checked with a native async client
+    instead, one per event loop, without a thread each."""
+
+    def __init__(
+        self,
+        max_pool_connections: int = 32,
+        max_attempts: int = 5,
+        retry_mode: str = "adaptive",
+        multipart_threshold: int = 8 * MB,
+        multipart_chunksize: int = 8 * MB,
+        max_concurrency: int = 10,
+        endpoint_url: Optional[str] = None,
+        use_async_client: bool = False,
+    ):
+        if use_async_client and get_aiobotocore_session is None:
+            raise RuntimeError("The async S3 client needs aiobotocore installed")
+        self.client_config = Config(
+            max_pool_connections=max_pool_connections,
+            retries={"total_max_attempts": max_attempts, "mode": retry_mode},
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+        )
+        self.endpoint_url = endpoint_url
+        self.use_async_client = use_async_client
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_pool_connections, thread_name_prefix="s3")
+        # By event loop, which an aiobotocore client is bound to
+        self._async_clients: WeakKeyDictionary = WeakKeyDictionary()
+
+    @property
+    def client(self):
+        # Creating boto3 clients isn't thread safe, using them is
+        with self._client_lock:
+            if self._client is None:
+                self._client = boto3.session.Session().client(
+                    "s3", endpoint_url=self.endpoint_url, config=self.client_config)
+            return self._client
+
+    async def _run(self, func, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, lambda: func(*args, **kwargs))
+
+    async def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            # A task, so coroutines asking at once share one client
+            self._async_clients[loop] = loop.create_task(self._create_async_client())
+        return (await self._async_clients[loop])[0]
+
+    async def _create_async_client(self):
+        exit_stack = AsyncExitStack()
+        config = AioConfig(
+            max_pool_connections=self.client_config.max_pool_connections,
+            retries=self.client_config.retries,
+        )
+        client = await exit_stack.enter_async_context(
+            get_aiobotocore_session().create_client(
+                "s3", endpoint_url=self.endpoint_url, config=config))
+        return client, exit_stack
+
+    async def upload_file(self, file_path: Path, bucket: str, object_name: str, extra_args: dict | None = None):
+        if self.use_async_client:
+            size = await asyncio.to_thread(os.path.getsize, file_path)
+            if size < self.transfer_config.multipart_threshold:
+                body = await asyncio.to_thread(Path(file_path).read_bytes)
+                await self._put_object(body, bucket, object_name, extra_args)
+                return
+        await self._run(
+            self.client.upload_file, str(file_path), bucket, object_name,
+            ExtraArgs=extra_args, Config=self.transfer_config)
+
+    async def upload_fileobj(self, file_obj: BinaryIO, bucket: str, object_name: str, extra_args: dict | None = None):
+        if self.use_async_client:
+            # The in-memory images this is used for are well below the threshold
+            body = file_obj.read()
+            if len(body) < self.transfer_config.multipart_threshold:
+                await self._put_object(body, bucket, object_name, extra_args)
+                return
+            file_obj.seek(0)
+        await self._run(
+            self.client.upload_fileobj, file_obj, bucket, object_name,
+            ExtraArgs=extra_args, Config=self.transfer_config)
+
+    async def _put_object(self, body: bytes, bucket: str, object_name: str, extra_args: dict | None):
+        client = await self._get_async_client()
+        # ExtraArgs are put_object parameters
+        await client.put_object(
+            Bucket=bucket, Key=object_name, Body=body, **(extra_args or {}))
+
+    async def object_exists(self, bucket: str, object_name: str) -> bool:
+        try:
+            if self.use_async_client:
+                client = await self._get_async_client()
+                await client.head_object(Bucket=bucket, Key=object_name)
+            else:
+                await self._run(
+                    self.client.head_object, Bucket=bucket, Key=object_name)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    async def close(self):
+        """Closes the running event loop's async client, if any."""
+        task = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if task is not None:
+            _, exit_stack = await task
+            await exit_stack.aclose()
+
+
+def create_s3_transfer_service() -> S3TransferService:
+    return S3TransferService(
+        max_pool_connections=int(os.getenv(S3_MAX_POOL_CONNECTIONS, "32")),
+        max_attempts=int(os.getenv(S3_MAX_ATTEMPTS, "5")),
+        retry_mode=os.getenv(S3_RETRY_MODE, "adaptive"),
+        multipart_threshold=int(os.getenv(S3_MULTIPART_THRESHOLD_MB, "8")) * MB,
+        multipart_chunksize=int(os.getenv(S3_MULTIPART_CHUNKSIZE_MB, "8")) * MB,
+        max_concurrency=int(os.getenv(S3_MAX_CONCURRENCY, "10")),
+        endpoint_url=os.getenv(S3_ENDPOINT_URL) or None,
+        use_async_client=os.getenv(S3_ASYNC_CLIENT, "false").lower() == "true",
+    )
+
+
+def get_s3_transfer_service() -> S3TransferService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = create_s3_transfer_service()
+        return _service
+
 
 def get_s3_client():
-        global s3_client
-        if s3_client is None:
-            s3_client = boto3.client("s3")
+    return get_s3_transfer_service().client
 
-        return s3_client
+async def upload_file(file_path: Path, bucket: str, object_name: str, extra_args: dict | None = None):
+    await get_s3_transfer_service().upload_file(file_path, bucket, object_name, extra_args)
 
-async def upload_file(file_path: Path, bucket: str, object_name: str):
-        s3_client = get_s3_client()
+async def upload_fileobj(file_obj: BinaryIO, bucket: str, object_name: str, extra_args: dict | None = None):
+    await get_s3_transfer_service().upload_fileobj(file_obj, bucket, object_name, extra_args)
 
-        def upload_file_func():
-            s3_client.upload_file(file_path, bucket, object_name)
+async def object_exists(bucket: str, object_name: str) -> bool:
+    return await get_s3_transfer_service().object_exists(bucket, object_name)
 
-        # See https://bbc.github.io/cloudfit-public-docs/asyncio/asyncio-part-5.html
-        await asyncio.to_thread(upload_file_func)
\ No newline at end of file
+async def close_s3_transfer_service():
+    if _service is not None:
+        await _service.close()
@@ -0,0 +1,113 @@
+from collections.abc import Mapping
+from datetime import datetime
+from enum import Enum
+from operator import attrgetter
+from typing import Any, Callable, Literal, Optional, get_args, get_origin
+
+from pydantic import BaseModel
+from pydantic.datetime_parse import parse_datetime
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+
+Converter = Optional[Callable[[Any], Any]]
+
+
+def compile_serializer(model: type[BaseModel]) -> Callable[[Any], Any]:
+    """Compiles a function that turns an ORM object, or a mapping of field names to
+    values, into the JSON ready data of model.from_orm(obj).json(by_alias=True).
+
+    The fields, aliases and converters of the model are looked up once, here,
+    instead of for every object. Nothing is validated, so it's only for data
+    read from the database that the model already accepts. Datetimes are left
+    for orjson, which formats them as isoformat does. Only the field types used by
+    the response schemas are supported, others raise a TypeError.
+    """
+    return _compile_model(model)
+
+
+def _compile_model(model: type[BaseModel]) -> Callable[[Any], Any]:
+    if "__root__" in model.__fields__:
+        return _compile_field(model.__fields__["__root__"]) or _identity
+
+    fields = [
+        (field.alias, field.name, _compile_field(field))
+        for field in model.__fields__.values()
+    ]
+
+    def serialize(obj: Any) -> dict[str, Any]:
+        if isinstance(obj, Mapping):
+            values = [obj.get(name) for _, name, _ in fields]
+        else:
+            values = [getattr(obj, name, None) for _, name, _ in fields]
+        return {
+            alias: value if convert is None or value is None else convert(value)
+            for (alias, _, convert), value in zip(fields, values)
+        }
+
+    return serialize
+
+
+def _compile_field(field: ModelField) -> Converter:
+    if field.shape == SHAPE_LIST:
+        convert_item = _compile_field(field.sub_fields[0])
+        if convert_item is None:
+            return list
+        return lambda values: [convert_item(value) for value in values]
+
+    if field.shape != SHAPE_SINGLETON:
+        raise TypeError(f"Can't compile a serializer for field {field.name}")
+
+    if field.discriminator_key is not None:
+        return _compile_discriminated_union(field)
+    return _compile_type(field.type_)
+
+
+def _compile_discriminated_union(field: ModelField) -> Callable[[Any], Any]:
+    serializers = {}
+    for value, sub_field in field.sub_fields_mapping.items():
+        serializer = _compile_model(sub_field.type_)
+        serializers[value] = serializer
+        # Objects may hold the enum or its value
+        if isinstance(value, Enum):
+            serializers[value.value] = serializer
+    key = field.discriminator_key
+
+    def serialize(obj: Any) -> Any:
+        value = obj.get(key) if isinstance(obj, Mapping) else getattr(obj, key)
+        return serializers[value](obj)
+
+    return serialize
+
+
+def _compile_type(type_: Any) -> Converter:
+    if get_origin(type_) is Literal:
+        if any(isinstance(value, Enum) for value in get_args(type_)):
+            return _enum_value
+        return None
+    if isinstance(type_, type):
+        if issubclass(type_, BaseModel):
+            return _compile_model(type_)
+        if issubclass(type_, Enum):
+            return attrgetter("value")
+        if issubclass(type_, datetime):
+            return _datetime
+        if issubclass(type_, (int, str)):
+            return None
+        if issubclass(type_, float):
+            return float
+    raise TypeError(f"Can't compile a serializer for type {type_}")
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _enum_value(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def _datetime(value: Any) -> Any:
+    # Datetimes nested in JSON columns are strings, possibly formatted differently
+    # than isoformat, e.g. without trailing zeros in the microseconds
+    if isinstance(value, str):
+        return parse_datetime(value)
+    return value
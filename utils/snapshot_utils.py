@@ -0,0 +1,209 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_NAME = "manifest.json"
+# Characters of the SHA-256 hex digest kept in shard file names
+HASH_LENGTH = 16
+# Unreferenced shard files are removed once they are this old
+PRUNE_AFTER_SECONDS = 3600
+
+
+@dataclass
+class ShardFile:
+    path: str
+    data: bytes
+    # Content-Encoding the file is served with, None for the plain JSON
+    encoding: Optional[str] = None
+
+
+@dataclass
+class Shard:
+    name: str
+    count: int
+    sha256: str
+    files: list[ShardFile]
+
+
+def encode_shard(name: str, items: list[Any], level: int = 9) -> Shard:
+    """Renders the items of a shard to JSON named by its content hash, along with
+    gzip and, when the brotli package is installed, brotli compressed copies.
+
+    The same items always give the same bytes, gzip's timestamp is left at 0, so
+    unchanged shards keep their file names between snapshots.
+    """
+    data = orjson.dumps(items)
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = f"{name}.{sha256[:HASH_LENGTH]}.json"
+    files = [
+        ShardFile(path, data),
+        ShardFile(f"{path}.gz", gzip.compress(data, level, mtime=0), "gzip"),
+    ]
+    if brotli is not None:
+        files.append(ShardFile(f"{path}.br", brotli.compress(data), "br"))
+    return Shard(name, len(items), sha256, files)
+
+
+def build_manifest(shards: list[Shard], created_at: datetime) -> dict[str, Any]:
+    """Lists each shard's files, sizes and hash, for clients to download the
+    shards whose hash differs from their copy's. The version changes when any
+    shard does."""
+    shards = sorted(shards, key=lambda shard: shard.name)
+    version = hashlib.sha256(
+        "".join(f"{shard.name}:{shard.sha256};" for shard in shards).encode()
+    ).hexdigest()
+    return {
+        "version": version[:HASH_LENGTH],
+        "createdAt": created_at,
+        "shards": [
+            {
+                "name": shard.name,
+                "count": shard.count,
+                "sha256": shard.sha256,
+                "path": shard.files[0].path,
+                "size": len(shard.files[0].data),
+                "encodings": {
+                    file.encoding: {"path": file.path, "size": len(file.data)}
+                    for file in shard.files[1:]
+                },
+            }
+            for shard in shards
+        ],
+    }
+
+
+def manifest_paths(manifest: dict[str, Any]) -> set[str]:
+    """Paths of all the files of the shards listed in the manifest."""
+    paths = set()
+    for shard in manifest["shards"]:
+        paths.add(shard["path"])
+        paths.update(file["path"] for file in shard["encodings"].values())
+    return paths
+
+
+def read_manifest(directory: Path) -> Optional[dict[str, Any]]:
+    try:
+        return orjson.loads((directory / MANIFEST_NAME).read_bytes())
+    except FileNotFoundError:
+        return None
+    except orjson.JSONDecodeError as e:
+        logging.warning(f"Ignoring unreadable snapshot manifest in {directory}: {e}")
+        return None
+
+
+def write_snapshot(
+    directory: Path,
+    shards: list[Shard],
+    manifest: dict[str, Any],
+    prune_after_seconds: float = PRUNE_AFTER_SECONDS,
+) -> list[ShardFile]:
+    """Writes the shard files missing from directory, then the manifest, and
+    returns the files written. Shard files are named by their content, so
+    existing ones are already up to date. The manifest is replaced atomically,
+    after the shards it lists, so readers never see it reference a missing file.
+
+    Then removes the shard files neither the new nor the previous manifest lists,
+    see prune_snapshot.
+    """
+    written = []
+    for shard in shards:
+        for file in shard.files:
+            path = directory / file.path
+            try:
+                # Marks it as in use, for publishes running at the same time
+                os.utime(path)
+                continue
+            except FileNotFoundError:
+                pass
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomically(path, file.data)
+            written.append(file)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    previous_manifest = read_manifest(directory)
+    write_atomically(directory / MANIFEST_NAME, orjson.dumps(manifest))
+
+    keep = manifest_paths(manifest)
+    if previous_manifest is not None:
+        keep |= manifest_paths(previous_manifest)
+    prune_snapshot(directory, keep, prune_after_seconds)
+    return written
+
+
+def prune_snapshot(
+    directory: Path, keep: set[str], prune_after_seconds: float
+) -> list[str]:
+    """Removes the files in directory not in keep, relative paths, and not
+    modified for prune_after_seconds, and returns their paths. Clients that just
+    read the previous manifest still find its shards, which the caller keeps,
+    and other processes publishing at the same time still find the shards they
+    wrote or found, which are recent."""
+    pruned = []
+    prune_before = time.time() - prune_after_seconds
+    for path in directory.rglob("*"):
+        relative_path = path.relative_to(directory).as_posix()
+        if relative_path == MANIFEST_NAME or relative_path in keep:
+            continue
+        try:
+            if not path.is_file() or path.stat().st_mtime > prune_before:
+                continue
+            path.unlink()
+        except FileNotFoundError:
+            # Pruned by another process
+            continue
+        pruned.append(relative_path)
+    return pruned
+
+
+def write_atomically(path: Path, data: bytes):
+    # A temporary file of its own, as processes may write the same path at once
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    ) as temp_file:
+        temp_file.write(data)
+    try:
+        os.replace(temp_file.name, path)
+    except OSError:
+        os.unlink(temp_file.name)
+        raise
+
+
+class DebouncedTask:
+    """Runs a coroutine function in the background when requested, at most once
+    at a time. Requests made while it waits or runs are coalesced into one run
+    after the current one, so a burst of writes publishes one snapshot."""
+
+    def __init__(self, fn: Callable[[], Awaitable[Any]], delay_seconds: float = 5):
+        self.fn = fn
+        self.delay_seconds = delay_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._requested = False
+
+    def request(self):
+        self._requested = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._requested:
+            await asyncio.sleep(self.delay_seconds)
+            self._requested = False
+            try:
+                await self.fn()
+            except Exception as e:
+                logging.error(e)
@@ -0,0 +1,91 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Generic, Hashable, Iterable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(WORD_PATTERN.findall(text.casefold()))
+
+
+def trigrams(text: str) -> set[str]:
+    # As pg_trgm does, each word is padded with two spaces before and one after
+    # See https://www.postgresql.org/docs/current/pgtrgm.html
+    result: set[str] = set()
+    for word in WORD_PATTERN.findall(text.casefold()):
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class SuggestIndex(Generic[K]):
+    """In-memory autocomplete index over short names such as tag names or
+    passage titles. Names starting with the query come first, then names with a
+    later word starting with it, then names similar to it by trigrams, to allow
+    for typos. Prefix lookups are binary searches that stop at the limit, so
+    they take about the same time however many names there are."""
+
+    def __init__(self, entries: Iterable[tuple[K, str]], min_similarity: float = 0.3):
+        self.min_similarity = min_similarity
+        self.keys: list[K] = []
+        self.names: list[str] = []
+        # Sorted (name, entry index) pairs
+        self._names: list[tuple[str, int]] = []
+        # Sorted (name from its second or later word on, entry index) pairs
+        self._word_suffixes: list[tuple[str, int]] = []
+        self._trigrams: list[set[str]] = []
+        self._entries_by_trigram: defaultdict[str, list[int]] = defaultdict(list)
+        for index, (key, name) in enumerate(entries):
+            normalized = normalize(name)
+            self.keys.append(key)
+            self.names.append(normalized)
+            self._names.append((normalized, index))
+            self._word_suffixes += [
+                (normalized[match.start() :], index)
+                for match in WORD_PATTERN.finditer(normalized)
+                if match.start() > 0
+            ]
+            name_trigrams = trigrams(normalized)
+            self._trigrams.append(name_trigrams)
+            for trigram in name_trigrams:
+                self._entries_by_trigram[trigram].append(index)
+        self._names.sort()
+        self._word_suffixes.sort()
+
+    def suggest(self, query: str, limit: int = 10) -> list[K]:
+        query = normalize(query)
+        if not query or limit < 1:
+            return []
+
+        matches: dict[int, None] = {}
+        for sorted_pairs in (self._names, self._word_suffixes):
+            position = bisect_left(sorted_pairs, (query,))
+            while len(matches) < limit and position < len(sorted_pairs):
+                text, index = sorted_pairs[position]
+                if not text.startswith(query):
+                    break
+                matches.setdefault(index)
+                position += 1
+        if len(matches) >= limit:
+            return [self.keys[index] for index in matches]
+
+        # Not enough prefix matches, fill in with the most similar names
+        query_trigrams = trigrams(query)
+        shared: defaultdict[int, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            for index in self._entries_by_trigram.get(trigram, ()):
+                shared[index] += 1
+        similar = []
+        for index, count in shared.items():
+            union = len(query_trigrams) + len(self._trigrams[index]) - count
+            similarity = count / union
+            if index not in matches and similarity >= self.min_similarity:
+                similar.append((-similarity, self.names[index], index))
+        similar.sort()
+        for _, _, index in similar[: limit - len(matches)]:
+            matches.setdefault(index)
+        return [self.keys[index] for index in matches]